@@ -0,0 +1,65 @@
+import time
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from adminchat.models import Business, BotSettings, Embedding
+from adminchat.services.embedding_loader import EmbeddingBulkLoader
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara la escritura de embeddings con bulk_create (INSERT con literales de texto) "
+        "y con EmbeddingBulkLoader (COPY binario). Inserta filas sintéticas dentro de una "
+        "transacción que se revierte, así que no deja datos. Con --loads las filas se reparten "
+        "entre varias llamadas a load(), como hace la ingesta por lotes de chunks."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('business_id', help="Negocio al que se asignan las filas sintéticas")
+        parser.add_argument('--rows', type=int, default=10000)
+        parser.add_argument('--dim', type=int, default=1024,
+                            choices=[dim for dim, _ in BotSettings.EMBEDDING_DIMENSIONS])
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help="Filas por lote (default: EMBEDDING_COPY_BATCH_SIZE)")
+        parser.add_argument('--loads', type=int, default=1,
+                            help="Número de llamadas a load() entre las que se reparten las filas")
+
+    def handle(self, *args, **options):
+        if not Business.objects.filter(id=options['business_id']).exists():
+            raise CommandError(f"Business not found: {options['business_id']}")
+        if not EmbeddingBulkLoader.supports_copy():
+            raise CommandError("COPY loader requires psycopg 3 and pgvector.psycopg")
+
+        rows, dim, loads = options['rows'], options['dim'], max(1, options['loads'])
+        batch_size = options['batch_size'] or EmbeddingBulkLoader.BATCH_SIZE
+        vectors = np.random.default_rng(0).standard_normal((rows, dim)).astype('<f4')
+
+        self.stdout.write(f"{rows} filas de {dim} dimensiones, lotes de {batch_size}, {loads} llamadas a load()")
+        for name, use_copy in (('bulk_create', False), ('copy_binary', True)):
+            elapsed = self._timed_load(options['business_id'], vectors, batch_size, use_copy, loads)
+            self.stdout.write(f"{name:<12}{elapsed:>10.2f} s{rows / elapsed:>12.0f} filas/s")
+
+    def _timed_load(self, business_id, vectors, batch_size, use_copy, loads):
+        embeddings = [
+            Embedding(
+                business_id=business_id,
+                vector=vector,
+                dimensions=len(vector),
+                content=f"benchmark chunk {i}",
+                source_type='other',
+                source_id=business_id,
+                chunk_index=i,
+                metadata={'benchmark': True}
+            )
+            for i, vector in enumerate(vectors)
+        ]
+        per_load = -(-len(embeddings) // loads)
+        with transaction.atomic():
+            start = time.perf_counter()
+            for offset in range(0, len(embeddings), per_load):
+                EmbeddingBulkLoader.load(
+                    embeddings[offset:offset + per_load], batch_size=batch_size, use_copy=use_copy
+                )
+            elapsed = time.perf_counter() - start
+            transaction.set_rollback(True)
+        return elapsed
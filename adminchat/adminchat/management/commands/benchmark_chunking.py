@@ -0,0 +1,58 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from adminchat.services.embedding_service import TextExtractor, TextCleaner, ChunkGenerator
+from adminchat.services.tokenizer_service import TokenizerService
+from adminchat.management.commands.benchmark_ingestion_memory import synthetic_blocks
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide el throughput de las estrategias de ChunkGenerator.iter_spans (ventana de "
+        "palabras, oraciones/párrafos, medidas en palabras o en tokens) frente al "
+        "divisor de palabras original (iter_chunks) sobre texto sintético en memoria."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size-mb', type=int, default=50, help="Tamaño del texto sintético")
+        parser.add_argument('--chunk-size', type=int, default=200)
+        parser.add_argument('--chunk-overlap', type=int, default=20)
+        parser.add_argument('--tokenizer', default=None,
+                            help="Tokenizador para las variantes en tokens (default: CHUNK_TOKENIZER)")
+
+    def handle(self, *args, **options):
+        try:
+            tokenizer = TokenizerService.get(options['tokenizer'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        size = options['size_mb'] << 20
+        chunk_size, chunk_overlap = options['chunk_size'], options['chunk_overlap']
+        # Las líneas se materializan una vez: solo se mide el chunking
+        lines = list(TextCleaner.iter_clean_lines(TextExtractor.iter_text_lines(synthetic_blocks(size))))
+
+        variants = [
+            ('word splitter', lambda: ChunkGenerator.iter_chunks(lines, chunk_size, chunk_overlap)),
+            ('words', lambda: ChunkGenerator.iter_spans(lines, chunk_size, chunk_overlap)),
+            ('sentences', lambda: ChunkGenerator.iter_spans(lines, chunk_size, chunk_overlap, 'sentences')),
+            ('words:tokens', lambda: ChunkGenerator.iter_spans(
+                lines, chunk_size, chunk_overlap, 'words', tokenizer)),
+            ('sentences:tokens', lambda: ChunkGenerator.iter_spans(
+                lines, chunk_size, chunk_overlap, 'sentences', tokenizer)),
+        ]
+
+        self.stdout.write(
+            f"{options['size_mb']} MB, chunk_size={chunk_size}, chunk_overlap={chunk_overlap}, "
+            f"tokenizer={options['tokenizer'] or TokenizerService.DEFAULT}"
+        )
+        self.stdout.write(f"{'variante':<18}{'MB/s':>8}{'chunks':>10}{'palabras/chunk':>16}")
+        for name, chunker in variants:
+            start = time.perf_counter()
+            chunks = words = 0
+            for chunk in chunker():
+                text = chunk if isinstance(chunk, str) else chunk[0]
+                chunks += 1
+                words += text.count(' ') + 1
+            elapsed = time.perf_counter() - start
+            self.stdout.write(
+                f"{name:<18}{size / elapsed / (1 << 20):>8.1f}{chunks:>10}{words / max(chunks, 1):>16.1f}"
+            )
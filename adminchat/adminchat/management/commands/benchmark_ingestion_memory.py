@@ -0,0 +1,125 @@
+import random
+import resource
+import time
+from contextlib import nullcontext
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from adminchat.models import Business, BotSettings, Embedding
+from adminchat.services.embedding_service import TextExtractor, TextCleaner, ChunkGenerator, ChunkHasher
+from adminchat.services.embedding_loader import EmbeddingBulkLoader
+from adminchat.management.commands.run_stub_embedder import stub_vector
+
+
+class Command(BaseCommand):
+    help = (
+        "Ingiere un archivo de texto sintético (por defecto 1 GB, generado al vuelo) por "
+        "el pipeline en streaming de create_embeddings_task (decodificación -> limpieza -> "
+        "chunks -> huellas -> lotes de vectores -> COPY) y falla si el RSS máximo del "
+        "proceso supera --max-rss-mb. Los vectores son deterministas (sin servicio de "
+        "embeddings); con --business las filas se escriben en una transacción que se revierte."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size-mb', type=int, default=1024, help="Tamaño del texto sintético")
+        parser.add_argument('--max-rss-mb', type=int, default=512, help="Techo de RSS del proceso")
+        parser.add_argument('--chunk-size', type=int, default=500)
+        parser.add_argument('--chunk-overlap', type=int, default=50)
+        parser.add_argument('--batch-size', type=int, default=256, help="Chunks por lote")
+        parser.add_argument('--dim', type=int, default=384,
+                            choices=[dim for dim, _ in BotSettings.EMBEDDING_DIMENSIONS])
+        parser.add_argument('--business', help="Negocio para escribir las filas (si no, sin base de datos)")
+
+    def handle(self, *args, **options):
+        business_id = options['business']
+        if business_id and not Business.objects.filter(id=business_id).exists():
+            raise CommandError(f"Business not found: {business_id}")
+
+        size = options['size_mb'] << 20
+        dim, batch_size = options['dim'], options['batch_size']
+        self.stdout.write(
+            f"{options['size_mb']} MB de texto, chunks de {options['chunk_size']} palabras, "
+            f"lotes de {batch_size}, dim={dim}; RSS inicial {self._peak_rss_mb():.0f} MB"
+        )
+
+        start = time.perf_counter()
+        lines = TextCleaner.iter_clean_lines(TextExtractor.iter_text('txt', synthetic_blocks(size)))
+        chunks = ChunkGenerator.iter_chunks(lines, options['chunk_size'], options['chunk_overlap'])
+        total, batch = 0, []
+
+        # Sin --business no se toca la base de datos
+        with transaction.atomic() if business_id else nullcontext():
+            for i, chunk in enumerate(chunks):
+                batch.append((i, chunk, ChunkHasher.hash_chunk(chunk, 'benchmark')))
+                if len(batch) >= batch_size:
+                    total += self._save(business_id, batch, dim)
+                    batch = []
+            if batch:
+                total += self._save(business_id, batch, dim)
+            if business_id:
+                transaction.set_rollback(True)
+
+        elapsed = time.perf_counter() - start
+        peak = self._peak_rss_mb()
+        self.stdout.write(
+            f"{total} chunks en {elapsed:.1f} s ({size / elapsed / (1 << 20):.1f} MB/s); "
+            f"RSS máximo {peak:.0f} MB"
+        )
+        if peak > options['max_rss_mb']:
+            raise CommandError(f"Peak RSS {peak:.0f} MB exceeds the {options['max_rss_mb']} MB ceiling")
+        self.stdout.write(self.style.SUCCESS(f"RSS por debajo de {options['max_rss_mb']} MB"))
+
+    def _save(self, business_id, batch, dim):
+        if business_id:
+            EmbeddingBulkLoader.load(
+                Embedding(
+                    business_id=business_id,
+                    vector=stub_vector(chunk, dim),
+                    dimensions=dim,
+                    content=chunk,
+                    source_type='other',
+                    source_id=business_id,
+                    chunk_index=i,
+                    content_hash=chunk_hash,
+                    is_active=False,
+                    metadata={'benchmark': True}
+                )
+                for i, chunk, chunk_hash in batch
+            )
+        else:
+            for _, chunk, _ in batch:
+                stub_vector(chunk, dim)
+        return len(batch)
+
+    @staticmethod
+    def _peak_rss_mb():
+        # ru_maxrss está en KB en Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def synthetic_blocks(size, block_size=1 << 20, distinct_blocks=16):
+    """
+    Genera size bytes de texto con palabras, oraciones, líneas y párrafos aleatorios,
+    por bloques. Se generan distinct_blocks bloques distintos y se repiten para no
+    depender de la velocidad del generador aleatorio.
+    """
+    rng = random.Random(0)
+    vocabulary = [
+        ''.join(rng.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(rng.randint(2, 12)))
+        for _ in range(5000)
+    ]
+    blocks = []
+    for _ in range(distinct_blocks):
+        words, length = [], 0
+        while length < block_size:
+            word = rng.choice(vocabulary)
+            roll = rng.random()
+            separator = '.\n\n' if roll < 0.01 else '. ' if roll < 0.08 else '\n' if roll < 0.15 else ' '
+            words.append(word + separator)
+            length += len(word) + len(separator)
+        blocks.append(''.join(words).encode('utf-8'))
+
+    produced = 0
+    while produced < size:
+        block = blocks[(produced // block_size) % distinct_blocks][:size - produced]
+        produced += len(block)
+        yield block
@@ -0,0 +1,105 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from adminchat.models import Embedding
+from adminchat.services.bot_setting_service import BotSettingsService
+from adminchat.services.search_service import EmbeddingSearchService
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide recall@k y latencia de las variantes de búsqueda vectorial de un negocio "
+        "(ANN completo, halfvec, binario y primeras etapas Matryoshka truncadas) frente "
+        "a la búsqueda exacta. Usa vectores del propio corpus como consultas."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('business_id', help="ID del negocio")
+        parser.add_argument('--queries', type=int, default=50, help="Número de consultas de muestra")
+        parser.add_argument('--top-k', type=int, default=10)
+        parser.add_argument('--rerank-factor', type=int, default=4)
+        parser.add_argument('--truncate-dims', default='128,256,512',
+                            help="Dimensiones truncadas a evaluar, separadas por comas")
+        parser.add_argument('--ef-search', type=int, default=None, help="hnsw.ef_search para las variantes ANN")
+
+    def handle(self, *args, **options):
+        business_id = options['business_id']
+        top_k = options['top_k']
+        rerank_factor = options['rerank_factor']
+        try:
+            truncate_dims = [int(d) for d in options['truncate_dims'].split(',') if d.strip()]
+        except ValueError:
+            raise CommandError("--truncate-dims must be a comma-separated list of integers")
+
+        dim = BotSettingsService.get_bot_settings(business_id)['embedding_dim']
+        queries = list(
+            Embedding.objects.filter(business_id=business_id, dimensions=dim, is_active=True)
+            .order_by('?')
+            .values_list('vector', flat=True)[:options['queries']]
+        )
+        if not queries:
+            raise CommandError(f"No {dim}-dimensional embeddings found for business {business_id}")
+
+        variants = [('full', lambda v: self._ann(business_id, dim, v, top_k))]
+        for precision in ('half', 'binary'):
+            variants.append((precision, lambda v, p=precision: EmbeddingSearchService.two_stage_search(
+                business_id, dim, v, top_k, -1.0, p, rerank_factor=rerank_factor
+            )))
+        for prefix in truncate_dims:
+            if not 1 <= prefix < dim:
+                raise CommandError(f"--truncate-dims values must be positive and smaller than {dim}")
+            variants.append((f'truncated:{prefix}', lambda v, d=prefix: EmbeddingSearchService.two_stage_search(
+                business_id, dim, v, top_k, -1.0, truncate_dim=d, rerank_factor=rerank_factor
+            )))
+
+        # Referencia exacta: recorrido secuencial sin índices ANN
+        ground_truth = []
+        for vector in queries:
+            with transaction.atomic():
+                EmbeddingSearchService.apply_index_tuning(exact=True)
+                ground_truth.append({r['id'] for r in self._ann(business_id, dim, vector, top_k)})
+
+        self.stdout.write(f"{len(queries)} consultas, dim={dim}, top_k={top_k}, rerank_factor={rerank_factor}")
+        self.stdout.write(f"{'variante':<16}{'recall@k':>10}{'p50 ms':>10}{'p95 ms':>10}")
+
+        for name, search in variants:
+            recalls, latencies = [], []
+            for vector, expected in zip(queries, ground_truth):
+                try:
+                    with transaction.atomic():
+                        EmbeddingSearchService.apply_index_tuning(
+                            ef_search=options['ef_search'] or max(top_k * rerank_factor, 40)
+                        )
+                        start = time.perf_counter()
+                        results = search(vector)
+                        latencies.append((time.perf_counter() - start) * 1000)
+                except Exception as e:
+                    self.stdout.write(self.style.WARNING(f"{name:<16}omitida: {e}"))
+                    break
+                found = {str(r['id']) for r in results}
+                recalls.append(len(found & {str(i) for i in expected}) / max(len(expected), 1))
+            else:
+                latencies.sort()
+                p50 = latencies[len(latencies) // 2]
+                p95 = latencies[min(int(len(latencies) * 0.95), len(latencies) - 1)]
+                recall = sum(recalls) / len(recalls)
+                self.stdout.write(f"{name:<16}{recall:>10.3f}{p50:>10.2f}{p95:>10.2f}")
+
+    def _ann(self, business_id, dim, vector, top_k):
+        table = Embedding._meta.db_table
+        distance = EmbeddingSearchService.distance_sql(dim, query='%(vector)s')
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                SELECT e.id FROM {table} e
+                WHERE e.business_id = %(business_id)s AND e.dimensions = {int(dim)} AND e.is_active
+                ORDER BY {distance}
+                LIMIT %(top_k)s
+                """,
+                {
+                    'business_id': str(business_id),
+                    'vector': EmbeddingSearchService.to_vector_literal(vector),
+                    'top_k': top_k
+                }
+            )
+            return [{'id': row[0]} for row in cursor.fetchall()]
@@ -0,0 +1,88 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from adminchat.models import BotSettings, Embedding, EmbeddingSource
+from adminchat.services.cache_service import SearchResultCache
+
+
+class Command(BaseCommand):
+    help = (
+        "Elimina embeddings duplicados que dejaron las ingestas anteriores a la ingesta "
+        "idempotente: por cada origen y chunk_index se conserva la fila activa más reciente. "
+        "También elimina filas inactivas huérfanas de ingestas que fallaron antes de publicar, "
+        "según el estado del origen (EmbeddingSource), nunca por su antigüedad: una ingesta "
+        "larga en curso conserva sus filas."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--business', help="Limita la limpieza a un negocio")
+        parser.add_argument('--dry-run', action='store_true', help="Solo informa, no elimina")
+
+    def handle(self, *args, **options):
+        table = Embedding._meta.db_table
+        source_table = EmbeddingSource._meta.db_table
+        settings_table = BotSettings._meta.db_table
+        business_clause = "AND e.business_id = %(business_id)s" if options['business'] else ""
+        params = {'business_id': options['business']}
+
+        # Duplicados: misma posición del mismo origen y modelo (durante una migración de
+        # modelo conviven las filas de los dos); gana la fila más reciente
+        duplicates_sql = f"""
+            SELECT id, business_id FROM (
+                SELECT id, business_id, ROW_NUMBER() OVER (
+                    PARTITION BY business_id, source_type, source_id, model_name, chunk_index
+                    ORDER BY generation DESC, created_at DESC, id DESC
+                ) AS rn
+                FROM {table} e
+                WHERE e.is_active AND e.chunk_index IS NOT NULL {business_clause}
+            ) d
+            WHERE d.rn > 1
+        """
+        # Huérfanas: inactivas de una generación ya superada (la generación en sombra para
+        # las filas del modelo pendiente), de la última generación asignada cuando esta ya
+        # no está en curso (falló), o sin origen. Una generación anterior a la última que
+        # no se ha publicado puede seguir en curso: se resuelve al publicar el origen
+        orphans_sql = f"""
+            SELECT e.id, e.business_id
+            FROM {table} e
+            LEFT JOIN {source_table} s
+              ON s.business_id = e.business_id
+             AND s.source_type = e.source_type
+             AND s.source_id = e.source_id
+            LEFT JOIN {settings_table} b ON b.business_id = e.business_id
+            WHERE NOT e.is_active {business_clause}
+              AND (
+                s.id IS NULL
+                OR e.generation <= CASE
+                    WHEN e.model_name = b.pending_embedding_model_name THEN s.shadow_generation
+                    ELSE s.generation
+                END
+                OR (e.generation = s.last_generation AND s.status <> 'ingesting')
+                OR e.generation > s.last_generation
+              )
+        """
+
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute(duplicates_sql, params)
+                duplicates = cursor.fetchall()
+                cursor.execute(orphans_sql, params)
+                orphans = cursor.fetchall()
+
+            self.stdout.write(f"Duplicados: {len(duplicates)}; huérfanas inactivas: {len(orphans)}")
+            if options['dry_run'] or not (duplicates or orphans):
+                return
+
+            ids = [row[0] for row in duplicates + orphans]
+            deleted = 0
+            for start in range(0, len(ids), 5000):
+                count, _ = Embedding.objects.filter(id__in=ids[start:start + 5000]).delete()
+                deleted += count
+
+            business_ids = {row[1] for row in duplicates + orphans}
+
+            def bump_versions():
+                for business_id in business_ids:
+                    SearchResultCache.bump_corpus_version(business_id)
+            transaction.on_commit(bump_versions)
+
+        self.stdout.write(self.style.SUCCESS(f"Eliminados {deleted} embeddings."))
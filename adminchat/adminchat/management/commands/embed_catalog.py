@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand, CommandError
+from adminchat.models import Business
+from adminchat.tasks import create_catalog_embeddings_task
+
+
+class Command(BaseCommand):
+    help = (
+        "Vectoriza el catálogo de productos de un negocio (o los productos indicados) por "
+        "lotes de CATALOG_INGESTION_BATCH_SIZE: una consulta, una llamada al servicio de "
+        "embeddings y un COPY por lote. Por defecto se ejecuta en este proceso; con --async "
+        "se encola en Celery."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--business', required=True, help="Negocio cuyo catálogo se vectoriza")
+        parser.add_argument('--products', nargs='+', metavar='PRODUCT_ID',
+                            help="Limita la ingesta a estos productos")
+        parser.add_argument('--products-file',
+                            help="Fichero con un ID de producto por línea (importaciones grandes)")
+        parser.add_argument('--async', dest='run_async', action='store_true',
+                            help="Encola la tarea en Celery en lugar de ejecutarla aquí")
+
+    def handle(self, *args, **options):
+        business_id = options['business']
+        if not Business.objects.filter(id=business_id).exists():
+            raise CommandError(f"Business not found: {business_id}")
+
+        product_ids = None
+        if options['products'] or options['products_file']:
+            product_ids = list(options['products'] or [])
+            if options['products_file']:
+                with open(options['products_file']) as products_file:
+                    product_ids.extend(line.strip() for line in products_file if line.strip())
+
+        if options['run_async']:
+            task = create_catalog_embeddings_task.delay(business_id, product_ids)
+            self.stdout.write(self.style.SUCCESS(f"Encolado en la tarea {task.id}"))
+            return
+
+        result = create_catalog_embeddings_task.apply(args=[business_id, product_ids])
+        if result.failed():
+            raise CommandError(f"Catalog ingestion failed: {result.result}")
+
+        summary = result.result
+        self.stdout.write(
+            f"{summary['products_done']}/{summary['products_total']} productos, "
+            f"{summary['chunks_count']} chunks; {summary['embeddings_created']} embeddings nuevos y "
+            f"{summary['embeddings_reused']} reutilizados"
+        )
+        if summary['products_missing']:
+            self.stdout.write(self.style.WARNING(f"{summary['products_missing']} productos no encontrados"))
+        if summary['failed']:
+            self.stdout.write(self.style.WARNING(f"{len(summary['failed'])} productos fallidos"))
+        else:
+            self.stdout.write(self.style.SUCCESS("Catálogo vectorizado"))
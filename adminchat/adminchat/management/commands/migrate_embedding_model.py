@@ -0,0 +1,90 @@
+from django.core.management.base import BaseCommand, CommandError
+from adminchat.services.model_migration_service import ModelMigrationService
+from adminchat.services.reindex_service import ReindexService
+from adminchat.tasks import reindex_business_task, schedule_model_garbage_collection
+
+
+class Command(BaseCommand):
+    help = (
+        "Migra un negocio a otro modelo de embeddings sin cortar la búsqueda: re-indexa en "
+        "sombra con el modelo nuevo (ReindexJob) y hace el cutover al terminar. Por defecto "
+        "el trabajo se ejecuta en este proceso; con --async se encola en Celery. --status, "
+        "--cutover, --cancel y --gc gestionan una migración ya iniciada."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--business', required=True, help="Negocio a migrar")
+        parser.add_argument('--model', help="Modelo de embeddings nuevo")
+        parser.add_argument('--dim', type=int, help="Dimensión de los vectores del modelo nuevo")
+        parser.add_argument('--async', dest='run_async', action='store_true',
+                            help="Encola el trabajo en sombra en Celery en lugar de ejecutarlo aquí")
+        action = parser.add_mutually_exclusive_group()
+        action.add_argument('--status', action='store_true', help="Muestra el estado de la migración")
+        action.add_argument('--cutover', action='store_true',
+                            help="Activa el modelo pendiente (si todos los orígenes están vectorizados)")
+        action.add_argument('--cancel', action='store_true', help="Cancela la migración en curso")
+        action.add_argument('--gc', action='store_true',
+                            help="Elimina ya las filas de modelos retirados")
+
+    def handle(self, *args, **options):
+        business_id = options['business']
+        try:
+            if options['status']:
+                return self.print_status(business_id)
+            if options['cutover']:
+                embedding_model = ModelMigrationService.cutover(business_id)
+                schedule_model_garbage_collection(business_id)
+                self.stdout.write(self.style.SUCCESS(f"Modelo activo: {embedding_model}"))
+                return
+            if options['cancel']:
+                ModelMigrationService.cancel(business_id)
+                schedule_model_garbage_collection(business_id)
+                self.stdout.write(self.style.SUCCESS("Migración cancelada"))
+                return
+            if options['gc']:
+                deleted = ModelMigrationService.collect_garbage(business_id)
+                self.stdout.write(self.style.SUCCESS(f"Eliminados {deleted} embeddings de modelos retirados"))
+                return
+
+            if not options['model'] or not options['dim']:
+                raise CommandError("--model and --dim are required to start a migration")
+            job = ModelMigrationService.start(business_id, options['model'], options['dim'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(
+            f"Trabajo en sombra {job.id}: {job.documents_total} documentos y {job.products_total} "
+            f"productos con {job.embedding_model}"
+        )
+
+        if options['run_async']:
+            task = reindex_business_task.delay(str(job.id))
+            ReindexService.set_task(job, task.id)
+            self.stdout.write(self.style.SUCCESS(f"Encolado en la tarea {task.id}"))
+            return
+
+        result = reindex_business_task.apply(args=[str(job.id)])
+        if result.failed():
+            raise CommandError(
+                f"Shadow reindex job {job.id} failed: {result.result}. "
+                f"Resume it with reindex_business --resume {job.id}"
+            )
+        self.print_status(business_id)
+
+    def print_status(self, business_id):
+        status = ModelMigrationService.status(business_id)
+        self.stdout.write(f"Modelo activo: {status['embedding_model_name']} ({status['embedding_dim']})")
+        if not status['pending_embedding_model_name']:
+            self.stdout.write("Sin migración en curso")
+        else:
+            self.stdout.write(
+                f"Modelo pendiente: {status['pending_embedding_model_name']} ({status['pending_embedding_dim']})"
+            )
+            for source_type, counts in status['coverage'].items():
+                self.stdout.write(f"  {source_type}: {counts['ready']}/{counts['total']} vectorizados")
+        if status['job']:
+            job = status['job']
+            self.stdout.write(
+                f"Último trabajo en sombra {job['job_id']}: {job['status']} "
+                f"({job['sources_failed']} orígenes fallidos)"
+            )
@@ -0,0 +1,124 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from adminchat.models import BotSettings, Embedding
+
+# Nombre del índice y expresión indexada (con su operator class) por método. Todos son
+# parciales (WHERE dimensions = vector_dim): uno por dimensión de embedding soportada
+INDEXES = {
+    'hnsw': ('chat_embedding_v{vector_dim}_hnsw', '(vector::vector({vector_dim})) vector_cosine_ops'),
+    'half': ('chat_embedding_v{vector_dim}_half_hnsw', '(vector::halfvec({vector_dim})) halfvec_cosine_ops'),
+    'binary': ('chat_embedding_v{vector_dim}_bit_hnsw', '(binary_quantize(vector)::bit({vector_dim})) bit_hamming_ops'),
+    'ivfflat': ('chat_embedding_v{vector_dim}_ivfflat', '(vector::vector({vector_dim})) vector_cosine_ops'),
+    'truncated': ('chat_embedding_v{vector_dim}_t{dims}_hnsw',
+                  '(subvector(vector, 1, {dims})::vector({dims})) vector_cosine_ops'),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconstruye (o crea) de forma concurrente un índice ANN de chat_embedding.vector. "
+        "Los índices HNSW (hnsw, half, binary) se reindexan con REINDEX CONCURRENTLY; IVFFlat "
+        "se construye con un nombre temporal y se intercambia para no bloquear las búsquedas."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--method', choices=list(INDEXES), default='hnsw',
+                            help="hnsw: vector completo; half: halfvec; binary: binary_quantize; "
+                                 "truncated: primeros --dims componentes (Matryoshka); ivfflat")
+        parser.add_argument('--vector-dim', type=int, default=1024,
+                            choices=[dim for dim, _ in BotSettings.EMBEDDING_DIMENSIONS],
+                            help="Dimensión de los embeddings cuyo índice parcial se construye")
+        parser.add_argument('--dims', type=int, default=256, help="truncated: componentes del prefijo")
+        parser.add_argument('--m', type=int, default=16, help="HNSW: conexiones por nodo")
+        parser.add_argument('--ef-construction', type=int, default=64, help="HNSW: candidatos en construcción")
+        parser.add_argument('--lists', type=int, help="IVFFlat: número de listas (default: filas / 1000)")
+        parser.add_argument('--recreate', action='store_true',
+                            help="HNSW: vuelve a crear el índice con los parámetros indicados en vez de REINDEX")
+        parser.add_argument('--drop', action='store_true', help="Elimina el índice del método indicado")
+        parser.add_argument('--force', action='store_true',
+                            help="--drop: elimina el índice aunque lo use la búsqueda de algún negocio")
+        parser.add_argument('--maintenance-work-mem', default=None,
+                            help="Valor de maintenance_work_mem para la construcción (ej: 1GB)")
+
+    def handle(self, *args, **options):
+        method = options['method']
+        vector_dim = options['vector_dim']
+        index_name, expression = INDEXES[method]
+        index_name = index_name.format(vector_dim=vector_dim, dims=int(options['dims']))
+        expression = expression.format(vector_dim=vector_dim, dims=int(options['dims']))
+        if method == 'truncated' and not 1 <= options['dims'] < vector_dim:
+            raise CommandError("--dims must be positive and smaller than --vector-dim")
+
+        # Las operaciones CONCURRENTLY no pueden ejecutarse en una transacción
+        if not connection.get_autocommit():
+            raise CommandError("This command must run in autocommit mode")
+
+        with connection.cursor() as cursor:
+            if options['maintenance_work_mem']:
+                cursor.execute("SELECT set_config('maintenance_work_mem', %s, false)",
+                               [options['maintenance_work_mem']])
+
+            if options['drop']:
+                users = self._index_users(method, vector_dim, options['dims'])
+                if users and not options['force']:
+                    raise CommandError(
+                        f"{index_name} is used by {users}; its searches would fall back to a "
+                        f"sequential scan. Use --force to drop it anyway"
+                    )
+                self.stdout.write(f"Eliminando índice {index_name}...")
+                cursor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS "{index_name}"')
+                self.stdout.write(self.style.SUCCESS("Índice eliminado."))
+                return
+
+            exists = self._index_exists(cursor, index_name)
+
+            if method != 'ivfflat' and exists and not options['recreate']:
+                self.stdout.write(f"Reindexando {index_name} (CONCURRENTLY)...")
+                cursor.execute(f'REINDEX INDEX CONCURRENTLY "{index_name}"')
+                self.stdout.write(self.style.SUCCESS("Índice reconstruido."))
+                return
+
+            if method != 'ivfflat':
+                using = (
+                    f"hnsw ({expression}) "
+                    f"WITH (m = {int(options['m'])}, ef_construction = {int(options['ef_construction'])})"
+                )
+            else:
+                lists = options['lists'] or max(Embedding.objects.filter(dimensions=vector_dim).count() // 1000, 1)
+                using = f"ivfflat ({expression}) WITH (lists = {int(lists)})"
+            using += f" WHERE dimensions = {int(vector_dim)}"
+
+            self._build_and_swap(cursor, index_name, using, exists)
+
+    def _index_users(self, method, vector_dim, dims):
+        """Describe qué búsquedas usan el índice (vacío si ninguna)"""
+        bot_settings = BotSettings.objects.filter(embedding_dim=vector_dim)
+        if method == 'hnsw':
+            # Precisión 'full', búsqueda híbrida y search_batch
+            return 'every vector search of this dimension'
+        if method in ('half', 'binary'):
+            count = bot_settings.filter(search_vector_precision=method).count()
+        elif method == 'truncated':
+            count = bot_settings.filter(search_truncate_dim=dims).count()
+        else:
+            return ''
+        return f"{count} businesses" if count else ''
+
+    def _index_exists(self, cursor, index_name):
+        cursor.execute("SELECT to_regclass(%s) IS NOT NULL", [index_name])
+        return cursor.fetchone()[0]
+
+    def _build_and_swap(self, cursor, index_name, using, exists):
+        """Construye el índice con un nombre temporal y lo intercambia por el actual"""
+        table = Embedding._meta.db_table
+        build_name = f"{index_name}_new" if exists else index_name
+
+        self.stdout.write(f"Construyendo {build_name} USING {using} (CONCURRENTLY)...")
+        cursor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS "{index_name}_new"')
+        cursor.execute(f'CREATE INDEX CONCURRENTLY "{build_name}" ON "{table}" USING {using}')
+
+        if exists:
+            cursor.execute(f'DROP INDEX CONCURRENTLY "{index_name}"')
+            cursor.execute(f'ALTER INDEX "{build_name}" RENAME TO "{index_name}"')
+
+        self.stdout.write(self.style.SUCCESS(f"Índice {index_name} listo."))
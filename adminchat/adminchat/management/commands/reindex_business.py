@@ -0,0 +1,63 @@
+from django.core.management.base import BaseCommand, CommandError
+from adminchat.models import ReindexJob
+from adminchat.services.reindex_service import ReindexService
+from adminchat.tasks import reindex_business_task
+
+
+class Command(BaseCommand):
+    help = (
+        "Re-indexa todos los documentos y productos de un negocio con su modelo de "
+        "embeddings actual (ReindexJob). Por defecto se ejecuta en este proceso; con "
+        "--async se encola en Celery. --resume continúa un trabajo fallido, cancelado o "
+        "abandonado desde su cursor."
+    )
+
+    def add_arguments(self, parser):
+        target = parser.add_mutually_exclusive_group(required=True)
+        target.add_argument('--business', help="Negocio a re-indexar (crea un trabajo nuevo)")
+        target.add_argument('--resume', metavar='JOB_ID', help="Reanuda un trabajo existente")
+        parser.add_argument('--async', dest='run_async', action='store_true',
+                            help="Encola el trabajo en Celery en lugar de ejecutarlo aquí")
+
+    def handle(self, *args, **options):
+        try:
+            if options['resume']:
+                job = ReindexService.resume(ReindexJob.objects.get(id=options['resume']))
+            else:
+                job = ReindexService.create(options['business'])
+        except ReindexJob.DoesNotExist:
+            raise CommandError(f"Reindex job not found: {options['resume']}")
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(
+            f"Trabajo {job.id}: {job.documents_total} documentos y {job.products_total} productos "
+            f"con {job.embedding_model} (fase {job.phase}, cursor {job.cursor})"
+        )
+
+        if options['run_async']:
+            task = reindex_business_task.delay(str(job.id))
+            ReindexService.set_task(job, task.id)
+            self.stdout.write(self.style.SUCCESS(f"Encolado en la tarea {task.id}"))
+            return
+
+        result = reindex_business_task.apply(args=[str(job.id)])
+        if result.failed():
+            raise CommandError(
+                f"Reindex job {job.id} failed: {result.result}. "
+                f"Resume it with --resume {job.id}"
+            )
+
+        summary = result.result
+        if summary['status'] == 'skipped':
+            raise CommandError(f"Reindex job {job.id} is no longer pending (cancelled or taken by another worker)")
+        self.stdout.write(
+            f"{summary['documents_done']}/{summary['documents_total']} documentos, "
+            f"{summary['products_done']}/{summary['products_total']} productos, "
+            f"{summary['sources_failed']} fallidos; {summary['embeddings_created']} embeddings "
+            f"nuevos y {summary['embeddings_reused']} reutilizados"
+        )
+        if summary['status'] != 'completed':
+            self.stdout.write(self.style.WARNING(f"Trabajo {summary['status']}"))
+        else:
+            self.stdout.write(self.style.SUCCESS("Re-indexación completada"))
@@ -0,0 +1,83 @@
+import hashlib
+import json
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+from django.core.management.base import BaseCommand
+from adminchat.services.embedding_service import EmbeddingClient
+
+
+class Command(BaseCommand):
+    help = (
+        "Levanta un servicio de embeddings local (sin modelo) compatible con "
+        "/api/v1/embeddings/generate para probar la ingesta sin red. Devuelve vectores "
+        "deterministas por texto, en JSON o en float32 binario según la cabecera Accept. "
+        "Uso: URL_EMBEDDING=http://localhost:<port>"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8001)
+        parser.add_argument('--dim', type=int, default=1024, help="Dimensión de los vectores")
+        parser.add_argument('--latency-ms', type=float, default=0,
+                            help="Latencia simulada por petición")
+
+    def handle(self, *args, **options):
+        dim = options['dim']
+        latency = options['latency_ms'] / 1000
+        stdout = self.stdout
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # keep-alive, como el servicio real
+
+            def do_POST(self):
+                if self.path.rstrip('/') != '/api/v1/embeddings/generate':
+                    self._send(404, 'application/json', b'{"detail": "Not found"}')
+                    return
+                length = int(self.headers.get('Content-Length', 0))
+                try:
+                    texts = json.loads(self.rfile.read(length))['texts']
+                except (ValueError, KeyError, TypeError):
+                    self._send(422, 'application/json', b'{"detail": "texts is required"}')
+                    return
+
+                if latency:
+                    time.sleep(latency)
+                matrix = np.stack([stub_vector(text, dim) for text in texts]) if texts else np.empty((0, dim), '<f4')
+
+                if EmbeddingClient.BINARY_CONTENT_TYPE in self.headers.get('Accept', ''):
+                    self._send(200, EmbeddingClient.BINARY_CONTENT_TYPE, matrix.astype('<f4').tobytes(),
+                               {EmbeddingClient.DIM_HEADER: str(dim)})
+                else:
+                    body = json.dumps({'embeddings': matrix.tolist()}).encode('utf-8')
+                    self._send(200, 'application/json', body)
+
+            def _send(self, code, content_type, body, headers=None):
+                self.send_response(code)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                stdout.write(f"{self.address_string()} {format % args}")
+
+        server = ThreadingHTTPServer((options['host'], options['port']), Handler)
+        self.stdout.write(self.style.SUCCESS(
+            f"Stub embedder en http://{options['host']}:{options['port']} (dim={dim})"
+        ))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+
+
+def stub_vector(text, dim):
+    """Vector unitario determinista a partir del hash del texto"""
+    seed = int.from_bytes(hashlib.sha256(text.encode('utf-8')).digest()[:8], 'little')
+    vector = np.random.default_rng(seed).standard_normal(dim).astype('<f4')
+    return vector / np.linalg.norm(vector)
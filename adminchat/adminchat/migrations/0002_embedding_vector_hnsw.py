@@ -0,0 +1,28 @@
+# Índice HNSW sobre chat_embedding.vector para búsqueda aproximada (ANN)
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations
+from pgvector.django import HnswIndex
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY no puede ejecutarse dentro de una transacción
+    atomic = False
+
+    dependencies = [
+        ("adminchat", "0001_initial"),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="embedding",
+            index=HnswIndex(
+                name="chat_embedding_vector_hnsw",
+                fields=["vector"],
+                m=16,
+                ef_construction=64,
+                opclasses=["vector_cosine_ops"],
+            ),
+        ),
+    ]
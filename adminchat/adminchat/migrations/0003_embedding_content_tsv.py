@@ -0,0 +1,34 @@
+# Columna tsvector generada + índice GIN sobre chat_embedding.content para la búsqueda híbrida
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY no puede ejecutarse dentro de una transacción
+    atomic = False
+
+    dependencies = [
+        ("adminchat", "0002_embedding_vector_hnsw"),
+    ]
+
+    operations = [
+        # La columna no forma parte del modelo: la mantiene Postgres y solo la lee
+        # EmbeddingSearchService. Se usa la configuración 'simple' para no alterar
+        # códigos SKU ni nombres propios y servir igual textos en español e inglés.
+        migrations.RunSQL(
+            sql="""
+                ALTER TABLE chat_embedding
+                ADD COLUMN IF NOT EXISTS content_tsv tsvector
+                GENERATED ALWAYS AS (to_tsvector('simple', coalesce(content, ''))) STORED
+            """,
+            reverse_sql="ALTER TABLE chat_embedding DROP COLUMN IF EXISTS content_tsv",
+        ),
+        migrations.RunSQL(
+            sql="""
+                CREATE INDEX CONCURRENTLY IF NOT EXISTS chat_embedding_content_tsv_gin
+                ON chat_embedding USING gin (content_tsv)
+            """,
+            reverse_sql="DROP INDEX CONCURRENTLY IF EXISTS chat_embedding_content_tsv_gin",
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Índice GIN (jsonb_path_ops) sobre chat_embedding.metadata para filtros de contención
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY no puede ejecutarse dentro de una transacción
+    atomic = False
+
+    dependencies = [
+        ("adminchat", "0003_embedding_content_tsv"),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="embedding",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["metadata"],
+                name="chat_embedding_metadata_gin",
+                opclasses=["jsonb_path_ops"],
+            ),
+        ),
+    ]
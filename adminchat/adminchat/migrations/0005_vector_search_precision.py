@@ -0,0 +1,58 @@
+# Índices ANN cuantizados (halfvec) y configuración de precisión de búsqueda por negocio.
+# Requiere pgvector >= 0.7 (halfvec, binary_quantize).
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY no puede ejecutarse dentro de una transacción
+    atomic = False
+
+    dependencies = [
+        ("adminchat", "0004_embedding_metadata_gin"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="botsettings",
+            name="search_vector_precision",
+            field=models.CharField(
+                choices=[
+                    ("full", "Precisión completa (vector)"),
+                    ("half", "Media precisión (halfvec)"),
+                    ("binary", "Cuantización binaria (bit)"),
+                ],
+                default="full",
+                max_length=10,
+            ),
+        ),
+        migrations.AddField(
+            model_name="botsettings",
+            name="search_rerank",
+            field=models.BooleanField(default=True),
+        ),
+        migrations.AddField(
+            model_name="botsettings",
+            name="search_rerank_factor",
+            field=models.IntegerField(default=4),
+        ),
+        # La copia halfvec vive solo en el índice (índice de expresión): la tabla conserva
+        # el vector completo para el re-ranking y no hace falta rellenar ninguna columna.
+        # El índice binario (bit) es opcional: rebuild_vector_index --method binary
+        #
+        # El índice HNSW completo (0002) se mantiene: lo usan la precisión 'full' (default),
+        # la búsqueda híbrida y search_batch. Con 1024 dimensiones cada fila ocupa ~4,3 KB en
+        # el índice completo y ~2,2 KB en el halfvec, así que los dos juntos ocupan ~50 % más
+        # que el completo solo; lo que baja a la mitad es el conjunto de páginas que recorre
+        # una búsqueda 'half'. Sin negocios en 'half' el índice sobra:
+        # rebuild_vector_index --method half --vector-dim N --drop
+        migrations.RunSQL(
+            sql="""
+                CREATE INDEX CONCURRENTLY IF NOT EXISTS chat_embedding_vector_half_hnsw
+                ON chat_embedding USING hnsw ((vector::halfvec(1024)) halfvec_cosine_ops)
+                WITH (m = 16, ef_construction = 64)
+            """,
+            reverse_sql="DROP INDEX CONCURRENTLY IF EXISTS chat_embedding_vector_half_hnsw",
+        ),
+    ]
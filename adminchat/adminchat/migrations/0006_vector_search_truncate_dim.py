@@ -0,0 +1,31 @@
+# Búsqueda Matryoshka: primera etapa ANN sobre los primeros N componentes del vector.
+# El prefijo vive solo en un índice de expresión; la tabla conserva el vector completo
+# para el re-ranking. Otras dimensiones: rebuild_vector_index --method truncated --dims N
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY no puede ejecutarse dentro de una transacción
+    atomic = False
+
+    dependencies = [
+        ("adminchat", "0005_vector_search_precision"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="botsettings",
+            name="search_truncate_dim",
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.RunSQL(
+            sql="""
+                CREATE INDEX CONCURRENTLY IF NOT EXISTS chat_embedding_vector_t256_hnsw
+                ON chat_embedding USING hnsw ((subvector(vector, 1, 256)::vector(256)) vector_cosine_ops)
+                WITH (m = 16, ef_construction = 64)
+            """,
+            reverse_sql="DROP INDEX CONCURRENTLY IF EXISTS chat_embedding_vector_t256_hnsw",
+        ),
+    ]
@@ -0,0 +1,117 @@
+# Almacenamiento por dimensión: chat_embedding.vector deja de estar fijado a vector(1024)
+# y cada dimensión soportada (BotSettings.EMBEDDING_DIMENSIONS) tiene su propio índice HNSW
+# parcial (WHERE dimensions = N) sobre la expresión vector::vector(N). Un modelo de 384
+# dimensiones ya no ocupa filas ni índices de 1024.
+#
+# Migración OFFLINE (ventana de mantenimiento, sin tráfico de búsqueda): el índice HNSW
+# sobre la columna exige que esta tenga dimensión fija, así que se elimina antes del
+# ALTER ... TYPE vector, que reescribe la tabla con un bloqueo exclusivo (bloquea también
+# las lecturas). Hasta que terminan los AddIndexConcurrently siguientes la búsqueda
+# recorre la tabla entera. No se pueden crear antes los índices nuevos: el ALTER los
+# reconstruiría dentro del bloqueo.
+
+from django.contrib.postgres.indexes import OpClass
+from django.contrib.postgres.operations import AddIndexConcurrently, RemoveIndexConcurrently
+from django.db import migrations, models
+from django.db.models.functions import Cast
+import pgvector.django
+
+
+EMBEDDING_DIMENSIONS = [
+    (384, "384 (bge-small, MiniLM)"),
+    (768, "768 (bge-base, mpnet)"),
+    (1024, "1024 (bge-large, e5-large)"),
+]
+
+
+def normalize_embedding_dim(apps, schema_editor):
+    """embedding_dim era texto libre: los valores no soportados pasan a 1024 (la dimensión almacenada)"""
+    BotSettings = apps.get_model("adminchat", "BotSettings")
+    supported = {str(dim) for dim, _ in EMBEDDING_DIMENSIONS}
+    for bot_settings in BotSettings.objects.all():
+        value = (bot_settings.embedding_dim or "").strip()
+        normalized = value if value in supported else "1024"
+        if normalized != bot_settings.embedding_dim:
+            bot_settings.embedding_dim = normalized
+            bot_settings.save(update_fields=["embedding_dim"])
+
+
+def hnsw_index(dim):
+    return pgvector.django.HnswIndex(
+        OpClass(
+            Cast("vector", pgvector.django.VectorField(dimensions=dim)),
+            name="vector_cosine_ops",
+        ),
+        condition=models.Q(dimensions=dim),
+        ef_construction=64,
+        m=16,
+        name=f"chat_embedding_v{dim}_hnsw",
+    )
+
+
+class Migration(migrations.Migration):
+
+    # CREATE/DROP INDEX CONCURRENTLY no puede ejecutarse dentro de una transacción
+    atomic = False
+
+    dependencies = [
+        ("adminchat", "0006_vector_search_truncate_dim"),
+    ]
+
+    operations = [
+        # Los índices sobre la columna/expresiones de 1024 dimensiones se sustituyen por
+        # índices parciales por dimensión
+        RemoveIndexConcurrently(
+            model_name="embedding",
+            name="chat_embedding_vector_hnsw",
+        ),
+        migrations.RunSQL(
+            # Una sentencia por ejecución: varias en la misma forman un bloque de transacción
+            sql=[
+                "DROP INDEX CONCURRENTLY IF EXISTS chat_embedding_vector_half_hnsw",
+                "DROP INDEX CONCURRENTLY IF EXISTS chat_embedding_vector_bit_hnsw",
+                "DROP INDEX CONCURRENTLY IF EXISTS chat_embedding_vector_t256_hnsw",
+                "DROP INDEX CONCURRENTLY IF EXISTS chat_embedding_vector_ivfflat",
+            ],
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AlterField(
+            model_name="embedding",
+            name="vector",
+            field=pgvector.django.VectorField(),
+        ),
+        # Las filas existentes son todas de 1024 dimensiones
+        migrations.AddField(
+            model_name="embedding",
+            name="dimensions",
+            field=models.IntegerField(choices=EMBEDDING_DIMENSIONS, default=1024, editable=False),
+            preserve_default=False,
+        ),
+        migrations.RunPython(normalize_embedding_dim, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="botsettings",
+            name="embedding_dim",
+            field=models.IntegerField(choices=EMBEDDING_DIMENSIONS, default=1024),
+        ),
+        *[AddIndexConcurrently(model_name="embedding", index=hnsw_index(dim)) for dim, _ in EMBEDDING_DIMENSIONS],
+        # Primeras etapas cuantizada y truncada de 0005/0006, ahora parciales por dimensión.
+        # Para otras dimensiones: rebuild_vector_index --method half|truncated --vector-dim N
+        migrations.RunSQL(
+            sql="""
+                CREATE INDEX CONCURRENTLY IF NOT EXISTS chat_embedding_v1024_half_hnsw
+                ON chat_embedding USING hnsw ((vector::halfvec(1024)) halfvec_cosine_ops)
+                WITH (m = 16, ef_construction = 64)
+                WHERE dimensions = 1024
+            """,
+            reverse_sql="DROP INDEX CONCURRENTLY IF EXISTS chat_embedding_v1024_half_hnsw",
+        ),
+        migrations.RunSQL(
+            sql="""
+                CREATE INDEX CONCURRENTLY IF NOT EXISTS chat_embedding_v1024_t256_hnsw
+                ON chat_embedding USING hnsw ((subvector(vector, 1, 256)::vector(256)) vector_cosine_ops)
+                WITH (m = 16, ef_construction = 64)
+                WHERE dimensions = 1024
+            """,
+            reverse_sql="DROP INDEX CONCURRENTLY IF EXISTS chat_embedding_v1024_t256_hnsw",
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Huella de contenido por chunk para la re-ingesta incremental (create_embeddings_task).
+# Las filas existentes quedan con '' y se re-vectorizan una sola vez en su próxima ingesta.
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("adminchat", "0007_embedding_dimensions"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="embedding",
+            name="content_hash",
+            field=models.CharField(blank=True, default="", max_length=64),
+        ),
+    ]
@@ -0,0 +1,70 @@
+# Ingesta idempotente por origen: generación y estado de publicación de cada embedding,
+# y tabla de estado por origen (business, source_type, source_id).
+
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("adminchat", "0008_embedding_content_hash"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="embedding",
+            name="generation",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="embedding",
+            name="is_active",
+            field=models.BooleanField(default=True),
+        ),
+        migrations.CreateModel(
+            name="EmbeddingSource",
+            fields=[
+                ("id", models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                (
+                    "source_type",
+                    models.CharField(
+                        choices=[
+                            ("document", "Documento"),
+                            ("product", "Producto/Servicio"),
+                            ("intent_example", "Ejemplo de Intención"),
+                            ("message", "Mensaje"),
+                            ("other", "Otro"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("source_id", models.UUIDField()),
+                ("generation", models.PositiveIntegerField(default=0)),
+                ("last_generation", models.PositiveIntegerField(default=0)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "business",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="embedding_sources",
+                        to="adminchat.business",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Embedding Source",
+                "verbose_name_plural": "Embedding Sources",
+                "db_table": "chat_embedding_source",
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="embeddingsource",
+            constraint=models.UniqueConstraint(
+                fields=("business", "source_type", "source_id"),
+                name="chat_embedding_source_unique",
+            ),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Caché persistente del texto extraído de los documentos (DocumentTextService)
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("adminchat", "0009_embedding_generation"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="document",
+            name="content_text_compressed",
+            field=models.BinaryField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="document",
+            name="extraction_key",
+            field=models.CharField(blank=True, default="", max_length=80),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Motor de chunking configurable: estrategia, unidad de longitud y tokenizador
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("adminchat", "0010_document_extraction_cache"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="chunkingsettings",
+            name="strategy",
+            field=models.CharField(
+                choices=[("words", "Ventana fija de palabras"), ("sentences", "Oraciones y párrafos")],
+                default="words",
+                max_length=20,
+            ),
+        ),
+        migrations.AddField(
+            model_name="chunkingsettings",
+            name="length_unit",
+            field=models.CharField(
+                choices=[("words", "Palabras"), ("tokens", "Tokens")],
+                default="words",
+                max_length=20,
+            ),
+        ),
+        migrations.AddField(
+            model_name="chunkingsettings",
+            name="tokenizer",
+            field=models.CharField(
+                blank=True,
+                default="",
+                help_text="Tokenizador local para length_unit=tokens (regex, tiktoken:<encoding>, hf:<ruta>); vacío usa CHUNK_TOKENIZER",
+                max_length=255,
+            ),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Estado de la última ingesta de cada origen (la ingesta por shards lo pasa a ready al publicar)
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("adminchat", "0011_chunking_strategy"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="embeddingsource",
+            name="status",
+            field=models.CharField(
+                choices=[("ingesting", "En ingesta"), ("ready", "Listo"), ("failed", "Fallido")],
+                default="ready",
+                max_length=20,
+            ),
+        ),
+    ]
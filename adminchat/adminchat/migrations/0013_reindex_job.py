@@ -0,0 +1,79 @@
+# Trabajos de re-indexación de un negocio completo con cursor y contadores persistentes
+
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("adminchat", "0012_embedding_source_status"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ReindexJob",
+            fields=[
+                ("id", models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "Pendiente"),
+                            ("running", "En curso"),
+                            ("cancelling", "Cancelando"),
+                            ("cancelled", "Cancelado"),
+                            ("completed", "Completado"),
+                            ("failed", "Fallido"),
+                        ],
+                        default="pending",
+                        max_length=20,
+                    ),
+                ),
+                (
+                    "phase",
+                    models.CharField(
+                        choices=[("document", "Documentos"), ("product", "Productos"), ("done", "Terminado")],
+                        default="document",
+                        max_length=20,
+                    ),
+                ),
+                ("cursor", models.UUIDField(blank=True, null=True)),
+                ("embedding_model", models.CharField(max_length=100)),
+                ("embedding_dim", models.IntegerField()),
+                ("task_id", models.CharField(blank=True, max_length=255, null=True)),
+                ("documents_total", models.PositiveIntegerField(default=0)),
+                ("documents_done", models.PositiveIntegerField(default=0)),
+                ("products_total", models.PositiveIntegerField(default=0)),
+                ("products_done", models.PositiveIntegerField(default=0)),
+                ("sources_failed", models.PositiveIntegerField(default=0)),
+                ("chunks_count", models.PositiveIntegerField(default=0)),
+                ("embeddings_created", models.PositiveIntegerField(default=0)),
+                ("embeddings_reused", models.PositiveIntegerField(default=0)),
+                ("failures", models.JSONField(blank=True, default=list)),
+                ("error", models.TextField(blank=True, null=True)),
+                ("started_at", models.DateTimeField(blank=True, null=True)),
+                ("finished_at", models.DateTimeField(blank=True, null=True)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "business",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="reindex_jobs",
+                        to="adminchat.business",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Reindex Job",
+                "verbose_name_plural": "Reindex Jobs",
+                "db_table": "chat_reindex_job",
+                "ordering": ["-created_at"],
+                "indexes": [
+                    models.Index(fields=["business", "status"], name="chat_reindex_job_status_idx"),
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Migración de modelo de embeddings sin corte: modelo de cada fila, modelo pendiente del
+# negocio y generación en sombra de cada origen. Las filas existentes no se reescriben:
+# quedan con model_name vacío (BotSettings.legacy_embeddings_active).
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("adminchat", "0013_reindex_job"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="embedding",
+            name="model_name",
+            field=models.CharField(blank=True, default="", max_length=100),
+        ),
+        migrations.AddField(
+            model_name="botsettings",
+            name="pending_embedding_model_name",
+            field=models.CharField(blank=True, max_length=100, null=True),
+        ),
+        migrations.AddField(
+            model_name="botsettings",
+            name="pending_embedding_dim",
+            field=models.IntegerField(
+                blank=True,
+                choices=[
+                    (384, "384 (bge-small, MiniLM)"),
+                    (768, "768 (bge-base, mpnet)"),
+                    (1024, "1024 (bge-large, e5-large)"),
+                ],
+                null=True,
+            ),
+        ),
+        migrations.AddField(
+            model_name="botsettings",
+            name="legacy_embeddings_active",
+            field=models.BooleanField(default=True),
+        ),
+        migrations.AddField(
+            model_name="embeddingsource",
+            name="shadow_generation",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="reindexjob",
+            name="shadow",
+            field=models.BooleanField(default=False),
+        ),
+    ]
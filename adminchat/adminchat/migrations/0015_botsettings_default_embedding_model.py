@@ -0,0 +1,19 @@
+# El modelo de embeddings por defecto pasa a uno de 1024 dimensiones, el embedding_dim por
+# defecto (text-embedding-ada-002 genera 1536). Solo cambia el default: no altera filas.
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("adminchat", "0014_embedding_model_migration"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="botsettings",
+            name="embedding_model_name",
+            field=models.CharField(default="BAAI/bge-large-en-v1.5", max_length=100),
+        ),
+    ]
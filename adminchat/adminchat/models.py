@@ -5,7 +5,9 @@ from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin
 from django.utils import timezone
 from adminchat.managers import BusinessUserManager
 from django.conf import settings
-from pgvector.django import VectorField  # Importa VectorField
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.db.models.functions import Cast
+from pgvector.django import VectorField, HnswIndex  # Importa VectorField
 
 class Role(models.Model):
     """Modelo para roles de usuario"""
@@ -108,6 +110,19 @@ class UserActivityLog(models.Model):
 
 class BotSettings(models.Model):
     """Configuración general del bot por negocio"""
+    VECTOR_SEARCH_PRECISIONS = [
+        ('full', 'Precisión completa (vector)'),
+        ('half', 'Media precisión (halfvec)'),
+        ('binary', 'Cuantización binaria (bit)'),
+    ]
+    # Dimensiones de embedding soportadas. Cada una tiene su propio índice ANN parcial
+    # sobre chat_embedding (WHERE dimensions = N), ver Embedding.Meta.indexes
+    EMBEDDING_DIMENSIONS = [
+        (384, '384 (bge-small, MiniLM)'),
+        (768, '768 (bge-base, mpnet)'),
+        (1024, '1024 (bge-large, e5-large)'),
+    ]
+
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     business = models.OneToOneField(
         Business,
@@ -115,12 +130,30 @@ class BotSettings(models.Model):
         related_name='bot_settings'
     )
     llm_model_name = models.CharField(max_length=100, default='gpt-4')
-    embedding_model_name = models.CharField(max_length=100, default='text-embedding-ada-002')
-    embedding_dim = models.CharField(max_length=100, blank=True, null=True)  # Nuevo campo agregado
+    # Valores por defecto también para los negocios sin BotSettings (BotSettingsService)
+    embedding_model_name = models.CharField(max_length=100, default='BAAI/bge-large-en-v1.5')
+    embedding_dim = models.IntegerField(choices=EMBEDDING_DIMENSIONS, default=1024)  # Debe coincidir con el modelo
+    # Migración de modelo en curso (ModelMigrationService): los embeddings se generan
+    # también con este modelo, en sombra, hasta el cutover
+    pending_embedding_model_name = models.CharField(max_length=100, blank=True, null=True)
+    pending_embedding_dim = models.IntegerField(choices=EMBEDDING_DIMENSIONS, blank=True, null=True)
+    # Las filas sin model_name (anteriores al etiquetado por modelo) son del modelo activo
+    # hasta el primer cutover
+    legacy_embeddings_active = models.BooleanField(default=True)
     sentiment_model_name = models.CharField(max_length=100, blank=True, null=True)
     intent_model_name = models.CharField(max_length=100, blank=True, null=True)
     search_top_k = models.IntegerField(default=5)
     search_min_similarity = models.FloatField(default=0.75)
+    # Índice usado en la primera etapa del ANN; el re-ranking usa siempre el vector completo
+    search_vector_precision = models.CharField(
+        max_length=10,
+        choices=VECTOR_SEARCH_PRECISIONS,
+        default='full'
+    )
+    search_rerank = models.BooleanField(default=True)
+    search_rerank_factor = models.IntegerField(default=4)  # Candidatos por resultado a re-rankear
+    # Búsqueda Matryoshka: primera etapa sobre los primeros N componentes del vector
+    search_truncate_dim = models.IntegerField(blank=True, null=True)
     generation_temperature = models.FloatField(default=0.7)
     generation_top_p = models.FloatField(default=0.9)
     generation_top_k = models.IntegerField(default=50)
@@ -188,6 +221,14 @@ class ChunkingSettings(models.Model):
         ('review', 'Reseña'),
         ('other', 'Otro'),
     ]
+    STRATEGIES = [
+        ('words', 'Ventana fija de palabras'),
+        ('sentences', 'Oraciones y párrafos'),
+    ]
+    LENGTH_UNITS = [
+        ('words', 'Palabras'),
+        ('tokens', 'Tokens'),
+    ]
     
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     business = models.ForeignKey(
@@ -202,6 +243,15 @@ class ChunkingSettings(models.Model):
     )
     chunk_size = models.IntegerField(default=1000)
     chunk_overlap = models.IntegerField(default=200)
+    strategy = models.CharField(max_length=20, choices=STRATEGIES, default='words')
+    # chunk_size y chunk_overlap se miden en esta unidad
+    length_unit = models.CharField(max_length=20, choices=LENGTH_UNITS, default='words')
+    tokenizer = models.CharField(
+        max_length=255,
+        blank=True,
+        default='',
+        help_text="Tokenizador local para length_unit=tokens (regex, tiktoken:<encoding>, hf:<ruta>); vacío usa CHUNK_TOKENIZER"
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -323,7 +373,11 @@ class Document(models.Model):
     type = models.CharField(max_length=10, choices=DOCUMENT_TYPES)
     file_path = models.CharField(max_length=512)
     file_hash = models.CharField(max_length=64, unique=True)
+    # Texto extraído y limpio (DocumentTextService). Los textos grandes se guardan
+    # comprimidos con zlib en content_text_compressed en lugar de content_text
     content_text = models.TextField(blank=True, null=True)
+    content_text_compressed = models.BinaryField(blank=True, null=True, editable=False)
+    extraction_key = models.CharField(max_length=80, blank=True, default='')  # file_hash:versión del extractor
     metadata = models.JSONField(default=dict)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -381,11 +435,22 @@ class Embedding(models.Model):
         on_delete=models.CASCADE,
         related_name='embeddings'
     )
-    vector = VectorField(dimensions=1024)  # Almacenaremos el vector como JSON (luego podemos migrar a pgvector)
+    # Sin dimensión fija: cada fila ocupa la dimensión real del modelo (BotSettings.embedding_dim)
+    vector = VectorField()
+    dimensions = models.IntegerField(choices=BotSettings.EMBEDDING_DIMENSIONS, editable=False)
     content = models.TextField()
     source_type = models.CharField(max_length=20, choices=SOURCE_TYPES)
     source_id = models.UUIDField()
     chunk_index = models.IntegerField(null=True, blank=True)
+    # SHA-256 de (texto normalizado, modelo): permite reutilizar chunks sin cambios al re-ingestar
+    content_hash = models.CharField(max_length=64, blank=True, default='')
+    # Modelo que generó el vector; la búsqueda solo usa las filas del modelo activo del
+    # negocio. Vacío en las filas anteriores (BotSettings.legacy_embeddings_active)
+    model_name = models.CharField(max_length=100, blank=True, default='')
+    # Generación de ingesta del origen (EmbeddingSource). Las filas de una ingesta en curso
+    # se escriben inactivas y se activan junto con la baja de la generación anterior
+    generation = models.PositiveIntegerField(default=0)
+    is_active = models.BooleanField(default=True)
     metadata = models.JSONField(default=dict)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -395,6 +460,24 @@ class Embedding(models.Model):
         indexes = [
             models.Index(fields=['business', 'source_type', 'source_id']),
             models.Index(fields=['source_type', 'source_id']),
+            # Un índice ANN parcial por dimensión (búsqueda por similitud coseno, ver
+            # rebuild_vector_index): cada uno solo contiene las filas de esa dimensión
+            *[
+                HnswIndex(
+                    OpClass(Cast('vector', VectorField(dimensions=dim)), name='vector_cosine_ops'),
+                    name=f'chat_embedding_v{dim}_hnsw',
+                    condition=models.Q(dimensions=dim),
+                    m=16,
+                    ef_construction=64,
+                )
+                for dim, _ in BotSettings.EMBEDDING_DIMENSIONS
+            ],
+            # Filtros de contención (metadata @> {...}) en la búsqueda semántica
+            GinIndex(
+                name='chat_embedding_metadata_gin',
+                fields=['metadata'],
+                opclasses=['jsonb_path_ops'],
+            ),
         ]
         ordering = ['-created_at']
         verbose_name = 'Embedding'
@@ -404,6 +487,112 @@ class Embedding(models.Model):
         return f"Embedding for {self.get_source_type_display()} ({self.source_id}) - {self.business.name}"
 
     def save(self, *args, **kwargs):
-        """Actualiza automáticamente el campo updated_at"""
+        """Actualiza automáticamente updated_at y la dimensión del vector"""
         self.updated_at = timezone.now()
-        super().save(*args, **kwargs)
\ No newline at end of file
+        self.dimensions = len(self.vector)
+        super().save(*args, **kwargs)
+
+class EmbeddingSource(models.Model):
+    """
+    Estado de ingesta de un origen (documento, producto...) de embeddings. Serializa las
+    ingestas concurrentes del mismo origen y registra qué generación está publicada.
+    """
+    STATUSES = [
+        ('ingesting', 'En ingesta'),
+        ('ready', 'Listo'),
+        ('failed', 'Fallido'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    business = models.ForeignKey(
+        Business,
+        on_delete=models.CASCADE,
+        related_name='embedding_sources'
+    )
+    source_type = models.CharField(max_length=20, choices=Embedding.SOURCE_TYPES)
+    source_id = models.UUIDField()
+    generation = models.PositiveIntegerField(default=0)  # Generación activa
+    # Generación publicada con el modelo pendiente de una migración de modelo
+    shadow_generation = models.PositiveIntegerField(default=0)
+    last_generation = models.PositiveIntegerField(default=0)  # Última generación asignada
+    status = models.CharField(max_length=20, choices=STATUSES, default='ready')  # De la última generación
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'chat_embedding_source'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['business', 'source_type', 'source_id'],
+                name='chat_embedding_source_unique'
+            ),
+        ]
+        verbose_name = 'Embedding Source'
+        verbose_name_plural = 'Embedding Sources'
+
+    def __str__(self):
+        return f"{self.source_type}:{self.source_id} (gen {self.generation})"
+
+
+class ReindexJob(models.Model):
+    """
+    Re-indexación de todos los documentos y productos de un negocio (p. ej. tras cambiar
+    BotSettings.embedding_model_name). Recorre los orígenes por keyset (id > cursor) y
+    guarda el cursor y los contadores después de cada lote, de modo que un trabajo
+    interrumpido se reanuda donde se quedó.
+    """
+    STATUSES = [
+        ('pending', 'Pendiente'),
+        ('running', 'En curso'),
+        ('cancelling', 'Cancelando'),
+        ('cancelled', 'Cancelado'),
+        ('completed', 'Completado'),
+        ('failed', 'Fallido'),
+    ]
+    PHASES = [
+        ('document', 'Documentos'),
+        ('product', 'Productos'),
+        ('done', 'Terminado'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    business = models.ForeignKey(
+        Business,
+        on_delete=models.CASCADE,
+        related_name='reindex_jobs'
+    )
+    status = models.CharField(max_length=20, choices=STATUSES, default='pending')
+    phase = models.CharField(max_length=20, choices=PHASES, default='document')
+    cursor = models.UUIDField(null=True, blank=True)  # Último origen procesado de la fase
+    # Modelo de BotSettings al crear el trabajo: todos los orígenes se re-indexan con él
+    embedding_model = models.CharField(max_length=100)
+    embedding_dim = models.IntegerField()
+    # En sombra: re-indexa con el modelo pendiente de una migración y hace el cutover al terminar
+    shadow = models.BooleanField(default=False)
+    task_id = models.CharField(max_length=255, blank=True, null=True)
+    documents_total = models.PositiveIntegerField(default=0)
+    documents_done = models.PositiveIntegerField(default=0)
+    products_total = models.PositiveIntegerField(default=0)
+    products_done = models.PositiveIntegerField(default=0)
+    sources_failed = models.PositiveIntegerField(default=0)
+    chunks_count = models.PositiveIntegerField(default=0)
+    embeddings_created = models.PositiveIntegerField(default=0)
+    embeddings_reused = models.PositiveIntegerField(default=0)
+    failures = models.JSONField(default=list, blank=True)  # [{'source_type', 'source_id', 'error'}]
+    error = models.TextField(blank=True, null=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'chat_reindex_job'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['business', 'status'], name='chat_reindex_job_status_idx'),
+        ]
+        verbose_name = 'Reindex Job'
+        verbose_name_plural = 'Reindex Jobs'
+
+    def __str__(self):
+        return f"Reindex {self.business_id} ({self.status})"
@@ -4,11 +4,13 @@ from .models import Business, BusinessUser, Role, UserActivityLog
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from django.contrib.auth.hashers import make_password
 from django.utils import timezone
-from .models import BotSettings, BotTemplate, ChunkingSettings, ExternalAPIConfig, APIRoute, Document, ProductServiceItem, Embedding
+from .models import BotSettings, BotTemplate, ChunkingSettings, ExternalAPIConfig, APIRoute, Document, ProductServiceItem, Embedding, ReindexJob
 import json
 from django.db import transaction
 import logging
-from .tasks import create_embeddings_task
+from .tasks import create_embeddings_task, create_catalog_embeddings_task
+from .services.tokenizer_service import TokenizerService
+from .services.bot_setting_service import BotSettingsService
 
 logger = logging.getLogger(__name__)
 
@@ -131,7 +133,44 @@ class BotSettingsSerializer(serializers.ModelSerializer):
     class Meta:
         model = BotSettings
         fields = '__all__'
-        read_only_fields = ('created_at', 'updated_at')
+        # El modelo pendiente lo gestiona la migración de modelo (model-migration)
+        read_only_fields = (
+            'created_at', 'updated_at', 'pending_embedding_model_name',
+            'pending_embedding_dim', 'legacy_embeddings_active'
+        )
+
+    def validate_search_rerank_factor(self, value):
+        if value < 1:
+            raise serializers.ValidationError('Rerank factor must be at least 1')
+        return value
+
+    def validate_search_truncate_dim(self, value):
+        if value is not None and value < 1:
+            raise serializers.ValidationError('Truncate dim must be positive')
+        return value
+
+    def validate(self, data):
+        # La truncación debe ser menor que la dimensión de los embeddings del negocio
+        embedding_dim = data.get('embedding_dim', getattr(self.instance, 'embedding_dim', None))
+        truncate_dim = data.get('search_truncate_dim', getattr(self.instance, 'search_truncate_dim', None))
+        if embedding_dim and truncate_dim and truncate_dim >= embedding_dim:
+            raise serializers.ValidationError({
+                'search_truncate_dim': 'Truncate dim must be smaller than embedding_dim'
+            })
+
+        # Con embeddings ya generados, cambiar de modelo los dejaría fuera de la búsqueda
+        if self.instance is not None:
+            changed = [
+                field for field in ('embedding_model_name', 'embedding_dim')
+                if field in data and data[field] != getattr(self.instance, field)
+            ]
+            if changed and Embedding.objects.filter(business_id=self.instance.business_id).exists():
+                raise serializers.ValidationError({
+                    field: 'This business already has embeddings; change the model with '
+                           'POST /api/bot-settings/{id}/model-migration/'
+                    for field in changed
+                })
+        return data
 
     def create(self, validated_data):
         business_id = validated_data.pop('business_id')
@@ -216,6 +255,15 @@ class ChunkingSettingsSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError({
                 'chunk_overlap': 'Chunk overlap must be smaller than chunk size'
             })
+
+        # El tokenizador debe poder cargarse en el worker cuando se mide en tokens
+        length_unit = data.get('length_unit', self.instance.length_unit if self.instance else 'words')
+        tokenizer = data.get('tokenizer', self.instance.tokenizer if self.instance else '')
+        if length_unit == 'tokens':
+            try:
+                TokenizerService.get(tokenizer)
+            except ValueError as e:
+                raise serializers.ValidationError({'tokenizer': str(e)})
         
         return data
 
@@ -300,10 +348,10 @@ class DocumentSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Document
-        fields = '__all__'
+        exclude = ('content_text_compressed',)
         read_only_fields = (
             'id', 'type', 'file_path', 
-            'file_hash', 'content_text',
+            'file_hash', 'content_text', 'extraction_key',
             'created_at', 'updated_at', 'business'
         )
 
@@ -415,6 +463,35 @@ class EmbeddingCreateSerializer(serializers.ModelSerializer):
         }
 
 
+class CatalogEmbeddingSerializer(serializers.Serializer):
+    """Vectorización de un catálogo de productos en una sola tarea (create_catalog_embeddings_task)"""
+    business_id = serializers.UUIDField(required=True)
+    product_ids = serializers.ListField(
+        child=serializers.UUIDField(), required=False, allow_empty=False,
+        help_text="Productos a vectorizar (default: todo el catálogo del negocio)"
+    )
+
+    def validate_business_id(self, value):
+        if not Business.objects.filter(id=value).exists():
+            raise serializers.ValidationError('Business does not exist')
+        return value
+
+    def create(self, validated_data):
+        business_id = validated_data['business_id']
+        product_ids = validated_data.get('product_ids')
+        task = create_catalog_embeddings_task.delay(
+            str(business_id),
+            [str(product_id) for product_id in product_ids] if product_ids is not None else None
+        )
+        return {
+            'task_id': str(task.id),
+            'status': 'Processing started',
+            'monitor_url': f'/api/tasks/{task.id}/status/',
+            'business_id': str(business_id),
+            'products_count': len(set(product_ids)) if product_ids is not None else None
+        }
+
+
 class EmbeddingSerializer(serializers.ModelSerializer):
     business_id = serializers.UUIDField(write_only=True, required=True)
     business = BusinessSerializer(read_only=True)
@@ -456,6 +533,14 @@ class EmbeddingSerializer(serializers.ModelSerializer):
                 raise serializers.ValidationError({'vector': 'Vector must be a list'})
             if not all(isinstance(x, (int, float)) for x in vector):
                 raise serializers.ValidationError({'vector': 'All vector elements must be numbers'})
+            # La búsqueda del negocio solo usa vectores de su embedding_dim
+            business_id = business_id or getattr(self.instance, 'business_id', None)
+            if business_id:
+                dim = BotSettingsService.get_bot_settings(str(business_id))['embedding_dim']
+                if len(vector) != dim:
+                    raise serializers.ValidationError({
+                        'vector': f'Vector must have {dim} dimensions (embedding_dim of the business)'
+                    })
         
         return data
     
@@ -467,4 +552,17 @@ class EmbeddingSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError({'business_id': 'Business does not exist'})
             
         embedding = Embedding.objects.create(business=business, **validated_data)
-        return embedding
\ No newline at end of file
+        return embedding
+
+
+class ReindexJobSerializer(serializers.ModelSerializer):
+    """Estado y progreso de un trabajo de re-indexación (solo lectura)"""
+    monitor_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ReindexJob
+        fields = '__all__'
+        read_only_fields = [field.name for field in ReindexJob._meta.fields]
+
+    def get_monitor_url(self, obj):
+        return f'/api/reindex-jobs/{obj.id}/'
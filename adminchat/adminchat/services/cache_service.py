@@ -0,0 +1,240 @@
+# adminchat/services/cache_service.py
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import cache
+import numpy as np
+import hashlib
+import json
+import threading
+import time
+import logging
+
+from .bot_setting_service import BotSettingsService
+from .embedding_service import EmbeddingGenerator
+
+logger = logging.getLogger(__name__)
+
+class LRUTTLCache:
+    """
+    Caché en memoria del proceso, acotada en número de entradas (LRU) y con
+    expiración por entrada (TTL). Segura para hilos.
+    """
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """Devuelve el valor o None si no existe o ha expirado"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return None
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
+
+class TenantSettingsCache:
+    """BotSettings por negocio cacheados en el proceso para no leerlos en cada búsqueda"""
+
+    cache = LRUTTLCache(
+        maxsize=settings.TENANT_SETTINGS_CACHE_SIZE,
+        ttl=settings.TENANT_SETTINGS_CACHE_TTL
+    )
+
+    @classmethod
+    def get_bot_settings(cls, business_id):
+        key = str(business_id)
+        bot_settings = cls.cache.get(key)
+        if bot_settings is None:
+            bot_settings = BotSettingsService.get_bot_settings(key)
+            cls.cache.set(key, bot_settings)
+        return bot_settings
+
+class QueryEmbeddingService:
+    """Vectoriza textos de consulta con el modelo del negocio, con caché LRU+TTL"""
+
+    cache = LRUTTLCache(
+        maxsize=settings.QUERY_VECTOR_CACHE_SIZE,
+        ttl=settings.QUERY_VECTOR_CACHE_TTL
+    )
+
+    @staticmethod
+    def normalize_query(text: str) -> str:
+        """
+        Normaliza los espacios para que consultas equivalentes compartan entrada en caché.
+        No cambia mayúsculas: el texto normalizado es el que se vectoriza y el modelo
+        distingue SKUs, códigos y nombres propios.
+        """
+        return ' '.join(text.split())
+
+    @classmethod
+    def get_query_vector(cls, business_id, text):
+        """
+        Obtiene el vector de una consulta usando BotSettings.embedding_model_name.
+
+        Args:
+            business_id (UUID): ID del negocio
+            text (str): Texto de la consulta
+
+        Returns:
+            list[float]: Vector de la consulta
+        """
+        embedding_model = TenantSettingsCache.get_bot_settings(business_id)['embedding_model_name']
+        normalized = cls.normalize_query(text)
+        key = (embedding_model, normalized)
+
+        vector = cls.cache.get(key)
+        if vector is None:
+            vector = EmbeddingGenerator.generate_embeddings(
+                [normalized],
+                embedding_model=embedding_model
+            )[0]
+            # La búsqueda espera una lista (el transporte binario devuelve np.ndarray)
+            vector = [float(x) for x in vector]
+            cls.cache.set(key, vector)
+        return vector
+
+class SearchResultCache:
+    """
+    Caché de resultados de búsqueda en la caché compartida de Django.
+
+    La clave incluye una "versión de corpus" por negocio que se renueva cada vez
+    que se escriben o eliminan embeddings, de modo que una re-indexación deja
+    inaccesibles (y expiran por TTL) todas las entradas anteriores. La versión la
+    renuevan tanto la API como el worker, así que solo se usa con una caché compartida
+    entre procesos (Redis); con una caché local la caché de resultados se desactiva.
+    """
+
+    VERSION_KEY = 'search:corpus_version:{business_id}'
+    RESULT_KEY = 'search:results:{business_id}:{version}:{digest}'
+    # Contadores de aciertos y fallos de todos los procesos
+    STATS_KEYS = {'hits': 'search:stats:hits', 'misses': 'search:stats:misses'}
+    # Backends cuyo contenido es local a cada proceso
+    LOCAL_BACKENDS = (
+        'django.core.cache.backends.locmem.LocMemCache',
+        'django.core.cache.backends.dummy.DummyCache',
+    )
+    # Resolución de la cuantización del vector de consulta en la clave
+    VECTOR_QUANTUM = 1e-4
+
+    @classmethod
+    def enabled(cls):
+        """Indica si la caché es compartida entre procesos (si no, no se cachea)"""
+        return settings.CACHES['default']['BACKEND'] not in cls.LOCAL_BACKENDS
+
+    @classmethod
+    def corpus_version(cls, business_id):
+        key = cls.VERSION_KEY.format(business_id=business_id)
+        version = cache.get(key)
+        if version is None:
+            cache.add(key, time.time_ns(), timeout=None)
+            version = cache.get(key)
+        return version
+
+    @classmethod
+    def bump_corpus_version(cls, business_id):
+        """Invalida todos los resultados cacheados del negocio"""
+        if cls.enabled():
+            cache.set(cls.VERSION_KEY.format(business_id=business_id), time.time_ns(), timeout=None)
+
+    @classmethod
+    def make_key(cls, business_id, vector, params):
+        """
+        Construye la clave de caché. Debe calcularse antes de ejecutar la consulta:
+        si el corpus cambia mientras tanto, el resultado queda guardado bajo la
+        versión anterior y nunca se sirve.
+
+        Args:
+            business_id (UUID): ID del negocio
+            vector (list[float]): Vector de consulta
+            params (dict): Resto de parámetros que afectan al resultado (top_k, filtros...)
+
+        Returns:
+            str | None: Clave de caché, o None si la caché está desactivada
+        """
+        if not cls.enabled():
+            return None
+        quantized = np.rint(np.asarray(vector, dtype=np.float64) / cls.VECTOR_QUANTUM).astype(np.int32)
+        digest = hashlib.sha1(quantized.tobytes())
+        digest.update(json.dumps(params, sort_keys=True, default=str).encode('utf-8'))
+        return cls.RESULT_KEY.format(
+            business_id=business_id,
+            version=cls.corpus_version(business_id),
+            digest=digest.hexdigest()
+        )
+
+    @classmethod
+    def _count(cls, counter):
+        key = cls.STATS_KEYS[counter]
+        try:
+            cache.incr(key)
+        except ValueError:
+            # Primer uso del contador (o expulsado): si otro proceso lo crea a la vez, se incrementa
+            if not cache.add(key, 1, timeout=None):
+                cache.incr(key)
+
+    @classmethod
+    def get(cls, key):
+        """Devuelve los resultados cacheados o None"""
+        if key is None:
+            return None
+        results = cache.get(key)
+        cls._count('misses' if results is None else 'hits')
+        return results
+
+    @classmethod
+    def set(cls, key, results):
+        if key is not None:
+            cache.set(key, results, timeout=settings.SEARCH_RESULT_CACHE_TTL)
+
+    @classmethod
+    def stats(cls):
+        """Aciertos y fallos de todos los procesos (contadores en la caché compartida)"""
+        if not cls.enabled():
+            return {'enabled': False, 'ttl': settings.SEARCH_RESULT_CACHE_TTL}
+        counts = cache.get_many(list(cls.STATS_KEYS.values()))
+        hits = counts.get(cls.STATS_KEYS['hits'], 0)
+        misses = counts.get(cls.STATS_KEYS['misses'], 0)
+        lookups = hits + misses
+        return {
+            'enabled': True,
+            'ttl': settings.SEARCH_RESULT_CACHE_TTL,
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': hits / lookups if lookups else 0.0
+        }
@@ -1,6 +1,7 @@
 # adminchat/services/chunking_service.py
 from django.core.exceptions import ObjectDoesNotExist
 from ..models import ChunkingSettings
+from .tokenizer_service import TokenizerService
 import logging
 
 logger = logging.getLogger(__name__)
@@ -8,6 +9,8 @@ logger = logging.getLogger(__name__)
 class ChunkingService:
     DEFAULT_CHUNK_SIZE = 100
     DEFAULT_CHUNK_OVERLAP = 20
+    DEFAULT_STRATEGY = 'words'
+    DEFAULT_LENGTH_UNIT = 'words'
 
     @classmethod
     def get_chunking_settings(cls, business_id, entity_type):
@@ -19,7 +22,8 @@ class ChunkingService:
             entity_type (str): Tipo de entidad (document, product_service_item, etc.)
             
         Returns:
-            dict: Configuración de chunking con 'chunk_size' y 'chunk_overlap'
+            dict: Configuración de chunking con 'chunk_size', 'chunk_overlap',
+            'strategy', 'length_unit' y 'tokenizer'
         """
         try:
             settings = ChunkingSettings.objects.get(
@@ -29,6 +33,9 @@ class ChunkingService:
             return {
                 'chunk_size': settings.chunk_size,
                 'chunk_overlap': settings.chunk_overlap,
+                'strategy': settings.strategy,
+                'length_unit': settings.length_unit,
+                'tokenizer': settings.tokenizer,
                 'is_default': False
             }
         except ObjectDoesNotExist:
@@ -39,5 +46,23 @@ class ChunkingService:
             return {
                 'chunk_size': cls.DEFAULT_CHUNK_SIZE,
                 'chunk_overlap': cls.DEFAULT_CHUNK_OVERLAP,
+                'strategy': cls.DEFAULT_STRATEGY,
+                'length_unit': cls.DEFAULT_LENGTH_UNIT,
+                'tokenizer': '',
                 'is_default': True
-            }
\ No newline at end of file
+            }
+
+    @staticmethod
+    def get_tokenizer(chunking_settings):
+        """
+        Tokenizador con el que se miden los chunks, o None si se miden en palabras.
+
+        Args:
+            chunking_settings (dict): Resultado de get_chunking_settings
+
+        Raises:
+            ValueError: Si el tokenizador configurado no se puede cargar
+        """
+        if chunking_settings.get('length_unit') != 'tokens':
+            return None
+        return TokenizerService.get(chunking_settings.get('tokenizer'))
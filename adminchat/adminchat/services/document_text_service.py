@@ -0,0 +1,135 @@
+# adminchat/services/document_text_service.py
+from django.conf import settings
+from ..models import Document
+from .embedding_service import TextExtractor
+import zlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+class DocumentTextService:
+    """
+    Caché persistente del texto extraído y limpio de cada documento, válida mientras
+    no cambien el archivo (file_hash) ni la versión del extractor. Permite re-chunkear
+    o cambiar de modelo sin volver a descargar el archivo de S3 ni parsearlo.
+    """
+
+    INLINE_MAX_CHARS = settings.DOCUMENT_TEXT_INLINE_MAX_CHARS
+    STORE_MAX_CHARS = settings.DOCUMENT_TEXT_STORE_MAX_CHARS
+
+    # Bytes por bloque al descomprimir el texto guardado
+    STREAM_CHUNK_SIZE = 1 << 16
+
+    @staticmethod
+    def extraction_key(document):
+        return f"{document.file_hash}:{TextExtractor.VERSION}"
+
+    @classmethod
+    def has_cached_text(cls, document):
+        """Indica si el documento tiene una extracción válida guardada"""
+        return document.extraction_key == cls.extraction_key(document)
+
+    @classmethod
+    def iter_cached_text(cls, document):
+        """
+        Genera el texto guardado por piezas, descomprimiéndolo de forma incremental.
+
+        Args:
+            document (Document): Documento con extracción válida (has_cached_text)
+
+        Yields:
+            str: Pieza (línea o texto completo si no está comprimido) del texto limpio
+        """
+        if not document.content_text_compressed:
+            yield document.content_text or ""
+            return
+
+        def decompressed_blocks(data):
+            decompressor = zlib.decompressobj()
+            for start in range(0, len(data), cls.STREAM_CHUNK_SIZE):
+                block = data[start:start + cls.STREAM_CHUNK_SIZE]
+                while block:
+                    # max_length acota la salida aunque el texto sea muy repetitivo
+                    yield decompressor.decompress(block, cls.STREAM_CHUNK_SIZE)
+                    block = decompressor.unconsumed_tail
+            yield decompressor.flush()
+
+        yield from TextExtractor.iter_text_lines(
+            decompressed_blocks(bytes(document.content_text_compressed))
+        )
+
+    @classmethod
+    def writer(cls, document):
+        """Devuelve un DocumentTextWriter para guardar el texto a medida que se extrae"""
+        return DocumentTextWriter(document)
+
+    @classmethod
+    def _save(cls, document, content_text, compressed):
+        document.content_text = content_text
+        document.content_text_compressed = compressed
+        document.extraction_key = cls.extraction_key(document)
+        # update() para no pisar otros campos del documento modificados mientras tanto
+        Document.objects.filter(pk=document.pk).update(
+            content_text=content_text,
+            content_text_compressed=compressed,
+            extraction_key=document.extraction_key
+        )
+
+
+class DocumentTextWriter:
+    """
+    Guarda el texto limpio de un documento (DocumentTextService): recibe las líneas
+    a medida que se extraen y las guarda al cerrar. Mantiene el texto en claro
+    mientras quepa en INLINE_MAX_CHARS y después lo comprime de forma incremental. Si
+    supera STORE_MAX_CHARS deja de acumularlo y no se guarda, para que la memoria no
+    crezca con el documento.
+    """
+
+    def __init__(self, document):
+        self.document = document
+        self.lines = 0
+        self.chars = 0
+        self.parts = []
+        self.compressor = zlib.compressobj(6)
+        self.compressed = []
+        self.overflow = False
+
+    def write(self, line):
+        """Añade una línea (sin salto final) al texto"""
+        if self.overflow:
+            return
+        piece = f"\n{line}" if self.lines else line
+        self.lines += 1
+        self.chars += len(piece)
+
+        if self.chars > DocumentTextService.STORE_MAX_CHARS:
+            logger.info(
+                f"Extracted text of document {self.document.id} exceeds "
+                f"{DocumentTextService.STORE_MAX_CHARS} chars; it will not be stored"
+            )
+            self.overflow = True
+            self.parts = self.compressed = self.compressor = None
+            return
+
+        if self.parts is not None:
+            self.parts.append(piece)
+            if self.chars <= DocumentTextService.INLINE_MAX_CHARS:
+                return
+            piece, self.parts = "".join(self.parts), None
+        self.compressed.append(self.compressor.compress(piece.encode('utf-8')))
+
+    def close(self):
+        """
+        Guarda el texto acumulado.
+
+        Returns:
+            bool: False si el texto era demasiado grande para guardarse
+        """
+        if self.overflow:
+            return False
+        if self.parts is not None:
+            DocumentTextService._save(self.document, "".join(self.parts), None)
+        else:
+            self.compressed.append(self.compressor.flush())
+            DocumentTextService._save(self.document, None, b"".join(self.compressed))
+        return True
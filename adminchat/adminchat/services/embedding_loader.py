@@ -0,0 +1,144 @@
+# adminchat/services/embedding_loader.py
+from itertools import islice
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+from ..models import Embedding
+import uuid
+import weakref
+import logging
+
+logger = logging.getLogger(__name__)
+
+try:
+    from django.db.backends.postgresql.psycopg_any import is_psycopg3
+    from pgvector.psycopg import register_vector
+except ImportError:  # psycopg2 o pgvector sin soporte de psycopg 3
+    is_psycopg3 = False
+    register_vector = None
+
+class EmbeddingBulkLoader:
+    """
+    Escritura masiva en chat_embedding con COPY ... FROM STDIN (FORMAT BINARY).
+
+    Los vectores viajan en el formato binario de pgvector (sin renderizarlos como
+    literales de texto) y las filas se envían en lotes de batch_size, de modo que
+    con un iterable perezoso la memoria no crece con el número de filas. Se ejecuta
+    en la transacción del llamador. Sin psycopg 3 se usa bulk_create por lotes.
+    """
+
+    BATCH_SIZE = settings.EMBEDDING_COPY_BATCH_SIZE
+
+    # Conexiones de psycopg 3 en las que ya se registraron los tipos de pgvector
+    _registered_connections = weakref.WeakSet()
+
+    # content_tsv es una columna generada y no se escribe
+    COLUMNS = (
+        ('id', 'uuid'),
+        ('business_id', 'uuid'),
+        ('vector', 'vector'),
+        ('dimensions', 'int4'),
+        ('content', 'text'),
+        ('source_type', 'varchar'),
+        ('source_id', 'uuid'),
+        ('chunk_index', 'int4'),
+        ('content_hash', 'varchar'),
+        ('model_name', 'varchar'),
+        ('generation', 'int4'),
+        ('is_active', 'bool'),
+        ('metadata', 'jsonb'),
+        ('created_at', 'timestamptz'),
+        ('updated_at', 'timestamptz'),
+    )
+
+    @staticmethod
+    def supports_copy():
+        """Indica si la conexión permite COPY binario con vectores (psycopg 3 + pgvector)"""
+        return bool(is_psycopg3 and register_vector and connection.vendor == 'postgresql')
+
+    @classmethod
+    def _ensure_vector_types(cls):
+        """
+        Registra los tipos de pgvector una sola vez por conexión física.
+
+        register_vector consulta el catálogo para obtener los OID de los tipos, así
+        que hacerlo en cada load() añadiría un viaje de ida y vuelta por llamada. Si
+        Django reabre la conexión, la nueva se registra en su primer uso.
+
+        Returns:
+            psycopg.Connection: Conexión de psycopg 3 bajo el wrapper de Django
+        """
+        connection.ensure_connection()
+        raw_connection = connection.connection
+        if raw_connection not in cls._registered_connections:
+            register_vector(raw_connection)
+            cls._registered_connections.add(raw_connection)
+        return raw_connection
+
+    @staticmethod
+    def _as_uuid(value):
+        return value if isinstance(value, uuid.UUID) else uuid.UUID(str(value))
+
+    @classmethod
+    def _row(cls, embedding, now):
+        return (
+            cls._as_uuid(embedding.id),
+            cls._as_uuid(embedding.business_id),
+            embedding.vector,
+            embedding.dimensions or len(embedding.vector),
+            embedding.content,
+            embedding.source_type,
+            cls._as_uuid(embedding.source_id),
+            embedding.chunk_index,
+            embedding.content_hash,
+            embedding.model_name,
+            embedding.generation,
+            embedding.is_active,
+            embedding.metadata,
+            embedding.created_at or now,
+            now,
+        )
+
+    @classmethod
+    def load(cls, embeddings, batch_size=None, use_copy=None):
+        """
+        Inserta instancias de Embedding (no guardadas) de forma masiva.
+
+        Args:
+            embeddings (iterable[Embedding]): Instancias a insertar; puede ser un generador
+            batch_size (int): Filas por sentencia COPY (default: EMBEDDING_COPY_BATCH_SIZE)
+            use_copy (bool): Forzar (True) o desactivar (False) COPY; None lo detecta
+
+        Returns:
+            int: Número de filas insertadas
+        """
+        batch_size = batch_size or cls.BATCH_SIZE
+        use_copy = cls.supports_copy() if use_copy is None else use_copy
+        iterator = iter(embeddings)
+        total = 0
+
+        if use_copy:
+            cls._ensure_vector_types()
+
+        with connection.cursor() as cursor:
+            while True:
+                batch = list(islice(iterator, batch_size))
+                if not batch:
+                    break
+                if use_copy:
+                    # cursor.cursor es el cursor de psycopg 3 bajo el wrapper de Django
+                    cls._copy_batch(cursor.cursor, batch)
+                else:
+                    Embedding.objects.bulk_create(batch)
+                total += len(batch)
+        return total
+
+    @classmethod
+    def _copy_batch(cls, raw_cursor, batch):
+        table = Embedding._meta.db_table
+        columns = ', '.join(name for name, _ in cls.COLUMNS)
+        now = timezone.now()
+        with raw_cursor.copy(f"COPY {table} ({columns}) FROM STDIN (FORMAT BINARY)") as copy:
+            copy.set_types([pg_type for _, pg_type in cls.COLUMNS])
+            for embedding in batch:
+                copy.write_row(cls._row(embedding, now))
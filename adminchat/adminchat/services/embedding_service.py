@@ -1,80 +1,260 @@
 #adminchat/services/embedding_service.py
 import re
+import codecs
+import hashlib
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+from collections import deque
+from functools import lru_cache
+from itertools import islice
+import numpy as np
 import requests
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from django.conf import settings
 from urllib.parse import urljoin
 import boto3
 from botocore.exceptions import ClientError
 import logging
-from io import BytesIO
+from io import BytesIO, StringIO
 from PyPDF2 import PdfReader
 from docx import Document as DocxDocument
 import openpyxl
 import csv
 
+try:
+    # billiard (dependencia de Celery) permite crear procesos desde los workers prefork,
+    # que son daemon; multiprocessing lo prohíbe
+    import billiard as process_backend
+except ImportError:
+    process_backend = multiprocessing
+
 logger = logging.getLogger(__name__)
 
 class TextExtractor:
     """Clase para extraer texto de diferentes tipos de archivos"""
+
+    # Incrementar al cambiar la extracción o la limpieza: invalida los textos guardados
+    VERSION = 1
+
+    # Formatos que se pueden extraer de un flujo de bytes sin tener el archivo entero
+    STREAMING_TYPES = ('txt', 'csv')
+
+    # Bytes por bloque al decodificar un archivo en memoria por partes
+    STREAM_CHUNK_SIZE = 1 << 20
+
+    @classmethod
+    def iter_text(cls, document_type, file_content):
+        """
+        Genera el texto de un archivo por piezas (páginas, párrafos o filas) sin
+        construir el texto completo.
+
+        Args:
+            document_type (str): Tipo de documento (pdf, docx, txt, xlsx, csv)
+            file_content (bytes | iterable[bytes]): Contenido; los STREAMING_TYPES
+                aceptan también un iterable de bloques de bytes
+
+        Yields:
+            str: Pieza de texto
+        """
+        extractors = {
+            'pdf': cls.iter_pdf_pages,
+            'docx': cls.iter_docx_paragraphs,
+            'txt': cls.iter_text_lines,
+            'xlsx': cls.iter_xlsx_rows,
+            'csv': cls.iter_csv_rows,
+        }
+        if document_type not in extractors:
+            raise ValueError(f"Unsupported document type: {document_type}")
+        return extractors[document_type](file_content)
+
+    @classmethod
+    def iter_text_lines(cls, file_content):
+        """
+        Decodifica UTF-8 de forma incremental y genera sus líneas, cada una con su salto de línea.
+
+        Args:
+            file_content (bytes | iterable[bytes]): Contenido o bloques de contenido
+
+        Yields:
+            str: Línea de texto. Las líneas de más de TEXT_LINE_MAX_CHARS caracteres se
+            generan por trozos (el último con el salto), así que un archivo sin saltos de
+            línea no se acumula entero en memoria
+        """
+        max_chars = settings.TEXT_LINE_MAX_CHARS
+        blocks = file_content
+        if isinstance(file_content, (bytes, bytearray)):
+            blocks = (
+                file_content[start:start + cls.STREAM_CHUNK_SIZE]
+                for start in range(0, len(file_content), cls.STREAM_CHUNK_SIZE)
+            )
+        decoder = codecs.getincrementaldecoder('utf-8')()
+        tail = ""
+        for block in blocks:
+            lines = (tail + decoder.decode(block)).split("\n")
+            tail = lines.pop()
+            for line in lines:
+                for _, segment in TextCleaner.iter_segments(line + "\n", max_chars):
+                    yield segment
+            if len(tail) > max_chars:
+                # Se emite todo menos el último trozo, que puede continuar en el bloque siguiente
+                *segments, tail = (segment for _, segment in TextCleaner.iter_segments(tail, max_chars))
+                yield from segments
+        tail += decoder.decode(b"", final=True)
+        for _, segment in TextCleaner.iter_segments(tail, max_chars):
+            if segment:
+                yield segment
     
     @staticmethod
-    def extract_from_pdf(file_content):
-        """Extrae texto de un PDF"""
+    def iter_pdf_pages(file_content, max_workers=None, page_timeout=None, pages=None):
+        """
+        Genera el texto de cada página de un PDF (o del rango pages), en orden.
+
+        Los PDF de al menos PDF_PARALLEL_MIN_PAGES páginas se reparten entre un pool
+        acotado de procesos (cada uno parsea el archivo una vez) con un máximo de
+        páginas en vuelo, así que el texto se produce a medida que se consume. Una
+        página que supera page_timeout se omite con un aviso. El pool arranca sus
+        procesos con spawn, también desde un worker de Celery.
+
+        Args:
+            file_content (bytes | str): Contenido del PDF o ruta de una copia local
+                (LocalFileCache), de la que solo se leen los objetos de las páginas pedidas
+            max_workers (int): Procesos del pool (default: PDF_EXTRACTION_WORKERS)
+            page_timeout (float): Segundos máximos por página (default: PDF_PAGE_TIMEOUT)
+            pages (range): Índices de página a extraer (default: todas)
+
+        Yields:
+            str: Texto de cada página
+        """
+        max_workers = max_workers or settings.PDF_EXTRACTION_WORKERS
+        page_timeout = page_timeout or settings.PDF_PAGE_TIMEOUT
+        stream = TextExtractor.open_pdf(file_content)
         try:
-            pdf_reader = PdfReader(BytesIO(file_content))
-            text = ""
-            for page in pdf_reader.pages:
-                text += page.extract_text() + "\n"
-            return text
-        except Exception as e:
-            logger.error(f"Error extracting PDF text: {str(e)}")
-            raise ValueError("Could not extract text from PDF file")
+            pdf_reader = PdfReader(stream)
+            pages = pages if pages is not None else range(len(pdf_reader.pages))
+            page_count = len(pages)
 
-    @staticmethod
-    def extract_from_docx(file_content):
-        """Extrae texto de un DOCX"""
+            # Sin billiard, multiprocessing no deja que un proceso daemon cree hijos
+            if (
+                max_workers <= 1
+                or page_count < settings.PDF_PARALLEL_MIN_PAGES
+                or (process_backend is multiprocessing and multiprocessing.current_process().daemon)
+            ):
+                for index in pages:
+                    yield pdf_reader.pages[index].extract_text() or ""
+                return
+        finally:
+            stream.close()
+
+        del pdf_reader
+        processes = max(1, min(max_workers, page_count))
+        logger.info(f"Extracting {page_count} PDF pages with {processes} processes")
+        # spawn y no fork: el proceso actual tiene hilos (clientes HTTP, conexiones) y un
+        # fork podría heredar sus locks tomados; los hijos arrancan un intérprete limpio
+        pool = process_backend.get_context('spawn').Pool(
+            processes=processes,
+            initializer=_init_pdf_worker,
+            initargs=(file_content,)
+        )
+        pending = deque()
+        timed_out = False
         try:
-            doc = DocxDocument(BytesIO(file_content))
-            return "\n".join([para.text for para in doc.paragraphs])
-        except Exception as e:
-            logger.error(f"Error extracting DOCX text: {str(e)}")
-            raise ValueError("Could not extract text from Word file")
+            pages = iter(pages)
+            # Ventana de páginas en vuelo: memoria acotada aunque el consumidor sea lento
+            for index in islice(pages, max_workers * 2):
+                pending.append((index, pool.apply_async(_extract_pdf_page, (index,))))
+            while pending:
+                index, result = pending.popleft()
+                try:
+                    text = result.get(timeout=page_timeout)
+                except process_backend.TimeoutError:
+                    logger.warning(f"PDF page {index + 1} timed out after {page_timeout}s; skipped")
+                    timed_out = True
+                    text = ""
+                for next_index in islice(pages, 1):
+                    pending.append((next_index, pool.apply_async(_extract_pdf_page, (next_index,))))
+                yield text
+        finally:
+            # terminate() también detiene los procesos atascados en una página
+            if timed_out or pending:
+                pool.terminate()
+            else:
+                pool.close()
+            pool.join()
 
     @staticmethod
-    def extract_from_txt(file_content):
-        """Extrae texto de un TXT"""
-        try:
-            return file_content.decode('utf-8')
-        except Exception as e:
-            logger.error(f"Error extracting TXT text: {str(e)}")
-            raise ValueError("Could not extract text from text file")
+    def open_pdf(file_content):
+        """
+        Abre un PDF en memoria (bytes) o en disco (ruta). Con un archivo abierto PdfReader
+        lee cada objeto al necesitarlo; con la ruta leería el archivo entero a memoria.
+        """
+        if isinstance(file_content, str):
+            return open(file_content, 'rb')
+        return BytesIO(file_content)
+
+    @staticmethod
+    def count_pdf_pages(file_content):
+        """Número de páginas de un PDF (contenido o ruta de una copia local)"""
+        with TextExtractor.open_pdf(file_content) as stream:
+            return len(PdfReader(stream).pages)
 
     @staticmethod
-    def extract_from_xlsx(file_content):
-        """Extrae texto de un XLSX"""
+    def iter_docx_paragraphs(file_content):
+        """Genera el texto de cada párrafo de un DOCX"""
+        for para in DocxDocument(BytesIO(file_content)).paragraphs:
+            yield para.text
+
+    @staticmethod
+    def iter_xlsx_rows(file_content):
+        """
+        Genera el texto de cada fila de un XLSX, hoja por hoja.
+
+        Abre el libro en modo read_only y itera solo valores: openpyxl no crea objetos
+        de celda ni carga estilos, así que la memoria no crece con el tamaño del libro.
+
+        Args:
+            file_content (bytes): Contenido del XLSX
+
+        Yields:
+            str: Valores no vacíos de la fila separados por espacios
+        """
+        wb = openpyxl.load_workbook(BytesIO(file_content), read_only=True, data_only=True)
         try:
-            wb = openpyxl.load_workbook(BytesIO(file_content))
-            text = ""
             for sheet in wb.worksheets:
-                for row in sheet.iter_rows():
-                    text += " ".join([str(cell.value) for cell in row if cell.value]) + "\n"
-            return text
-        except Exception as e:
-            logger.error(f"Error extracting XLSX text: {str(e)}")
-            raise ValueError("Could not extract text from Excel file")
+                for row in sheet.iter_rows(values_only=True):
+                    yield " ".join(str(value) for value in row if value)
+        finally:
+            wb.close()  # en modo read_only el libro mantiene abierto el archivo
 
     @staticmethod
-    def extract_from_csv(file_content):
-        """Extrae texto de un CSV"""
-        try:
-            text = ""
-            reader = csv.reader(BytesIO(file_content).read().decode('utf-8').splitlines())
-            for row in reader:
-                text += " ".join(row) + "\n"
-            return text
-        except Exception as e:
-            logger.error(f"Error extracting CSV text: {str(e)}")
-            raise ValueError("Could not extract text from CSV file")
+    def iter_csv_rows(file_content):
+        """
+        Genera el texto de cada fila de un CSV decodificando el archivo de forma
+        incremental, sin copiarlo entero a una cadena ni partirlo en líneas.
+
+        Args:
+            file_content (bytes | iterable[bytes]): Contenido del CSV (UTF-8) o bloques
+
+        Yields:
+            str: Campos de la fila separados por espacios
+        """
+        # Las líneas conservan su salto: el módulo csv une los campos entrecomillados multilínea
+        for row in csv.reader(TextExtractor.iter_text_lines(file_content)):
+            yield " ".join(row)
+
+# Estado de cada proceso del pool de extracción de PDF (TextExtractor.iter_pdf_pages)
+_pdf_reader = None
+
+def _init_pdf_worker(file_content):
+    global _pdf_reader
+    _pdf_reader = PdfReader(TextExtractor.open_pdf(file_content))
+
+def _extract_pdf_page(index):
+    return _pdf_reader.pages[index].extract_text() or ""
 
 class TextCleaner:
     """Clase para limpieza de texto"""
@@ -87,26 +267,296 @@ class TextCleaner:
         text = re.sub(r'\n{2,}', '\n\n', text)                # reduce saltos de línea excesivos
         return text.strip()
 
+    @staticmethod
+    def iter_segments(text, max_chars):
+        """
+        Parte un texto en trozos de como mucho max_chars caracteres. Corta por el último
+        espacio del trozo cuando lo hay, para no partir palabras; los trozos concatenados
+        son el texto original.
+
+        Args:
+            text (str): Texto a partir
+            max_chars (int): Tamaño máximo de cada trozo
+
+        Yields:
+            tuple: (offset del trozo en text, trozo)
+        """
+        start = 0
+        while len(text) - start > max_chars:
+            end = text.rfind(' ', start + 1, start + max_chars + 1)
+            if end == -1:
+                end = start + max_chars
+            yield start, text[start:end]
+            start = end
+        yield start, text[start:]
+
+    @staticmethod
+    def iter_clean_lines(pieces):
+        """
+        Versión en streaming de clean_text: genera las líneas limpias (sin salto final)
+        de un iterable de piezas de texto. Colapsa espacios y tabuladores, deja como
+        mucho una línea vacía seguida y omite las líneas vacías del principio y del final.
+
+        Args:
+            pieces (iterable[str]): Piezas de texto (páginas, filas, líneas...)
+
+        Yields:
+            str: Línea limpia
+        """
+        started = blank = False
+        for piece in pieces:
+            for line in piece.splitlines():
+                line = re.sub(r'[ \t]+', ' ', line)
+                if not line.strip():
+                    blank = started
+                    continue
+                if blank:
+                    yield ""
+                    blank = False
+                started = True
+                yield line
+
 class ChunkGenerator:
     """Clase para generar chunks de texto"""
-    
-    @staticmethod
-    def generate_chunks(text: str, chunk_size: int, chunk_overlap: int) -> list:
+
+    # Estrategias de ChunkingSettings.strategy
+    STRATEGY_WORDS = 'words'
+    STRATEGY_SENTENCES = 'sentences'
+
+    WORD = re.compile(r'\S+')
+    # Una oración termina en . ! ? o … (con comillas/paréntesis de cierre) seguidos de
+    # espacio; si no hay más finales, llega hasta el último carácter no blanco
+    SENTENCE = re.compile(r'\S(?:.*?[.!?…]+["\'”’)\]]*(?=\s)|.*\S|)', re.S)
+    # Un párrafo sin líneas vacías se segmenta por partes al superar este tamaño
+    PARAGRAPH_MAX_CHARS = 100000
+
+    @classmethod
+    def generate_chunks(cls, text: str, chunk_size: int, chunk_overlap: int) -> list:
         """Divide el texto en chunks según tamaño y overlap especificado"""
-        words = text.split()
-        chunks = []
-        
+        return list(cls.iter_chunks(StringIO(text), chunk_size, chunk_overlap))
+
+    @staticmethod
+    def iter_chunks(lines, chunk_size: int, chunk_overlap: int):
+        """
+        Genera los mismos chunks que generate_chunks a partir de un iterable de líneas
+        (p. ej. las filas de TextExtractor.iter_xlsx_rows), a medida que se producen.
+        Solo mantiene en memoria las palabras del chunk en curso.
+
+        Args:
+            lines (iterable[str]): Líneas de texto
+            chunk_size (int): Palabras por chunk
+            chunk_overlap (int): Palabras compartidas entre chunks consecutivos
+
+        Yields:
+            str: Chunk de texto
+        """
         if chunk_size <= 0:
             raise ValueError("chunk_size must be greater than 0")
         
         if chunk_overlap >= chunk_size:
             raise ValueError("chunk_overlap must be smaller than chunk_size")
+
+        step = chunk_size - chunk_overlap
+        words = []
+        for line in lines:
+            words.extend(line.split())
+            while len(words) >= chunk_size:
+                yield " ".join(words[:chunk_size])
+                del words[:step]
+        # Cola: ventanas incompletas, igual que el recorrido por rangos de generate_chunks
+        while words:
+            yield " ".join(words[:chunk_size])
+            del words[:step]
+
+    @classmethod
+    def iter_spans(cls, lines, chunk_size: int, chunk_overlap: int, strategy: str = 'words', tokenizer=None):
+        """
+        Motor de chunking con offsets. Genera cada chunk junto con su posición en el
+        texto "\\n".join(lines), que es el texto limpio que guarda DocumentTextService.
+
+        - strategy='words' sin tokenizer: ventanas fijas de palabras, mismos chunks que
+          iter_chunks (y por tanto mismas huellas que los embeddings ya guardados)
+        - strategy='sentences': empaqueta oraciones completas y no cruza un párrafo si
+          el chunk ya va por la mitad; una oración más larga que chunk_size se parte
+          por palabras
+        - tokenizer: chunk_size y chunk_overlap se miden en tokens (TokenizerService)
+          en vez de palabras
+
+        Args:
+            lines (iterable[str]): Líneas de texto limpio (TextCleaner.iter_clean_lines)
+            chunk_size (int): Tamaño máximo del chunk (palabras o tokens)
+            chunk_overlap (int): Solape entre chunks consecutivos (palabras o tokens)
+            strategy (str): 'words' o 'sentences'
+            tokenizer: Objeto con count(text), o None para contar palabras
+
+        Yields:
+            tuple: (texto del chunk, offset inicial, offset final)
+        """
+        if chunk_size <= 0:
+            raise ValueError("chunk_size must be greater than 0")
         
-        for i in range(0, len(words), chunk_size - chunk_overlap):
-            chunk = words[i:i + chunk_size]
-            chunks.append(" ".join(chunk))
-        
-        return chunks
+        if chunk_overlap >= chunk_size:
+            raise ValueError("chunk_overlap must be smaller than chunk_size")
+
+        if strategy not in (cls.STRATEGY_WORDS, cls.STRATEGY_SENTENCES):
+            raise ValueError(f"Unsupported chunking strategy: {strategy}")
+
+        if strategy == cls.STRATEGY_WORDS and tokenizer is None:
+            yield from cls._iter_word_windows(lines, chunk_size, chunk_overlap)
+            return
+
+        measure = tokenizer.count if tokenizer else (lambda text: len(text.split()))
+        if tokenizer and strategy == cls.STRATEGY_WORDS:
+            # Las palabras se repiten mucho: se cachea su número de tokens
+            measure = lru_cache(maxsize=65536)(measure)
+        window, total, fresh = deque(), 0, 0
+        for text, start, end, length, paragraph_start in cls._measured_units(
+            cls._iter_units(lines, strategy), measure, chunk_size
+        ):
+            # Cambio de párrafo con el chunk a medias o más: se cierra aquí
+            flush = fresh and total + length > chunk_size
+            if paragraph_start and fresh and total * 2 >= chunk_size:
+                flush = True
+            if flush:
+                yield cls._span(window)
+                # Solape: las últimas unidades hasta chunk_overlap, nunca el chunk entero
+                kept, tail = 0, deque()
+                for unit in reversed(list(window)[1:]):
+                    if kept + unit[3] > chunk_overlap:
+                        break
+                    tail.appendleft(unit)
+                    kept += unit[3]
+                window, total, fresh = tail, kept, 0
+            while window and total + length > chunk_size:
+                total -= window.popleft()[3]
+            window.append((text, start, end, length))
+            total += length
+            fresh += 1
+        if fresh:
+            yield cls._span(window)
+
+    @classmethod
+    def _iter_word_windows(cls, lines, chunk_size, chunk_overlap):
+        """
+        Mismo recorrido que iter_chunks. Los offsets solo se calculan para la primera y
+        la última palabra de cada chunk, a partir de la línea en la que está cada una.
+        Las líneas de más de TEXT_LINE_MAX_CHARS caracteres se recorren por trozos: la
+        ventana y line_starts guardan el trozo en curso, no la línea entera.
+        """
+        max_chars = settings.TEXT_LINE_MAX_CHARS
+        step = chunk_size - chunk_overlap
+        words, first = [], 0  # first: índice global de words[0]
+        line_starts = deque()  # (índice global de su primera palabra, offset, trozo de línea)
+        offset = 0
+
+        def window():
+            last = first + min(chunk_size, len(words)) - 1
+            return (
+                " ".join(words[:chunk_size]),
+                cls._word_offset(line_starts, first, start=True),
+                cls._word_offset(line_starts, last, start=False)
+            )
+
+        for line in lines:
+            for start, segment in TextCleaner.iter_segments(line, max_chars):
+                segment_words = segment.split()
+                if segment_words:
+                    line_starts.append((first + len(words), offset + start, segment))
+                    words.extend(segment_words)
+                while len(words) >= chunk_size:
+                    yield window()
+                    del words[:step]
+                    first += step
+                    while len(line_starts) > 1 and line_starts[1][0] <= first:
+                        line_starts.popleft()
+            offset += len(line) + 1
+        while words:
+            yield window()
+            del words[:step]
+            first += step
+            while len(line_starts) > 1 and line_starts[1][0] <= first:
+                line_starts.popleft()
+
+    @classmethod
+    def _word_offset(cls, line_starts, index, start):
+        for line_first, line_offset, line in reversed(line_starts):
+            if line_first <= index:
+                for i, match in enumerate(cls.WORD.finditer(line)):
+                    if i == index - line_first:
+                        return line_offset + (match.start() if start else match.end())
+
+    @staticmethod
+    def _span(units):
+        return " ".join(unit[0] for unit in units), units[0][1], units[-1][2]
+
+    @classmethod
+    def _iter_units(cls, lines, strategy):
+        """(texto, inicio, fin, abre_párrafo) de cada palabra u oración"""
+        offset = 0
+        paragraph, paragraph_offset, paragraph_chars, continued = [], 0, 0, False
+        for line in lines:
+            if strategy == cls.STRATEGY_WORDS:
+                for match in cls.WORD.finditer(line):
+                    yield match.group(), offset + match.start(), offset + match.end(), False
+            elif line.strip():
+                if not paragraph:
+                    paragraph_offset = offset
+                paragraph.append(line)
+                paragraph_chars += len(line) + 1
+                if paragraph_chars > cls.PARAGRAPH_MAX_CHARS:
+                    # Se emiten las oraciones completas; la última puede seguir en otra línea
+                    text = "\n".join(paragraph)
+                    sentences = list(cls._iter_sentences(text, paragraph_offset, continued))
+                    continued = True
+                    if len(sentences) > 1:
+                        yield from sentences[:-1]
+                        rest = sentences[-1][1] - paragraph_offset
+                        paragraph, paragraph_offset = [text[rest:]], sentences[-1][1]
+                        paragraph_chars = len(paragraph[0]) + 1
+                    else:
+                        yield from sentences
+                        paragraph, paragraph_chars = [], 0
+            elif paragraph:
+                yield from cls._iter_sentences("\n".join(paragraph), paragraph_offset, continued)
+                paragraph, paragraph_chars, continued = [], 0, False
+            else:
+                continued = False
+            offset += len(line) + 1
+        if paragraph:
+            yield from cls._iter_sentences("\n".join(paragraph), paragraph_offset, continued)
+
+    @classmethod
+    def _iter_sentences(cls, text, base, continued=False):
+        for i, match in enumerate(cls.SENTENCE.finditer(text)):
+            # Los saltos de línea dentro de la oración pasan a ser espacios
+            sentence = " ".join(match.group().split())
+            yield sentence, base + match.start(), base + match.end(), i == 0 and not continued
+
+    @classmethod
+    def _measured_units(cls, units, measure, chunk_size):
+        """Añade la longitud a cada unidad y parte por palabras las que no caben en un chunk"""
+        for text, start, end, paragraph_start in units:
+            length = measure(text)
+            if length <= chunk_size or len(text.split(maxsplit=1)) < 2:
+                yield text, start, end, length, paragraph_start
+                continue
+            for i, match in enumerate(cls.WORD.finditer(text)):
+                word = match.group()
+                yield word, start + match.start(), start + match.end(), measure(word), paragraph_start and i == 0
+
+class ChunkHasher:
+    """Huella de un chunk para no volver a vectorizar chunks sin cambios"""
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """Normaliza los espacios para que el formato no cambie la huella"""
+        return ' '.join(text.split())
+
+    @classmethod
+    def hash_chunk(cls, text: str, embedding_model: str) -> str:
+        """SHA-256 de (texto normalizado, modelo de embeddings)"""
+        payload = f"{embedding_model}\x00{cls.normalize(text)}".encode('utf-8')
+        return hashlib.sha256(payload).hexdigest()
 
 class S3FileService:
     """Clase para interactuar con S3"""
@@ -120,8 +570,8 @@ class S3FileService:
         )
         self.bucket_name = settings.S3_BUCKET
     
-    def get_file_content(self, s3_path: str) -> bytes:
-        """Obtiene el contenido de un archivo desde S3"""
+    @staticmethod
+    def _split_path(s3_path: str):
         if not s3_path.startswith('s3://'):
             raise ValueError("Invalid S3 path format")
         
@@ -129,6 +579,11 @@ class S3FileService:
         path_parts = s3_path[5:].split('/', 1)  # Remueve 's3://'
         bucket_name = path_parts[0]
         object_key = path_parts[1] if len(path_parts) > 1 else ''
+        return bucket_name, object_key
+
+    def get_file_content(self, s3_path: str) -> bytes:
+        """Obtiene el contenido de un archivo desde S3"""
+        bucket_name, object_key = self._split_path(s3_path)
         
         try:
             response = self.s3_client.get_object(Bucket=bucket_name, Key=object_key)
@@ -137,27 +592,209 @@ class S3FileService:
             logger.error(f"Error getting file from S3: {str(e)}")
             raise ValueError(f"Could not retrieve file from S3: {str(e)}")
 
+    def iter_file_chunks(self, s3_path: str, chunk_size: int = 1 << 20):
+        """Genera el contenido de un archivo de S3 por bloques, sin descargarlo entero"""
+        bucket_name, object_key = self._split_path(s3_path)
+
+        try:
+            response = self.s3_client.get_object(Bucket=bucket_name, Key=object_key)
+        except ClientError as e:
+            logger.error(f"Error getting file from S3: {str(e)}")
+            raise ValueError(f"Could not retrieve file from S3: {str(e)}")
+        body = response['Body']
+        try:
+            yield from body.iter_chunks(chunk_size)
+        finally:
+            body.close()
+
+class LocalFileCache:
+    """
+    Copias locales de archivos de S3 compartidas por los procesos de la máquina, p. ej.
+    los shards de un PDF que se ingieren en el mismo worker: el archivo se descarga una
+    vez, por bloques y sin tenerlo entero en memoria, y cada proceso lee de disco solo
+    lo que necesita. Las copias sin usar durante SOURCE_FILE_CACHE_TTL se eliminan.
+    """
+
+    DIRECTORY = settings.SOURCE_FILE_CACHE_DIR
+    TTL = settings.SOURCE_FILE_CACHE_TTL
+
+    @classmethod
+    def path(cls, key):
+        return os.path.join(cls.DIRECTORY, key)
+
+    @classmethod
+    def fetch(cls, s3_path, key):
+        """
+        Devuelve la ruta de la copia local de un archivo, descargándolo si no está.
+
+        Args:
+            s3_path (str): Ruta s3:// del archivo
+            key (str): Nombre de la copia; debe cambiar si cambia el archivo (p. ej. su hash)
+
+        Returns:
+            str: Ruta de la copia local
+        """
+        path = cls.path(key)
+        if os.path.exists(path):
+            os.utime(path)  # Renueva el TTL
+            return path
+
+        os.makedirs(cls.DIRECTORY, exist_ok=True)
+        cls.prune()
+        # Se descarga a un temporal y se renombra: quien descarga a la vez el mismo
+        # archivo nunca ve una copia a medias
+        fd, partial_path = tempfile.mkstemp(dir=cls.DIRECTORY, prefix=f".{key}.")
+        try:
+            with os.fdopen(fd, 'wb') as partial:
+                for block in S3FileService().iter_file_chunks(s3_path):
+                    partial.write(block)
+            os.replace(partial_path, path)
+        except BaseException:
+            cls._remove(partial_path)
+            raise
+        return path
+
+    @classmethod
+    def discard(cls, key):
+        """Elimina la copia local de un archivo, si existe"""
+        cls._remove(cls.path(key))
+
+    @classmethod
+    def prune(cls):
+        """Elimina las copias (y descargas interrumpidas) sin usar durante TTL segundos"""
+        expired = time.time() - cls.TTL
+        for entry in os.scandir(cls.DIRECTORY):
+            try:
+                if entry.is_file() and entry.stat().st_mtime < expired:
+                    cls._remove(entry.path)
+            except FileNotFoundError:
+                continue
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+class EmbeddingClient:
+    """
+    Cliente HTTP reutilizable del servicio de embeddings: una sesión con pool de
+    conexiones keep-alive por proceso, textos enviados en lotes de tamaño máximo
+    con paralelismo acotado, reintentos por lote y resultados en el orden de entrada.
+    """
+
+    # Estados transitorios que se reintentan con backoff exponencial
+    RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+    # Transporte binario opcional: matriz float32 little-endian (una fila por texto, en
+    # orden) con la dimensión en la cabecera X-Embedding-Dim
+    BINARY_CONTENT_TYPE = 'application/x-embeddings-f32'
+    DIM_HEADER = 'X-Embedding-Dim'
+
+    def __init__(self, base_url=None, batch_size=None, max_concurrency=None,
+                 pool_size=None, timeout=None, max_retries=None, binary=None):
+        self.url = f"{base_url or settings.URL_EMBEDDING}/api/v1/embeddings/generate"
+        self.batch_size = max(batch_size or settings.EMBEDDING_BATCH_SIZE, 1)
+        self.max_concurrency = max(max_concurrency or settings.EMBEDDING_MAX_CONCURRENCY, 1)
+        self.timeout = timeout or settings.EMBEDDING_TIMEOUT
+        self.max_retries = settings.EMBEDDING_MAX_RETRIES if max_retries is None else max_retries
+        self.binary = settings.EMBEDDING_BINARY_TRANSPORT if binary is None else binary
+
+        # El pool debe admitir al menos tantas conexiones como peticiones en paralelo
+        pool_size = max(pool_size or settings.EMBEDDING_POOL_SIZE, self.max_concurrency)
+        retry = Retry(
+            total=self.max_retries,
+            backoff_factor=0.5,
+            status_forcelist=self.RETRY_STATUSES,
+            allowed_methods=frozenset(['POST']),
+            raise_on_status=False
+        )
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        if self.binary:
+            self.session.headers['Accept'] = f'{self.BINARY_CONTENT_TYPE}, application/json;q=0.5'
+
+    def _post_batch(self, texts, embedding_model):
+        response = self.session.post(
+            self.url,
+            json={"texts": texts, "embedding_model": embedding_model},
+            timeout=self.timeout
+        )
+        response.raise_for_status()
+        if response.headers.get('Content-Type', '').startswith(self.BINARY_CONTENT_TYPE):
+            embeddings = self.decode_binary(response.content, len(texts), response.headers.get(self.DIM_HEADER))
+        else:
+            embeddings = response.json().get('embeddings', [])
+        if len(embeddings) != len(texts):
+            raise ValueError(
+                f"Embedding service returned {len(embeddings)} embeddings for {len(texts)} texts"
+            )
+        return embeddings
+
+    @staticmethod
+    def decode_binary(content, count, dim):
+        """
+        Decodifica una respuesta binaria sin copiar: las filas devueltas son vistas
+        (np.ndarray float32) sobre el buffer de la respuesta.
+
+        Raises:
+            ValueError: Si el tamaño no corresponde a count vectores de dim componentes
+        """
+        matrix = np.frombuffer(content, dtype='<f4')
+        dim = int(dim) if dim else (matrix.size // count if count else 0)
+        if not dim or matrix.size != count * dim:
+            raise ValueError(
+                f"Binary embeddings response has {matrix.size} floats, expected {count} x {dim}"
+            )
+        return list(matrix.reshape(count, dim))
+
+    def embed(self, texts, embedding_model):
+        """
+        Vectoriza los textos en lotes de como mucho batch_size.
+
+        Args:
+            texts (list[str]): Textos a vectorizar
+            embedding_model (str): Modelo de embeddings
+
+        Returns:
+            list: Un vector por texto, en el mismo orden (listas de float en JSON,
+            np.ndarray float32 con el transporte binario)
+        """
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        if len(batches) <= 1 or self.max_concurrency == 1:
+            results = [self._post_batch(batch, embedding_model) for batch in batches]
+        else:
+            with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(batches))) as executor:
+                # map conserva el orden de los lotes
+                results = list(executor.map(lambda batch: self._post_batch(batch, embedding_model), batches))
+        return [vector for batch in results for vector in batch]
+
 class EmbeddingGenerator:
     """Clase para generar embeddings llamando al servicio externo"""
-    
-    @staticmethod
-    def generate_embeddings(texts: list, embedding_model: str) -> list:
-        """Llama al servicio de embeddings para vectorizar los textos"""
-        print(f'embedding_model: {embedding_model}')
+
+    _client = None
+    _client_lock = threading.Lock()
+
+    @classmethod
+    def get_client(cls):
+        """Cliente compartido por el proceso (se crea en el primer uso, tras el fork de Celery)"""
+        if cls._client is None:
+            with cls._client_lock:
+                if cls._client is None:
+                    cls._client = EmbeddingClient()
+        return cls._client
+
+    @classmethod
+    def generate_embeddings(cls, texts: list, embedding_model: str, client=None) -> list:
+        """
+        Llama al servicio de embeddings para vectorizar los textos. client permite usar
+        un EmbeddingClient propio (p. ej. con menos concurrencia) en lugar del compartido.
+        """
         try:
-            # URL del servicio de embeddings (ajustar según configuración)
-            url=settings.URL_EMBEDDING
-            print(f'url: {url}')
-            #embedding_service_url = "http://embedder.local:8000/api/v1/embeddings/generate"
-            embedding_service_url = F"{url}/api/v1/embeddings/generate"
-            payload = {
-                "texts": texts, 
-                "embedding_model": embedding_model            }
-            
-            response = requests.post(embedding_service_url, json=payload)
-            response.raise_for_status()
-            
-            return response.json().get('embeddings', [])
-        except requests.exceptions.RequestException as e:
+            return (client or cls.get_client()).embed(texts, embedding_model)
+        except (requests.exceptions.RequestException, ValueError) as e:
             logger.error(f"Error calling embedding service: {str(e)}")
-            raise ValueError(f"Could not generate embeddings: {str(e)}")
\ No newline at end of file
+            raise ValueError(f"Could not generate embeddings: {str(e)}")
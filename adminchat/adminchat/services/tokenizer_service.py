@@ -0,0 +1,113 @@
+# adminchat/services/tokenizer_service.py
+from django.conf import settings
+import re
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+try:
+    import tiktoken
+except ImportError:  # dependencia opcional
+    tiktoken = None
+
+try:
+    from tokenizers import Tokenizer as HFTokenizer
+except ImportError:  # dependencia opcional
+    HFTokenizer = None
+
+class RegexTokenizer:
+    """
+    Aproximación sin dependencias: cuenta palabras y signos de puntuación por
+    separado. Subestima algo los tokens BPE de palabras largas o poco comunes.
+    """
+
+    TOKEN = re.compile(r"\w+|[^\w\s]")
+
+    def count(self, text):
+        return sum(1 for _ in self.TOKEN.finditer(text))
+
+class TiktokenTokenizer:
+    """Tokenizador BPE de tiktoken (p. ej. cl100k_base)"""
+
+    def __init__(self, encoding_name):
+        if tiktoken is None:
+            raise ValueError("tiktoken is not installed")
+        self.encoding = tiktoken.get_encoding(encoding_name)
+
+    def count(self, text):
+        return len(self.encoding.encode(text, disallowed_special=()))
+
+class HuggingFaceTokenizer:
+    """Tokenizador de la librería tokenizers cargado desde un tokenizer.json local"""
+
+    def __init__(self, path):
+        if HFTokenizer is None:
+            raise ValueError("tokenizers is not installed")
+        self.tokenizer = HFTokenizer.from_file(path)
+
+    def count(self, text):
+        return len(self.tokenizer.encode(text, add_special_tokens=False).ids)
+
+class TokenizerService:
+    """
+    Registro de tokenizadores locales para medir los chunks en tokens del modelo de
+    embeddings. Un nombre tiene la forma "<tipo>" o "<tipo>:<argumento>":
+
+    - regex: aproximación sin dependencias (por defecto)
+    - tiktoken:<encoding>: p. ej. tiktoken:cl100k_base
+    - hf:<ruta a tokenizer.json>: tokenizador de Hugging Face local
+
+    Se pueden añadir tipos con register(). Las instancias se cachean por nombre.
+    """
+
+    DEFAULT = settings.CHUNK_TOKENIZER
+
+    _factories = {
+        'regex': lambda argument: RegexTokenizer(),
+        'tiktoken': TiktokenTokenizer,
+        'hf': HuggingFaceTokenizer,
+    }
+    _instances = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def register(cls, kind, factory):
+        """
+        Registra un tipo de tokenizador.
+
+        Args:
+            kind (str): Prefijo del nombre
+            factory (callable): Recibe el argumento tras ':' (o None) y devuelve un
+                objeto con count(text) -> int
+        """
+        cls._factories[kind] = factory
+
+    @classmethod
+    def get(cls, name=None):
+        """
+        Devuelve el tokenizador con ese nombre (default: CHUNK_TOKENIZER).
+
+        Raises:
+            ValueError: Si el tipo no existe o no se puede cargar
+        """
+        name = name or cls.DEFAULT
+        tokenizer = cls._instances.get(name)
+        if tokenizer is not None:
+            return tokenizer
+
+        kind, _, argument = name.partition(':')
+        factory = cls._factories.get(kind)
+        if factory is None:
+            raise ValueError(f"Unknown tokenizer: {name}")
+
+        with cls._lock:
+            if name not in cls._instances:
+                try:
+                    cls._instances[name] = factory(argument or None)
+                except ValueError:
+                    raise
+                except Exception as e:
+                    logger.error(f"Could not load tokenizer {name}: {str(e)}")
+                    raise ValueError(f"Could not load tokenizer {name}: {str(e)}") from e
+            return cls._instances[name]
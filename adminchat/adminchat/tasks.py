@@ -1,53 +1,455 @@
 # tasks.py
-from celery import shared_task
+from celery import shared_task, chord
 from .services.embedding_service import EmbeddingGenerator
 from .models import Embedding, Business, Document, ProductServiceItem
+from django.conf import settings
 from django.db import transaction
 import logging
 import json
+import uuid
 from django.utils import timezone
 
 from .services.embedding_service import (
     TextExtractor, TextCleaner, ChunkGenerator, 
-    S3FileService, EmbeddingGenerator
+    S3FileService, EmbeddingGenerator, EmbeddingClient, ChunkHasher, LocalFileCache
 )
 from .services.chunking_service import ChunkingService
 from .services.bot_setting_service import BotSettingsService
+from .services.embedding_loader import EmbeddingBulkLoader
+from .services.ingestion_service import EmbeddingSourceService
+from .services.document_text_service import DocumentTextService
+from .services.reindex_service import ReindexService
+from .services.model_migration_service import ModelMigrationService
 from rest_framework import serializers
 
 logger = logging.getLogger(__name__)
 
 # Funciones helper como funciones independientes (no métodos)
-def process_document(business_id, document_id):
-    """Procesa un documento para extraer su texto"""
-    document = Document.objects.get(id=document_id, business_id=business_id)
+def load_source(business_id, source_type, source_id):
+    """Carga una sola vez el objeto origen (documento o producto) de los embeddings"""
+    if source_type == 'document':
+        return Document.objects.get(id=source_id, business_id=business_id)
+    elif source_type == 'product':
+        return ProductServiceItem.objects.get(id=source_id, business_id=business_id)
+    raise ValueError(f"Unsupported source type: {source_type}")
+
+def source_metadata(source_type, source):
+    """Metadatos del origen comunes a todos los chunks"""
+    if source_type == 'document':
+        return {
+            'document_name': source.name,
+            'document_type': source.type
+        }
+    elif source_type == 'product':
+        return {
+            'product_name': source.name,
+            'product_category': source.category
+        }
+    return {}
+
+def chunk_base_metadata(source_type, source_id, source, embedding_model):
+    """Metadatos comunes a todos los chunks de una ingesta"""
+    return {
+        'source_type': source_type,
+        'source_id': str(source_id),
+        'model_used': embedding_model,
+        'processing_time': timezone.now().isoformat(),
+        **source_metadata(source_type, source)
+    }
+
+def chunk_metadata(base_metadata, i, start, end):
+    """Metadatos de un chunk: posición y offsets en el texto limpio del origen (DocumentTextService)"""
+    return {**base_metadata, 'chunk_index': i, 'char_start': start, 'char_end': end}
+
+def embed_batch(texts, embedding_model, embedding_dim, client=None):
+    """Vectoriza un lote de textos y comprueba que la dimensión coincide con BotSettings"""
+    vectors = EmbeddingGenerator.generate_embeddings(texts, embedding_model=embedding_model, client=client)
+
+    # Los vectores se guardan e indexan por dimensión: deben coincidir con BotSettings
+    mismatched = {len(vector) for vector in vectors} - {embedding_dim}
+    if mismatched:
+        raise ValueError(
+            f"Model {embedding_model} returned {sorted(mismatched)}-dimensional vectors "
+            f"but embedding_dim is {embedding_dim}"
+        )
+    return vectors
+
+def pdf_cache_key(document):
+    """Nombre de la copia local (LocalFileCache) del PDF de un documento"""
+    return f"{document.file_hash}.pdf"
+
+def plan_shards(document):
+    """
+    Decide si un documento se ingiere por shards (PDF grande sin extracción guardada).
+    El PDF se descarga una sola vez a LocalFileCache y las páginas se cuentan sobre esa
+    copia, que reutilizan la ingesta sin shards o los shards del mismo worker.
+
+    Returns:
+        tuple: ([(primera página, última página + 1)] o None, ruta de la copia local
+        del PDF si se descargó, para no descargarlo otra vez)
+    """
+    if document.type != 'pdf' or DocumentTextService.has_cached_text(document):
+        return None, None
+    file_path = LocalFileCache.fetch(document.file_path, pdf_cache_key(document))
+    page_count = TextExtractor.count_pdf_pages(file_path)
+    if page_count < settings.INGESTION_SHARD_MIN_PAGES:
+        return None, file_path
+    size = settings.INGESTION_SHARD_PAGES
+    return [(first, min(first + size, page_count)) for first in range(0, page_count, size)], file_path
+
+def index_by_hash(existing):
+    """
+    Indexa por huella los embeddings ya guardados del origen.
+
+    Args:
+        existing (iterable[Embedding]): Embeddings actuales del origen
+
+    Returns:
+        dict: {content_hash: [Embedding]}
+    """
+    by_hash = {}
+    for embedding in existing:
+        by_hash.setdefault(embedding.content_hash, []).append(embedding)
+    return by_hash
+
+def take_reusable(by_hash, chunk_hash, position):
+    """
+    Retira del índice el embedding que puede reutilizar el chunk de la posición dada.
+    Al terminar, lo que queda en el índice ya no existe en el origen.
+
+    Returns:
+        Embedding | None: Embedding reutilizable o None si hay que vectorizar el chunk
+    """
+    candidates = by_hash.get(chunk_hash)
+    if not candidates:
+        return None
+    # Un texto repetido en el origen reutiliza primero la fila de su misma posición
+    embedding = next((e for e in candidates if e.chunk_index == position), candidates[0])
+    candidates.remove(embedding)
+    return embedding
+
+def repoint(embedding, common_metadata, i, start, end):
+    """
+    Actualiza la posición y los metadatos de un embedding reutilizado.
+
+    Returns:
+        bool: True si cambiaron (hay que guardarlo al publicar)
+    """
+    metadata = {**embedding.metadata, **common_metadata, 'chunk_index': i, 'char_start': start, 'char_end': end}
+    if embedding.chunk_index == i and metadata == embedding.metadata:
+        return False
+    embedding.chunk_index = i
+    embedding.metadata = metadata
+    embedding.updated_at = timezone.now()
+    return True
+
+def ingest_lines(business_id, source_type, source_id, source, lines, config, client=None, on_progress=None):
+    """
+    Ingiere un origen a partir de sus líneas de texto limpio: reserva una generación,
+    trocea, reutiliza por huella los chunks ya vectorizados, vectoriza y escribe el resto
+    (inactivo) por lotes con COPY y publica la generación.
+
+    Args:
+        business_id (UUID): ID del negocio
+        source_type (str): Tipo de origen
+        source_id (UUID): ID del origen
+        source (Document | ProductServiceItem): Objeto origen
+        lines (iterable[str]): Líneas de texto limpio
+        config (dict): embedding_model, embedding_dim, chunking, base_metadata y,
+            opcionalmente, shadow (generación del modelo pendiente de una migración)
+        client (EmbeddingClient): Cliente de embeddings (default: el compartido)
+        on_progress (callable): Recibe (etapa, detalles) a lo largo de la ingesta
+
+    Returns:
+        dict: generation, chunks, created, reused, published y deleted
+
+    Raises:
+        RuntimeError: Si la ingesta falla (la generación se descarta)
+    """
+    embedding_model = config['embedding_model']
+    embedding_dim = config['embedding_dim']
+    chunking = config['chunking']
+    on_progress = on_progress or (lambda stage, details=None: None)
+
+    # Chunks ya vectorizados del origen, por huella: solo los nuevos o modificados
+    # van al servicio de embeddings
+    existing = index_by_hash(
+        EmbeddingSourceService.source_embeddings(business_id, source_type, source_id)
+        .filter(is_active=True)
+        .only('id', 'content_hash', 'chunk_index', 'metadata')
+    )
+    # Generación de esta ingesta: sus filas se escriben inactivas y se publican al final
+    generation = EmbeddingSourceService.allocate_generation(business_id, source_type, source_id)
+    common_metadata = source_metadata(source_type, source)
+
+    on_progress('streaming_chunks', {'generation': generation})
+    logger.info(f"Starting streaming ingestion for {source_type}:{source_id} with model {embedding_model}")
+    batch_size = settings.INGESTION_BATCH_SIZE
+    pending, reused, repointed = [], [], []
+    counts = {'chunks': 0, 'created': 0}
+
+    def save_pending():
+        """Vectoriza el lote pendiente y lo escribe (inactivo) con COPY binario"""
+        vectors = embed_batch([chunk for _, chunk, _, _ in pending], embedding_model, embedding_dim, client)
+
+        with transaction.atomic():
+            EmbeddingBulkLoader.load(
+                Embedding(
+                    business_id=business_id,
+                    vector=vector,
+                    dimensions=embedding_dim,
+                    content=chunk,
+                    source_type=source_type,
+                    source_id=source_id,
+                    chunk_index=i,
+                    content_hash=chunk_hash,
+                    model_name=embedding_model,
+                    generation=generation,
+                    is_active=False,
+                    metadata=chunk_metadata(config['base_metadata'], i, *offsets)
+                )
+                for (i, chunk, chunk_hash, offsets), vector in zip(pending, vectors)
+            )
+        counts['created'] += len(pending)
+        pending.clear()
+        on_progress('embedding_chunks', {
+            'generation': generation,
+            'chunks_processed': counts['chunks'],
+            'embeddings_created': counts['created'],
+            'embeddings_reused': len(reused)
+        })
+
+    try:
+        chunks = ChunkGenerator.iter_spans(
+            lines,
+            chunk_size=chunking['chunk_size'],
+            chunk_overlap=chunking['chunk_overlap'],
+            strategy=chunking['strategy'],
+            tokenizer=ChunkingService.get_tokenizer(chunking)
+        )
+        for i, (chunk, start, end) in enumerate(chunks):
+            counts['chunks'] += 1
+            chunk_hash = ChunkHasher.hash_chunk(chunk, embedding_model)
+            embedding = take_reusable(existing, chunk_hash, i)
+            if embedding is None:
+                pending.append((i, chunk, chunk_hash, (start, end)))
+                if len(pending) >= batch_size:
+                    save_pending()
+                continue
+
+            # Chunks reutilizados: solo se re-apuntan si cambió su posición o el origen
+            reused.append(embedding)
+            if repoint(embedding, common_metadata, i, start, end):
+                repointed.append(embedding)
+        if pending:
+            save_pending()
+    except Exception as e:
+        logger.error(f"Streaming ingestion failed for {source_type}:{source_id}: {str(e)}")
+        EmbeddingSourceService.fail(business_id, source_type, source_id, generation)
+        raise RuntimeError(f"Embedding ingestion failed: {str(e)}") from e
+
+    on_progress('text_chunked', {
+        'chunks_count': counts['chunks'],
+        'chunks_reused': len(reused),
+        'embeddings_count': counts['created']
+    })
+
+    # Transacción corta: activa la generación y elimina las anteriores (e invalida
+    # la caché de búsqueda del negocio)
+    on_progress('publishing_generation', {'generation': generation})
+    try:
+        published = EmbeddingSourceService.publish(
+            business_id, source_type, source_id, generation,
+            reused=reused, repointed=repointed,
+            model_name=embedding_model, shadow=config.get('shadow', False)
+        )
+    except Exception as e:
+        logger.error(f"Failed to save embeddings: {str(e)}")
+        EmbeddingSourceService.fail(business_id, source_type, source_id, generation)
+        raise RuntimeError(f"Failed to save embeddings: {str(e)}") from e
+
+    return {
+        'generation': generation,
+        'chunks': counts['chunks'],
+        'created': counts['created'] if published['published'] else 0,
+        'reused': len(reused) if published['published'] else 0,
+        'published': published['published'],
+        'deleted': published['deleted']
+    }
+
+def ingest_products(business_id, products, config, client=None):
+    """
+    Re-indexa varios productos con una sola llamada al servicio de embeddings (cada
+    producto tiene uno o dos chunks): trocea y deduplica cada producto contra su
+    generación activa, vectoriza juntos los chunks nuevos, los escribe con un único COPY
+    y publica las generaciones de todos en una transacción. Las consultas a la base de
+    datos no dependen del número de productos.
+
+    Args:
+        business_id (UUID): ID del negocio
+        products (list[ProductServiceItem]): Productos del negocio
+        config (dict): embedding_model, embedding_dim, chunking y, opcionalmente, shadow
+        client (EmbeddingClient): Cliente de embeddings (default: el compartido)
+
+    Returns:
+        dict: chunks, created y reused de los productos publicados y failed
+        ({product_id: error}) de los que no se pudieron publicar
+    """
+    embedding_model = config['embedding_model']
+    embedding_dim = config['embedding_dim']
+    chunking = config['chunking']
+    tokenizer = ChunkingService.get_tokenizer(chunking)
+
+    active = {}
+    for embedding in Embedding.objects.filter(
+        business_id=business_id, source_type='product',
+        source_id__in=[product.id for product in products], is_active=True
+    ).only('id', 'source_id', 'content_hash', 'chunk_index', 'metadata'):
+        active.setdefault(embedding.source_id, []).append(embedding)
+
+    generations = EmbeddingSourceService.allocate_generations(
+        business_id, 'product', [product.id for product in products]
+    )
+    plans, pending = [], []
+    try:
+        for product in products:
+            plan = {
+                'source_id': product.id,
+                'generation': generations[product.id],
+                'chunks': 0,
+                'reused': [],
+                'repointed': []
+            }
+            plans.append(plan)
+            existing = index_by_hash(active.get(product.id, ()))
+            common_metadata = source_metadata('product', product)
+            base_metadata = chunk_base_metadata('product', product.id, product, embedding_model)
+            chunks = ChunkGenerator.iter_spans(
+                TextCleaner.iter_clean_lines([process_product(product)]),
+                chunk_size=chunking['chunk_size'],
+                chunk_overlap=chunking['chunk_overlap'],
+                strategy=chunking['strategy'],
+                tokenizer=tokenizer
+            )
+            for i, (chunk, start, end) in enumerate(chunks):
+                plan['chunks'] += 1
+                chunk_hash = ChunkHasher.hash_chunk(chunk, embedding_model)
+                embedding = take_reusable(existing, chunk_hash, i)
+                if embedding is None:
+                    pending.append(Embedding(
+                        business_id=business_id,
+                        dimensions=embedding_dim,
+                        content=chunk,
+                        source_type='product',
+                        source_id=product.id,
+                        chunk_index=i,
+                        content_hash=chunk_hash,
+                        model_name=embedding_model,
+                        generation=plan['generation'],
+                        is_active=False,
+                        metadata=chunk_metadata(base_metadata, i, start, end)
+                    ))
+                    continue
+                plan['reused'].append(embedding)
+                if repoint(embedding, common_metadata, i, start, end):
+                    plan['repointed'].append(embedding)
+
+        if pending:
+            vectors = embed_batch([embedding.content for embedding in pending], embedding_model, embedding_dim, client)
+            for embedding, vector in zip(pending, vectors):
+                embedding.vector = vector
+            with transaction.atomic():
+                EmbeddingBulkLoader.load(pending)
+
+        published = EmbeddingSourceService.publish_batch(
+            business_id, 'product', plans, model_name=embedding_model, shadow=config.get('shadow', False)
+        )
+    except Exception as e:
+        logger.error(f"Product batch ingestion failed for business {business_id}: {str(e)}")
+        for product_id, generation in generations.items():
+            EmbeddingSourceService.fail(business_id, 'product', product_id, generation)
+        raise
+
+    created = {}
+    for embedding in pending:
+        created[embedding.source_id] = created.get(embedding.source_id, 0) + 1
+
+    totals = {'chunks': 0, 'created': 0, 'reused': 0, 'failed': {}}
+    published_ids = set(published['published'])
+    for plan in plans:
+        product_id = plan['source_id']
+        if product_id in published['stale']:
+            logger.error(f"Failed to publish product {product_id}: {published['stale'][product_id]}")
+            EmbeddingSourceService.fail(business_id, 'product', product_id, plan['generation'])
+            totals['failed'][str(product_id)] = str(published['stale'][product_id])
+            continue
+        totals['chunks'] += plan['chunks']
+        if product_id in published_ids:
+            totals['created'] += created.get(product_id, 0)
+            totals['reused'] += len(plan['reused'])
+    return totals
+
+def iter_product_batches(business_id, product_ids=None, batch_size=None):
+    """
+    Recorre productos del negocio en lotes, una consulta por lote: los IDs indicados en
+    trozos de batch_size o, sin IDs, todo el catálogo por keyset sobre el id.
+
+    Yields:
+        list[ProductServiceItem]: Lote de productos
+    """
+    batch_size = batch_size or settings.CATALOG_INGESTION_BATCH_SIZE
+    queryset = ProductServiceItem.objects.filter(business_id=business_id).order_by('id')
+    if product_ids is not None:
+        product_ids = sorted({str(product_id) for product_id in product_ids})
+        for start in range(0, len(product_ids), batch_size):
+            products = list(queryset.filter(id__in=product_ids[start:start + batch_size]))
+            if products:
+                yield products
+        return
+
+    cursor = None
+    while True:
+        products = list((queryset.filter(id__gt=cursor) if cursor else queryset)[:batch_size])
+        if not products:
+            return
+        yield products
+        cursor = products[-1].id
+
+def process_document(document, file_content=None):
+    """
+    Genera las líneas de texto limpio de un documento. Reutiliza la extracción
+    guardada si el archivo y la versión del extractor no han cambiado; si no, extrae
+    el archivo por piezas y guarda el resultado al terminar. Los TXT y CSV se leen
+    de S3 por bloques, sin descargarlos enteros; file_content (contenido o ruta de la
+    copia local de plan_shards) evita descargar otra vez un archivo ya descargado.
+    """
+    if DocumentTextService.has_cached_text(document):
+        logger.info(f"Using stored extraction for document {document.id}")
+        yield from TextCleaner.iter_clean_lines(DocumentTextService.iter_cached_text(document))
+        return
+
     s3_service = S3FileService()
+    writer = DocumentTextService.writer(document)
     
     try:
-        file_content = s3_service.get_file_content(document.file_path)
-        
-        if document.type == 'pdf':
-            return TextExtractor.extract_from_pdf(file_content)
-        elif document.type == 'docx':
-            return TextExtractor.extract_from_docx(file_content)
-        elif document.type == 'txt':
-            return TextExtractor.extract_from_txt(file_content)
-        elif document.type == 'xlsx':
-            return TextExtractor.extract_from_xlsx(file_content)
-        elif document.type == 'csv':
-            return TextExtractor.extract_from_csv(file_content)
-        else:
-            raise ValueError(f"Unsupported document type: {document.type}")
+        if file_content is None and document.type in TextExtractor.STREAMING_TYPES:
+            file_content = s3_service.iter_file_chunks(document.file_path)
+        elif file_content is None:
+            file_content = s3_service.get_file_content(document.file_path)
+
+        for line in TextCleaner.iter_clean_lines(TextExtractor.iter_text(document.type, file_content)):
+            writer.write(line)
+            yield line
     except Exception as e:
-        logger.error(f"Error processing document {document_id}: {str(e)}")
+        logger.error(f"Error processing document {document.id}: {str(e)}")
         raise serializers.ValidationError({
             'source_id': f'Could not process document: {str(e)}'
         })
 
-def process_product(business_id, product_id):
+    writer.close()
+
+def process_product(product):
     """Procesa un producto para generar su texto"""
-    product = ProductServiceItem.objects.get(id=product_id, business_id=business_id)
-    
     text_parts = []
     if product.name:
         text_parts.append(f"Name: {product.name}")
@@ -61,10 +463,24 @@ def process_product(business_id, product_id):
     return "\n".join(text_parts)
 
 
+def schedule_follow_up(business_id, source_type, source_id, embedding_model, shadow):
+    """
+    Encola la ingesta que necesita un origen recién publicado si su modelo de embeddings
+    cambió mientras tanto (ModelMigrationService.follow_up): en sombra durante una
+    migración de modelo, o con el modelo activo tras un cutover.
+    """
+    follow_up = ModelMigrationService.follow_up(business_id, embedding_model, shadow)
+    if follow_up is not None:
+        create_embeddings_task.delay(str(business_id), source_type, str(source_id), shadow=follow_up)
+        logger.info(f"Follow-up ingestion of {source_type}:{source_id} queued (shadow={follow_up})")
+
 @shared_task(bind=True, max_retries=3, retry_backoff=True, retry_jitter=True)
-def create_embeddings_task(self, business_id, source_type, source_id):
+def create_embeddings_task(self, business_id, source_type, source_id, shadow=False):
     """
-    Complete embedding generation task with proper Celery state management
+    Complete embedding generation task with proper Celery state management.
+
+    With shadow=True the source is embedded with the pending model of an embedding
+    model migration (ModelMigrationService) and published as its shadow generation.
     """
     
     def update_progress(stage, details=None):
@@ -87,11 +503,9 @@ def create_embeddings_task(self, business_id, source_type, source_id):
     try:
         # ===== 1. VALIDATE BUSINESS =====
         update_progress('validating_business')
-        try:
-            business = Business.objects.get(id=business_id)
-        except Business.DoesNotExist as e:
+        if not Business.objects.filter(id=business_id).exists():
             logger.error(f"Business not found: {business_id}")
-            raise ValueError(f"Business not found: {business_id}") from e
+            raise ValueError(f"Business not found: {business_id}")
 
         # ===== 2. GET BOT CONFIGURATION =====
         update_progress('loading_bot_configuration')
@@ -102,11 +516,29 @@ def create_embeddings_task(self, business_id, source_type, source_id):
                 raise ValueError("Bot settings incomplete: missing embedding_model_name")
                 
             embedding_model = bot_settings['embedding_model_name']
-            update_progress('bot_configuration_loaded', {'embedding_model': embedding_model})
+            embedding_dim = bot_settings['embedding_dim']
+            if shadow:
+                embedding_model = bot_settings['pending_embedding_model_name']
+                embedding_dim = bot_settings['pending_embedding_dim']
+            update_progress('bot_configuration_loaded', {
+                'embedding_model': embedding_model,
+                'embedding_dim': embedding_dim
+            })
         except Exception as e:
             logger.error(f"Bot config error for business {business_id}: {str(e)}")
             raise ValueError(f"Bot configuration error: {str(e)}") from e
 
+        if shadow and not embedding_model:
+            # La migración de modelo terminó o se canceló antes de ejecutar la tarea
+            logger.info(f"No embedding model migration for business {business_id}; skipping shadow ingestion")
+            return {
+                'status': 'skipped',
+                'business_id': str(business_id),
+                'source_type': source_type,
+                'source_id': str(source_id),
+                'task_id': str(self.request.id)
+            }
+
         # ===== 3. GET CHUNKING SETTINGS =====
         update_progress('loading_chunking_settings')
         try:
@@ -115,115 +547,109 @@ def create_embeddings_task(self, business_id, source_type, source_id):
                 logger.error(f"No chunking settings for business {business_id}, source_type {source_type}")
                 raise ValueError(f"No chunking settings found for {source_type}")
             
+            # Valida el tokenizador antes de abrir el contenido
+            ChunkingService.get_tokenizer(chunking_settings)
             update_progress('chunking_settings_loaded', {
                 'chunk_size': chunking_settings['chunk_size'],
-                'chunk_overlap': chunking_settings['chunk_overlap']
+                'chunk_overlap': chunking_settings['chunk_overlap'],
+                'strategy': chunking_settings['strategy'],
+                'length_unit': chunking_settings['length_unit']
             })
         except Exception as e:
             logger.error(f"Chunking config error: {str(e)}")
             raise ValueError(f"Chunking configuration error: {str(e)}") from e
 
-        # ===== 4. PROCESS CONTENT =====
+        # ===== 4. OPEN CONTENT STREAM =====
+        # El contenido no se materializa: extractor -> limpieza -> chunks -> lotes de
+        # embeddings -> COPY. La memoria depende del tamaño de lote, no del documento
         update_progress('processing_content')
         try:
+            # El objeto origen se carga una vez y se reutiliza en el resto de etapas
+            source = load_source(business_id, source_type, source_id)
+            page_ranges = file_content = None
             if source_type == 'document':
-                text = process_document(business_id, source_id)
-            elif source_type == 'product':
-                text = process_product(business_id, source_id)
+                page_ranges, file_content = plan_shards(source)
+                if not page_ranges:
+                    lines = process_document(source, file_content)
             else:
-                logger.error(f"Unsupported source type: {source_type}")
-                raise ValueError(f"Unsupported source type: {source_type}")
-            
-            update_progress('content_processed', {'text_length': len(text)})
+                lines = TextCleaner.iter_clean_lines([process_product(source)])
         except Exception as e:
             logger.error(f"Content processing failed: {str(e)}")
             raise ValueError(f"Content processing failed: {str(e)}") from e
 
-        # ===== 5. CLEAN AND CHUNK TEXT =====
-        update_progress('cleaning_and_chunking')
-        cleaned_text = TextCleaner.clean_text(text)
-        chunks = ChunkGenerator.generate_chunks(
-            cleaned_text,
-            chunk_size=chunking_settings['chunk_size'],
-            chunk_overlap=chunking_settings['chunk_overlap']
-        )
-        
-        update_progress('text_chunked', {'chunks_count': len(chunks)})
+        config = {
+            'embedding_model': embedding_model,
+            'embedding_dim': embedding_dim,
+            'chunking': chunking_settings,
+            'base_metadata': chunk_base_metadata(source_type, source_id, source, embedding_model),
+            'shadow': shadow
+        }
 
-        # ===== 6. GENERATE EMBEDDINGS =====
-        update_progress('generating_embeddings')
-        logger.info(f"Starting embedding generation for {source_type}:{source_id}")
-        logger.info(f"Generating embeddings with model {embedding_model}")
-        try:
-            embeddings = EmbeddingGenerator.generate_embeddings(
-                chunks,
-                embedding_model=embedding_model  # Cambiar de 'model_name' a 'embedding_model'
+        # Documentos grandes: un shard por rango de páginas en paralelo y una tarea
+        # final (chord) que publica la generación
+        if page_ranges:
+            generation = EmbeddingSourceService.allocate_generation(business_id, source_type, source_id)
+            shard_task_ids = [str(uuid.uuid4()) for _ in page_ranges]
+            finalize_task_id = str(uuid.uuid4())
+            finalize = finalize_ingestion_task.s(
+                str(business_id), source_type, str(source_id), generation, embedding_model, shadow
+            ).set(task_id=finalize_task_id)
+            finalize.link_error(ingestion_failed_task.si(str(business_id), source_type, str(source_id), generation))
+            chord(
+                ingest_shard_task.si(
+                    str(business_id), source_type, str(source_id), generation, shard, first, last, config
+                ).set(task_id=shard_task_ids[shard])
+                for shard, (first, last) in enumerate(page_ranges)
+            )(finalize)
+            logger.info(
+                f"Sharded ingestion of {source_type}:{source_id}: {len(page_ranges)} shards, generation {generation}"
             )
 
+            # TaskStatusView agrega el progreso de los shards a partir de este resultado
+            return {
+                'status': 'sharded',
+                'generation': generation,
+                'shard_task_ids': shard_task_ids,
+                'finalize_task_id': finalize_task_id,
+                'page_ranges': page_ranges,
+                'business_id': str(business_id),
+                'source_type': source_type,
+                'source_id': str(source_id),
+                'task_id': str(self.request.id),
+                'monitor_url': f'/api/tasks/{self.request.id}/status/',
+                'embedding_model': embedding_model,
+                'retry_count': self.request.retries
+            }
 
-            update_progress('embeddings_generated', {'embeddings_count': len(embeddings)})
-        except Exception as e:
-            logger.error(f"Embedding generation failed with model {embedding_model}: {str(e)}")
-            raise RuntimeError(f"Embedding generation failed: {str(e)}") from e
-
-        # ===== 7. SAVE TO DATABASE =====
-        update_progress('saving_to_database')
-        try:
-            with transaction.atomic():
-                embedding_objects = []
-                for i, (chunk, vector) in enumerate(zip(chunks, embeddings)):
-                    metadata = {
-                        'source_type': source_type,
-                        'source_id': str(source_id),
-                        'chunk_index': i,
-                        'model_used': embedding_model,
-                        'processing_time': timezone.now().isoformat()
-                    }
-
-                    if source_type == 'document':
-                        doc = Document.objects.get(id=source_id)
-                        metadata.update({
-                            'document_name': doc.name,
-                            'document_type': doc.type
-                        })
-                    elif source_type == 'product':
-                        product = ProductServiceItem.objects.get(id=source_id)
-                        metadata.update({
-                            'product_name': product.name,
-                            'product_category': product.category
-                        })
-
-                    embedding_objects.append(Embedding(
-                        business=business,
-                        vector=vector,
-                        content=chunk,
-                        source_type=source_type,
-                        source_id=source_id,
-                        chunk_index=i,
-                        metadata=metadata
-                    ))
-
-                Embedding.objects.bulk_create(embedding_objects)
-
-                # Successful response
-                return {
-                    'status': 'completed',
-                    'embeddings_created': len(embedding_objects),
-                    'business_id': str(business_id),
-                    'source_type': source_type,
-                    'source_id': str(source_id),
-                    'task_id': str(self.request.id),
-                    'monitor_url': f'/api/tasks/{self.request.id}/status/',
-                    'embedding_model': embedding_model,
-                    'chunk_size': chunking_settings['chunk_size'],
-                    'chunk_overlap': chunking_settings['chunk_overlap'],
-                    'processing_time': timezone.now().isoformat(),
-                    'retry_count': self.request.retries
-                }
+        # ===== 5-7. CHUNK, DEDUPLICATE, EMBED, SAVE IN BATCHES AND PUBLISH =====
+        result = ingest_lines(
+            business_id, source_type, source_id, source, lines, config, on_progress=update_progress
+        )
+        if file_content:
+            LocalFileCache.discard(pdf_cache_key(source))
+        if result['published']:
+            schedule_follow_up(business_id, source_type, source_id, embedding_model, shadow)
 
-        except Exception as e:
-            logger.error(f"Failed to save embeddings: {str(e)}")
-            raise RuntimeError(f"Failed to save embeddings: {str(e)}") from e
+        # Successful response
+        return {
+            'status': 'completed' if result['published'] else 'superseded',
+            'generation': result['generation'],
+            'chunks_count': result['chunks'],
+            'embeddings_created': result['created'],
+            'embeddings_reused': result['reused'],
+            'embeddings_deleted': result['deleted'],
+            'business_id': str(business_id),
+            'source_type': source_type,
+            'source_id': str(source_id),
+            'task_id': str(self.request.id),
+            'monitor_url': f'/api/tasks/{self.request.id}/status/',
+            'embedding_model': embedding_model,
+            'shadow': shadow,
+            'chunk_size': chunking_settings['chunk_size'],
+            'chunk_overlap': chunking_settings['chunk_overlap'],
+            'processing_time': timezone.now().isoformat(),
+            'retry_count': self.request.retries
+        }
 
     except Exception as e:
         # Log the error for debugging
@@ -253,4 +679,373 @@ def create_embeddings_task(self, business_id, source_type, source_id):
                 'retry_count': self.request.retries,
                 'max_retries': self.max_retries
             }
-        }
\ No newline at end of file
+        }
+
+
+@shared_task(bind=True, max_retries=3, retry_backoff=True, retry_jitter=True)
+def create_catalog_embeddings_task(self, business_id, product_ids=None, shadow=False):
+    """
+    Vectoriza muchos productos de un negocio (importación de catálogo) sin una tarea por
+    producto: la configuración del bot y del chunking se lee una vez y cada lote de
+    CATALOG_INGESTION_BATCH_SIZE productos se carga con una consulta, se vectoriza con
+    una llamada compartida al servicio de embeddings, se escribe con un COPY y se publica
+    en una transacción (ingest_products).
+
+    Args:
+        business_id (UUID): ID del negocio
+        product_ids (list[UUID]): Productos a vectorizar (default: todo el catálogo)
+        shadow (bool): Con el modelo pendiente de una migración de modelo
+    """
+    bot_settings = BotSettingsService.get_bot_settings(str(business_id))
+    embedding_model = bot_settings['embedding_model_name']
+    embedding_dim = bot_settings['embedding_dim']
+    if shadow:
+        embedding_model = bot_settings['pending_embedding_model_name']
+        embedding_dim = bot_settings['pending_embedding_dim']
+        if not embedding_model:
+            logger.info(f"No embedding model migration for business {business_id}; skipping shadow catalog")
+            return {'status': 'skipped', 'business_id': str(business_id), 'task_id': str(self.request.id)}
+
+    progress = {
+        'business_id': str(business_id),
+        'task_id': str(self.request.id),
+        'embedding_model': embedding_model,
+        'shadow': shadow,
+        'products_total': (
+            len(set(map(str, product_ids))) if product_ids is not None
+            else ProductServiceItem.objects.filter(business_id=business_id).count()
+        ),
+        'products_done': 0,
+        'chunks_count': 0,
+        'embeddings_created': 0,
+        'embeddings_reused': 0,
+        'failed': {}
+    }
+    try:
+        chunking = ChunkingService.get_chunking_settings(str(business_id), 'product')
+        if not chunking:
+            raise ValueError("No chunking settings found for product")
+        config = {
+            'embedding_model': embedding_model,
+            'embedding_dim': embedding_dim,
+            'chunking': chunking,
+            'shadow': shadow
+        }
+        for products in iter_product_batches(business_id, product_ids):
+            result = ingest_products(business_id, products, config)
+            progress['products_done'] += len(products)
+            progress['chunks_count'] += result['chunks']
+            progress['embeddings_created'] += result['created']
+            progress['embeddings_reused'] += result['reused']
+            progress['failed'].update(result['failed'])
+            self.update_state(state='PROGRESS', meta={'stage': 'embedding_catalog', **progress})
+    except Exception as e:
+        # Un reintento repite los lotes ya publicados reutilizando sus embeddings por huella
+        logger.error(f"Catalog ingestion failed for business {business_id}: {str(e)}")
+        if self.request.retries < self.max_retries:
+            raise self.retry(exc=e, countdown=60 * (2 ** self.request.retries))
+        raise
+
+    schedule = ModelMigrationService.follow_up(business_id, embedding_model, shadow)
+    if schedule is not None:
+        create_catalog_embeddings_task.delay(str(business_id), product_ids, shadow=schedule)
+
+    logger.info(
+        f"Catalog ingestion for business {business_id}: {progress['products_done']} products, "
+        f"{progress['embeddings_created']} embeddings created, {len(progress['failed'])} failed"
+    )
+    return {
+        **progress,
+        'status': 'completed',
+        'products_missing': progress['products_total'] - progress['products_done'],
+        'processing_time': timezone.now().isoformat()
+    }
+
+
+@shared_task(bind=True, max_retries=3, retry_backoff=True, retry_jitter=True)
+def ingest_shard_task(self, business_id, source_type, source_id, generation, shard, first_page, last_page, config):
+    """
+    Shard de una ingesta por rangos de páginas: extrae las páginas [first_page, last_page)
+    de la copia local del PDF (LocalFileCache) y las trocea, vectoriza y escribe (inactivas) por lotes, igual que
+    create_embeddings_task. Los chunks se numeran desde shard * SHARD_STRIDE con offsets
+    relativos al texto del shard; finalize_ingestion_task los renumera y publica.
+
+    Los chunks cuyo texto ya está vectorizado en la generación activa copian ese vector
+    en lugar de pedirlo al servicio de embeddings.
+    """
+    progress = {'shard': shard, **{counter: 0 for counter in EmbeddingSourceService.SHARD_COUNTERS}}
+    embedding_model = config['embedding_model']
+    embedding_dim = config['embedding_dim']
+    chunking = config['chunking']
+
+    def save_batch(batch):
+        """Copia los vectores conocidos, vectoriza el resto y escribe el lote con COPY"""
+        known = dict(
+            EmbeddingSourceService.source_embeddings(business_id, source_type, source_id)
+            .filter(is_active=True, dimensions=embedding_dim, content_hash__in={row[2] for row in batch})
+            .values_list('content_hash', 'vector')
+        )
+        copied = sum(1 for row in batch if row[2] in known)
+        missing = {chunk_hash: chunk for _, chunk, chunk_hash, _, _ in batch if chunk_hash not in known}
+        if missing:
+            known.update(zip(missing, embed_batch(list(missing.values()), embedding_model, embedding_dim)))
+
+        with transaction.atomic():
+            EmbeddingBulkLoader.load(
+                Embedding(
+                    business_id=business_id,
+                    vector=known[chunk_hash],
+                    dimensions=embedding_dim,
+                    content=chunk,
+                    source_type=source_type,
+                    source_id=source_id,
+                    chunk_index=i,
+                    content_hash=chunk_hash,
+                    model_name=embedding_model,
+                    generation=generation,
+                    is_active=False,
+                    metadata=chunk_metadata(config['base_metadata'], i, start, end)
+                )
+                for i, chunk, chunk_hash, start, end in batch
+            )
+        progress['embeddings_created'] += len(batch) - copied
+        progress['embeddings_copied'] += copied
+        self.update_state(state='PROGRESS', meta=progress)
+
+    try:
+        document = load_source(business_id, source_type, source_id)
+        # Un reintento empieza de cero: se eliminan las filas del intento anterior
+        EmbeddingSourceService.clear_shard(business_id, source_type, source_id, generation, shard)
+        # Copia local compartida con los demás shards del worker: se descarga una vez y
+        # cada shard lee del disco solo los objetos de sus páginas
+        file_path = LocalFileCache.fetch(document.file_path, pdf_cache_key(document))
+
+        def counted_pages():
+            for text in TextExtractor.iter_pdf_pages(file_path, pages=range(first_page, last_page)):
+                yield text
+                progress['pages_done'] += 1
+
+        chars = 0
+
+        def counted_lines():
+            nonlocal chars
+            for line in TextCleaner.iter_clean_lines(counted_pages()):
+                chars += len(line) + 1
+                yield line
+
+        chunks = ChunkGenerator.iter_spans(
+            counted_lines(),
+            chunk_size=chunking['chunk_size'],
+            chunk_overlap=chunking['chunk_overlap'],
+            strategy=chunking['strategy'],
+            tokenizer=ChunkingService.get_tokenizer(chunking)
+        )
+        first_index = shard * EmbeddingSourceService.SHARD_STRIDE
+        batch = []
+        for i, (chunk, start, end) in enumerate(chunks):
+            progress['chunks_processed'] += 1
+            batch.append((first_index + i, chunk, ChunkHasher.hash_chunk(chunk, embedding_model), start, end))
+            if len(batch) >= settings.INGESTION_BATCH_SIZE:
+                save_batch(batch)
+                batch = []
+        if batch:
+            save_batch(batch)
+
+        return {**progress, 'chars': chars}
+
+    except Exception as e:
+        logger.error(f"Shard {shard} of {source_type}:{source_id} failed: {str(e)}")
+        if self.request.retries < self.max_retries:
+            raise self.retry(exc=e, countdown=60 * (2 ** self.request.retries))
+        # Sin reintentos: el chord falla y ingestion_failed_task descarta la generación
+        raise
+
+
+@shared_task(bind=True)
+def finalize_ingestion_task(self, shard_results, business_id, source_type, source_id, generation,
+                            embedding_model=None, shadow=False):
+    """
+    Callback del chord de una ingesta por shards: renumera los chunks de todos los shards
+    y publica la generación (el origen pasa a ready), en sombra si la ingesta usa el
+    modelo pendiente de una migración de modelo.
+    """
+    try:
+        with transaction.atomic():
+            EmbeddingSourceService.merge_shards(
+                business_id, source_type, source_id, generation,
+                {result['shard']: result['chars'] for result in shard_results}
+            )
+            published = EmbeddingSourceService.publish(
+                business_id, source_type, source_id, generation, model_name=embedding_model, shadow=shadow
+            )
+    except Exception as e:
+        logger.error(f"Failed to publish sharded ingestion of {source_type}:{source_id}: {str(e)}")
+        EmbeddingSourceService.fail(business_id, source_type, source_id, generation)
+        raise
+
+    # Los shards ya terminaron: se elimina la copia local del PDF (las de otros workers
+    # caducan por SOURCE_FILE_CACHE_TTL)
+    document = Document.objects.filter(id=source_id).only('file_hash').first()
+    if document is not None:
+        LocalFileCache.discard(pdf_cache_key(document))
+
+    if published['published'] and embedding_model:
+        schedule_follow_up(business_id, source_type, source_id, embedding_model, shadow)
+
+    totals = {
+        counter: sum(result[counter] for result in shard_results)
+        for counter in EmbeddingSourceService.SHARD_COUNTERS
+    }
+    return {
+        'status': 'completed' if published['published'] else 'superseded',
+        'generation': generation,
+        'shards': len(shard_results),
+        'pages_count': totals['pages_done'],
+        'chunks_count': totals['chunks_processed'],
+        'embeddings_created': totals['embeddings_created'] if published['published'] else 0,
+        'embeddings_reused': totals['embeddings_copied'] if published['published'] else 0,
+        'embeddings_deleted': published['deleted'],
+        'business_id': business_id,
+        'source_type': source_type,
+        'source_id': source_id,
+        'task_id': str(self.request.id),
+        'processing_time': timezone.now().isoformat()
+    }
+
+
+@shared_task
+def ingestion_failed_task(business_id, source_type, source_id, generation):
+    """Errback del chord: descarta la generación de una ingesta por shards que falló"""
+    logger.error(f"Sharded ingestion of {source_type}:{source_id} (generation {generation}) failed")
+    EmbeddingSourceService.fail(business_id, source_type, source_id, generation)
+
+
+@shared_task(bind=True)
+def reindex_business_task(self, job_id):
+    """
+    Re-indexa todos los documentos y productos de un negocio (ReindexJob).
+
+    La configuración (modelo del trabajo y chunking) se lee una vez. Los documentos se
+    ingieren de uno en uno, sin shards, y los productos por lotes que comparten la
+    llamada al servicio de embeddings; todas las llamadas usan un cliente limitado a
+    REINDEX_MAX_CONCURRENCY peticiones en paralelo para no saturar el servicio. El
+    cursor y los contadores se guardan tras cada documento o lote de productos: un
+    trabajo interrumpido continúa desde ahí (ReindexService.resume). Un origen que falla
+    se registra en failures sin detener el trabajo; un lote de productos que falla
+    entero o MAX_CONSECUTIVE_FAILURES documentos seguidos lo detienen (failed).
+
+    Un trabajo en sombra (migración de modelo) publica las generaciones en sombra y, al
+    completarse, hace el cutover al modelo nuevo y programa la eliminación de las filas
+    del anterior pasado EMBEDDING_MODEL_GC_DELAY.
+    """
+    job = ReindexService.claim(job_id, self.request.id)
+    if job is None:
+        logger.info(f"Reindex job {job_id} is not pending; skipping")
+        return {'job_id': str(job_id), 'status': 'skipped'}
+
+    business_id = job.business_id
+    logger.info(f"Reindex job {job.id} for business {business_id} starting at {job.phase}:{job.cursor}")
+    try:
+        client = EmbeddingClient(max_concurrency=settings.REINDEX_MAX_CONCURRENCY)
+        shared_config = {
+            'embedding_model': job.embedding_model,
+            'embedding_dim': job.embedding_dim,
+            'shadow': job.shadow
+        }
+        chunking = {}
+        for source_type, _ in ReindexService.PHASES:
+            chunking[source_type] = ChunkingService.get_chunking_settings(str(business_id), source_type)
+            # Un tokenizador que no carga haría fallar todos los orígenes: se comprueba antes
+            ChunkingService.get_tokenizer(chunking[source_type])
+
+        def heartbeat(stage, details=None):
+            ReindexService.heartbeat(job)
+
+        if job.phase == 'document':
+            consecutive_failures = 0
+            for documents in ReindexService.iter_pages(job, Document, settings.REINDEX_PAGE_SIZE):
+                for document in documents:
+                    config = {
+                        **shared_config,
+                        'chunking': chunking['document'],
+                        'base_metadata': chunk_base_metadata('document', document.id, document, job.embedding_model)
+                    }
+                    try:
+                        ReindexService.add_counts(job, ingest_lines(
+                            business_id, 'document', document.id, document, process_document(document),
+                            config, client=client, on_progress=heartbeat
+                        ))
+                        consecutive_failures = 0
+                    except Exception as e:
+                        logger.error(f"Reindex job {job.id}: document {document.id} failed: {str(e)}")
+                        consecutive_failures += 1
+                        # Muchos fallos seguidos apuntan al servicio de embeddings o a la base
+                        # de datos, no a los documentos: se detiene sin avanzar el cursor
+                        if consecutive_failures >= ReindexService.MAX_CONSECUTIVE_FAILURES:
+                            raise RuntimeError(
+                                f"{consecutive_failures} consecutive documents failed; last error: {str(e)}"
+                            ) from e
+                        ReindexService.record_failure(job, 'document', document.id, e)
+                    job.documents_done += 1
+                    job.cursor = document.id
+                    if not ReindexService.checkpoint(job):
+                        return ReindexService.summary(job)
+            if not ReindexService.next_phase(job):
+                return ReindexService.summary(job)
+
+        if job.phase == 'product':
+            config = {**shared_config, 'chunking': chunking['product']}
+            for products in ReindexService.iter_pages(job, ProductServiceItem, settings.REINDEX_PRODUCT_BATCH_SIZE):
+                # Si falla el lote entero (servicio de embeddings, COPY) el trabajo se detiene
+                # y, al reanudarlo, el lote se repite desde el cursor
+                result = ingest_products(business_id, products, config, client=client)
+                ReindexService.add_counts(job, result)
+                for product_id, error in result['failed'].items():
+                    ReindexService.record_failure(job, 'product', product_id, error)
+                job.products_done += len(products)
+                job.cursor = products[-1].id
+                if not ReindexService.checkpoint(job):
+                    return ReindexService.summary(job)
+            if not ReindexService.next_phase(job):
+                return ReindexService.summary(job)
+
+        ReindexService.finish(job)
+    except Exception as e:
+        logger.error(f"Reindex job {job.id} failed: {str(e)}")
+        ReindexService.finish(job, error=e)
+        raise
+
+    logger.info(
+        f"Reindex job {job.id} completed: {job.documents_done} documents, {job.products_done} products, "
+        f"{job.sources_failed} failed"
+    )
+    if job.shadow:
+        try:
+            ModelMigrationService.cutover(business_id, job.embedding_model)
+        except ValueError as e:
+            # Orígenes fallidos o creados durante el trabajo: el cutover se repite por la API
+            logger.warning(f"Reindex job {job.id}: cutover to {job.embedding_model} postponed: {str(e)}")
+        else:
+            schedule_model_garbage_collection(business_id)
+    return ReindexService.summary(job)
+
+
+@shared_task
+def collect_model_garbage_task(business_id):
+    """
+    Elimina por lotes las filas de modelos de embeddings retirados (cutover o migración
+    cancelada) de un negocio.
+    """
+    deleted = ModelMigrationService.collect_garbage(business_id)
+    return {'business_id': str(business_id), 'deleted': deleted}
+
+
+def schedule_model_garbage_collection(business_id):
+    """
+    Encola collect_model_garbage_task pasado EMBEDDING_MODEL_GC_DELAY: hasta entonces los
+    procesos con BotSettings cacheados (TenantSettingsCache) pueden seguir buscando en
+    las filas del modelo anterior.
+    """
+    return collect_model_garbage_task.apply_async(
+        args=[str(business_id)], countdown=settings.EMBEDDING_MODEL_GC_DELAY
+    )
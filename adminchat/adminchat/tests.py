@@ -0,0 +1,477 @@
+# adminchat/tests.py
+import resource
+import tempfile
+from io import BytesIO
+from unittest import mock
+import numpy as np
+import openpyxl
+from PyPDF2 import PdfWriter
+from django.conf import settings
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from .models import Business, BotSettings, Document, Embedding, EmbeddingSource, ProductServiceItem
+from .services.cache_service import TenantSettingsCache
+from .services.embedding_loader import EmbeddingBulkLoader
+from .services.embedding_service import ChunkGenerator, TextCleaner, TextExtractor, process_backend
+from .tasks import chunk_base_metadata, ingest_lines, ingest_products
+from .management.commands.benchmark_ingestion_memory import synthetic_blocks
+
+# Caché local: la caché de resultados de búsqueda se desactiva y no hace falta Redis
+LOCAL_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class EmbeddingSearchQueriesTest(TestCase):
+    """Coste en consultas de POST /api/embeddings/search/"""
+
+    DIM = 384
+    ROWS = 60
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.business = Business.objects.create(name="Search queries")
+        cls.bot_settings = BotSettings.objects.create(business=cls.business, embedding_dim=cls.DIM)
+        cls.vectors = np.random.default_rng(0).standard_normal((cls.ROWS, cls.DIM)).astype('<f4')
+        Embedding.objects.bulk_create([
+            Embedding(
+                business=cls.business,
+                vector=vector,
+                dimensions=cls.DIM,
+                content=f"chunk {i}",
+                source_type='other',
+                source_id=cls.business.id,
+                chunk_index=i,
+                model_name=cls.bot_settings.embedding_model_name
+            )
+            for i, vector in enumerate(cls.vectors)
+        ])
+
+    def setUp(self):
+        TenantSettingsCache.cache.clear()
+        self.client = APIClient()
+
+    def search(self, top_k):
+        return self.client.post('/api/embeddings/search/', {
+            'business_id': str(self.business.id),
+            'vector': [float(x) for x in self.vectors[0]],
+            'top_k': top_k,
+            'min_similarity': -1
+        }, format='json')
+
+    def test_top_k_50_is_a_single_query(self):
+        # Primera búsqueda: BotSettings del negocio + la consulta de búsqueda
+        with self.assertNumQueries(2):
+            response = self.search(top_k=50)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 50)
+
+        # Con BotSettings ya en TenantSettingsCache solo queda la consulta de búsqueda,
+        # sin cargas perezosas de business ni lectura del vector por resultado
+        with self.assertNumQueries(1):
+            response = self.search(top_k=50)
+        results = response.data['results']
+        self.assertEqual(len(results), 50)
+        self.assertEqual(results[0]['content'], "chunk 0")
+        self.assertNotIn('vector', results[0])
+        self.assertEqual(str(results[0]['business_id']), str(self.business.id))
+
+
+class StubEmbeddingClient:
+    """Cliente de embeddings en memoria: un vector constante por texto"""
+
+    def __init__(self, dim):
+        self.dim = dim
+        self.calls = 0
+
+    def embed(self, texts, embedding_model):
+        self.calls += 1
+        return [np.ones(self.dim, dtype='<f4') for _ in texts]
+
+
+def create_document(business, name):
+    return Document.objects.create(
+        business=business, name=name, type='txt',
+        file_path=f"documents/{name}", file_hash=f"hash-{name}"
+    )
+
+
+def word_lines(chunks, prefix='w'):
+    """Una línea de 5 palabras por chunk (ventanas de 5 palabras sin solape)"""
+    return [" ".join(f"{prefix}{i}_{j}" for j in range(5)) for i in range(chunks)]
+
+
+def ingestion_config(document, dim, model):
+    return {
+        'embedding_model': model,
+        'embedding_dim': dim,
+        'chunking': {'chunk_size': 5, 'chunk_overlap': 0, 'strategy': 'words'},
+        'base_metadata': chunk_base_metadata('document', document.id, document, model)
+    }
+
+
+@override_settings(CACHES=LOCAL_CACHES, INGESTION_BATCH_SIZE=1000)
+class IngestionQueriesTest(TestCase):
+    """Las consultas de una ingesta no dependen del número de chunks del origen"""
+
+    DIM = 384
+    MODEL = 'test-model'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.business = Business.objects.create(name="Ingestion queries")
+
+    def ingest(self, chunks):
+        """Ingiere un documento de chunks chunks y devuelve (consultas, llamadas al servicio, escrituras)"""
+        document = create_document(self.business, f"{chunks}-chunks.txt")
+        config = ingestion_config(document, self.DIM, self.MODEL)
+        client = StubEmbeddingClient(self.DIM)
+        with mock.patch.object(EmbeddingBulkLoader, 'load', wraps=EmbeddingBulkLoader.load) as load, \
+                CaptureQueriesContext(connection) as queries:
+            result = ingest_lines(
+                self.business.id, 'document', document.id, document, word_lines(chunks), config, client=client
+            )
+
+        self.assertEqual(result['chunks'], chunks)
+        self.assertEqual(result['created'], chunks)
+        self.assertTrue(result['published'])
+        self.assertEqual(
+            Embedding.objects.filter(source_id=document.id, is_active=True).count(), chunks
+        )
+        return len(queries), client.calls, load.call_count
+
+    def test_queries_do_not_depend_on_chunk_count(self):
+        # COPY va por el cursor de psycopg y no aparece en las consultas capturadas: se
+        # cuentan también las escrituras masivas
+        small, large = self.ingest(chunks=5), self.ingest(chunks=50)
+        self.assertEqual(small, large)
+        # Un lote: una llamada al servicio de embeddings y una escritura masiva
+        self.assertEqual(large[1:], (1, 1))
+
+    @override_settings(INGESTION_BATCH_SIZE=10)
+    def test_one_embedding_call_and_bulk_load_per_batch(self):
+        # 25 chunks en lotes de 10: tres llamadas al servicio y tres escrituras
+        _, calls, loads = self.ingest(chunks=25)
+        self.assertEqual((calls, loads), (3, 3))
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class CatalogIngestionTest(TestCase):
+    """Un lote de productos se vectoriza con una sola llamada y una sola escritura masiva"""
+
+    DIM = 384
+    MODEL = 'test-model'
+    CONFIG = {
+        'embedding_model': MODEL,
+        'embedding_dim': DIM,
+        'chunking': {'chunk_size': 50, 'chunk_overlap': 0, 'strategy': 'words'}
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.business = Business.objects.create(name="Catalog ingestion")
+
+    def create_products(self, count):
+        return [
+            ProductServiceItem.objects.create(
+                business=self.business,
+                name=f"Producto {count}-{i}",
+                description=f"Descripción del producto {i} del lote de {count}",
+                category="Pruebas",
+                price=10 + i
+            )
+            for i in range(count)
+        ]
+
+    def ingest(self, products):
+        """Ingiere el lote y devuelve (totales, consultas, llamadas al servicio, escrituras)"""
+        client = StubEmbeddingClient(self.DIM)
+        with mock.patch.object(EmbeddingBulkLoader, 'load', wraps=EmbeddingBulkLoader.load) as load, \
+                CaptureQueriesContext(connection) as queries:
+            totals = ingest_products(self.business.id, products, self.CONFIG, client=client)
+        return totals, len(queries), client.calls, load.call_count
+
+    def test_one_embedding_call_and_bulk_load_per_batch(self):
+        products = self.create_products(30)
+        totals, _, calls, loads = self.ingest(products)
+
+        self.assertEqual((calls, loads), (1, 1))
+        self.assertEqual(totals['failed'], {})
+        self.assertEqual(totals['created'], totals['chunks'])
+        active = set(
+            Embedding.objects.filter(source_type='product', is_active=True).values_list('source_id', flat=True)
+        )
+        self.assertEqual(active, {product.id for product in products})
+
+    def test_queries_do_not_depend_on_product_count(self):
+        small = self.ingest(self.create_products(5))
+        large = self.ingest(self.create_products(30))
+        self.assertEqual(small[1:], large[1:])
+
+    def test_unchanged_products_are_reused(self):
+        products = self.create_products(5)
+        first = self.ingest(products)[0]
+        totals, _, calls, loads = self.ingest(products)
+
+        # Sin chunks nuevos no se llama al servicio ni se escribe nada
+        self.assertEqual((calls, loads), (0, 0))
+        self.assertEqual(totals['created'], 0)
+        self.assertEqual(totals['reused'], first['chunks'])
+
+
+class FailingEmbeddingClient(StubEmbeddingClient):
+    """Cliente de embeddings que falla a partir de la llamada fail_at"""
+
+    def __init__(self, dim, fail_at):
+        super().__init__(dim)
+        self.fail_at = fail_at
+
+    def embed(self, texts, embedding_model):
+        if self.calls + 1 >= self.fail_at:
+            raise ValueError("embedding service unavailable")
+        return super().embed(texts, embedding_model)
+
+
+@override_settings(CACHES=LOCAL_CACHES, INGESTION_BATCH_SIZE=2)
+class GenerationPublishTest(TestCase):
+    """Cada ingesta escribe una generación nueva y la publica o la descarta entera"""
+
+    DIM = 384
+    MODEL = 'test-model'
+
+    def setUp(self):
+        self.business = Business.objects.create(name="Generations")
+        self.document = create_document(self.business, "generations.txt")
+        self.config = ingestion_config(self.document, self.DIM, self.MODEL)
+
+    def ingest(self, lines, client=None):
+        return ingest_lines(
+            self.business.id, 'document', self.document.id, self.document, lines, self.config,
+            client=client or StubEmbeddingClient(self.DIM)
+        )
+
+    def rows(self):
+        return Embedding.objects.filter(source_id=self.document.id)
+
+    def source(self):
+        return EmbeddingSource.objects.get(source_id=self.document.id)
+
+    def test_reingestion_replaces_the_previous_generation(self):
+        self.ingest(word_lines(5, prefix='a'))
+        result = self.ingest(word_lines(3, prefix='b'))
+
+        self.assertEqual(result['generation'], 2)
+        self.assertEqual(result['deleted'], 5)
+        # Ni duplicados ni filas de la generación anterior
+        self.assertEqual(self.rows().count(), 3)
+        self.assertEqual(set(self.rows().values_list('generation', 'is_active')), {(2, True)})
+        source = self.source()
+        self.assertEqual((source.generation, source.last_generation, source.status), (2, 2, 'ready'))
+
+    def test_repeated_ingestion_is_idempotent(self):
+        self.ingest(word_lines(5))
+        result = self.ingest(word_lines(5))
+
+        # Los chunks sin cambios se reutilizan en la generación nueva
+        self.assertEqual((result['created'], result['reused']), (0, 5))
+        self.assertEqual(self.rows().count(), 5)
+        self.assertEqual(set(self.rows().values_list('generation', flat=True)), {2})
+
+    def test_failed_ingestion_is_discarded(self):
+        self.ingest(word_lines(5, prefix='a'))
+        # El primer lote (2 chunks) se escribe inactivo y el segundo falla
+        with self.assertRaises(RuntimeError):
+            self.ingest(word_lines(5, prefix='b'), client=FailingEmbeddingClient(self.DIM, fail_at=2))
+
+        # La generación publicada sigue activa y la fallida no deja filas
+        self.assertEqual(self.rows().count(), 5)
+        self.assertEqual(set(self.rows().values_list('generation', 'is_active')), {(1, True)})
+        source = self.source()
+        self.assertEqual((source.generation, source.last_generation, source.status), (1, 2, 'failed'))
+
+
+def _extract_in_daemon(file_content, results):
+    """Extrae un PDF desde un proceso daemon, como un worker prefork de Celery"""
+    with mock.patch.object(process_backend, 'get_context', wraps=process_backend.get_context) as get_context:
+        pages = list(TextExtractor.iter_pdf_pages(file_content, max_workers=2))
+    results.put((len(pages), [call.args for call in get_context.call_args_list]))
+
+
+@override_settings(PDF_PARALLEL_MIN_PAGES=2)
+class PdfParallelExtractionTest(TestCase):
+    """La extracción de PDF en paralelo también se usa dentro de un worker de Celery"""
+
+    PAGES = 4
+
+    def pdf(self):
+        writer = PdfWriter()
+        for _ in range(self.PAGES):
+            writer.add_blank_page(width=72, height=72)
+        buffer = BytesIO()
+        writer.write(buffer)
+        return buffer.getvalue()
+
+    def test_parallel_path_runs_in_a_daemon_process(self):
+        context = process_backend.get_context('fork')
+        results = context.Queue()
+        worker = context.Process(target=_extract_in_daemon, args=(self.pdf(), results))
+        worker.daemon = True
+        worker.start()
+        pages, contexts = results.get(timeout=120)
+        worker.join(timeout=30)
+
+        self.assertEqual(pages, self.PAGES)
+        # El pool se creó (con spawn) en lugar de caer en la extracción en serie
+        self.assertIn(('spawn',), contexts)
+
+    def test_shard_reads_its_pages_from_the_local_copy(self):
+        with tempfile.NamedTemporaryFile(suffix='.pdf') as local_copy:
+            local_copy.write(self.pdf())
+            local_copy.flush()
+            self.assertEqual(TextExtractor.count_pdf_pages(local_copy.name), self.PAGES)
+            pages = list(TextExtractor.iter_pdf_pages(local_copy.name, max_workers=1, pages=range(1, 3)))
+        self.assertEqual(len(pages), 2)
+
+
+@override_settings(TEXT_LINE_MAX_CHARS=1000)
+class LongLineTest(SimpleTestCase):
+    """Las líneas sin saltos se procesan por trozos acotados"""
+
+    TEXT = "palabra " * 50000  # 400.000 caracteres sin un solo salto de línea
+
+    def test_text_lines_are_bounded(self):
+        lines = list(TextExtractor.iter_text_lines(self.TEXT.encode()))
+        self.assertLessEqual(max(len(line) for line in lines), 1000)
+        self.assertEqual("".join(lines), self.TEXT)
+
+    def test_word_windows_keep_offsets(self):
+        text = self.TEXT.strip()
+        spans = list(ChunkGenerator.iter_spans([text], chunk_size=300, chunk_overlap=30))
+        # Mismos chunks (y huellas) que sin trocear la línea
+        self.assertEqual([chunk for chunk, _, _ in spans], list(ChunkGenerator.iter_chunks([text], 300, 30)))
+        for chunk, start, end in spans:
+            self.assertEqual(text[start:end], chunk)
+
+
+class StreamingExtractorsTest(SimpleTestCase):
+    """Extracción de XLSX en modo read_only y de CSV decodificado por bloques"""
+
+    def test_xlsx_rows_are_read_only_values(self):
+        workbook = openpyxl.Workbook()
+        workbook.active.append(["SKU", "Nombre", "Precio"])
+        workbook.active.append(["A-1", None, 9.5])
+        workbook.create_sheet("Servicios").append(["Instalación", "incluida"])
+        buffer = BytesIO()
+        workbook.save(buffer)
+
+        with mock.patch.object(openpyxl, 'load_workbook', wraps=openpyxl.load_workbook) as load_workbook:
+            rows = list(TextExtractor.iter_xlsx_rows(buffer.getvalue()))
+
+        self.assertEqual(rows, ["SKU Nombre Precio", "A-1 9.5", "Instalación incluida"])
+        self.assertTrue(load_workbook.call_args.kwargs['read_only'])
+        self.assertTrue(load_workbook.call_args.kwargs['data_only'])
+
+    def test_csv_rows_from_byte_blocks(self):
+        content = 'sku,descripción\nA-1,"Tornillo\nde acero"\nB-2,"Tuerca, 10 mm"\n'.encode('utf-8')
+        # Bloques de un byte: los caracteres multibyte y los campos multilínea quedan partidos
+        blocks = (content[i:i + 1] for i in range(len(content)))
+
+        rows = list(TextExtractor.iter_csv_rows(blocks))
+
+        self.assertEqual(rows, ["sku descripción", "A-1 Tornillo\nde acero", "B-2 Tuerca, 10 mm"])
+
+
+class CharTokenizer:
+    """Tokenizador de prueba: un token por carácter"""
+
+    def count(self, text):
+        return len(text)
+
+
+class ChunkSpansTest(SimpleTestCase):
+    """Empaquetado por oraciones y por tokens con offsets sobre el texto limpio"""
+
+    LINES = [
+        "Primera frase del texto. Segunda frase algo más larga que la primera!",
+        "continúa aquí. ¿Tercera pregunta?",
+        "",
+        "Nuevo párrafo con una frase. Y otra más corta. Cierra el párrafo final.",
+    ]
+    TEXT = "\n".join(LINES)
+
+    def assertOffsets(self, spans):
+        for chunk, start, end in spans:
+            # Los saltos de línea del texto limpio pasan a ser espacios en el chunk
+            self.assertEqual(" ".join(self.TEXT[start:end].split()), chunk)
+
+    def test_sentences_are_packed_whole(self):
+        spans = list(ChunkGenerator.iter_spans(self.LINES, chunk_size=12, chunk_overlap=0, strategy='sentences'))
+
+        self.assertOffsets(spans)
+        for chunk, _, _ in spans:
+            self.assertLessEqual(len(chunk.split()), 12)
+            self.assertIn(chunk[-1], '.!?')
+        # Sin solape, los chunks recorren todas las oraciones una vez y en orden
+        self.assertEqual(" ".join(chunk for chunk, _, _ in spans), " ".join(self.TEXT.split()))
+
+    def test_token_windows_fit_chunk_size(self):
+        tokenizer = CharTokenizer()
+        spans = list(ChunkGenerator.iter_spans(
+            self.LINES, chunk_size=30, chunk_overlap=8, strategy='words', tokenizer=tokenizer
+        ))
+
+        self.assertGreater(len(spans), 1)
+        self.assertOffsets(spans)
+        for chunk, _, _ in spans:
+            self.assertLessEqual(sum(tokenizer.count(word) for word in chunk.split()), 30)
+        # Chunks consecutivos se solapan en el texto (solape en tokens)
+        for (_, _, previous_end), (_, start, _) in zip(spans, spans[1:]):
+            self.assertLess(start, previous_end)
+
+
+def peak_rss_mb():
+    # ru_maxrss está en KB en Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class IngestionMemoryTest(TestCase):
+    """
+    Un archivo de texto de INGESTION_MEMORY_TEST_MB (1 GB por defecto) pasa por
+    iter_text_lines -> ingest_lines sin que el RSS máximo crezca más de MAX_RSS_GROWTH_MB.
+    """
+
+    DIM = 384
+    MODEL = 'test-model'
+    MAX_RSS_GROWTH_MB = 256
+
+    def test_streaming_ingestion_stays_under_rss_ceiling(self):
+        business = Business.objects.create(name="Ingestion memory")
+        document = Document.objects.create(
+            business=business, name="synthetic.txt", type='txt',
+            file_path="documents/synthetic.txt", file_hash="synthetic"
+        )
+        config = {
+            'embedding_model': self.MODEL,
+            'embedding_dim': self.DIM,
+            'chunking': {'chunk_size': 500, 'chunk_overlap': 50, 'strategy': 'words'},
+            'base_metadata': chunk_base_metadata('document', document.id, document, self.MODEL)
+        }
+        size = settings.INGESTION_MEMORY_TEST_MB << 20
+        lines = TextCleaner.iter_clean_lines(TextExtractor.iter_text_lines(synthetic_blocks(size)))
+        client = StubEmbeddingClient(self.DIM)
+
+        baseline = peak_rss_mb()
+        # Sin escritura: el lote se consume y se descarta, como haría el COPY
+        discard = lambda embeddings, **kwargs: sum(1 for _ in embeddings)
+        with mock.patch.object(EmbeddingBulkLoader, 'load', new=discard):
+            result = ingest_lines(business.id, 'document', document.id, document, lines, config, client=client)
+        growth = peak_rss_mb() - baseline
+
+        self.assertGreater(result['chunks'], 0)
+        self.assertGreater(client.calls, 1)
+        self.assertLess(
+            growth, self.MAX_RSS_GROWTH_MB,
+            f"Peak RSS grew {growth:.0f} MB ingesting {settings.INGESTION_MEMORY_TEST_MB} MB of text"
+        )
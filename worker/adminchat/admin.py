@@ -1,7 +1,8 @@
 # business/admin.py
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import Business, BusinessUser, Role, UserActivityLog, BotSettings, BotTemplate, ChunkingSettings, ExternalAPIConfig, APIRoute, Document, ProductServiceItem, Embedding
+from .models import Business, BusinessUser, Role, UserActivityLog, BotSettings, BotTemplate, ChunkingSettings, ExternalAPIConfig, APIRoute, Document, ProductServiceItem, Embedding, EmbeddingSource, ReindexJob
+from .services.cache_service import SearchResultCache
 
 class BusinessAdmin(admin.ModelAdmin):
     list_display = ('name', 'contact_email', 'is_active', 'created_at')
@@ -78,16 +79,23 @@ class BotSettingsAdmin(admin.ModelAdmin):
     list_display = ('business', 'llm_model_name', 'updated_at')
     list_filter = ('llm_model_name', 'embedding_model_name')
     search_fields = ('business__name',)
-    readonly_fields = ('created_at', 'updated_at')
+    # El modelo pendiente lo gestiona la migración de modelo (model-migration)
+    readonly_fields = ('created_at', 'updated_at', 'pending_embedding_model_name',
+                       'pending_embedding_dim', 'legacy_embeddings_active')
     fieldsets = (
         (None, {
             'fields': ('business', 'llm_model_name', 'embedding_model_name', 'embedding_dim')
         }),
+        ('Migración de modelo de embeddings', {
+            'fields': ('pending_embedding_model_name', 'pending_embedding_dim', 'legacy_embeddings_active'),
+            'classes': ('collapse',)
+        }),
         ('Modelos', {
             'fields': ('sentiment_model_name', 'intent_model_name')
         }),
         ('Configuración de búsqueda', {
-            'fields': ('search_top_k', 'search_min_similarity')
+            'fields': ('search_top_k', 'search_min_similarity', 'search_vector_precision',
+                      'search_truncate_dim', 'search_rerank', 'search_rerank_factor')
         }),
         ('Configuración de generación', {
             'fields': ('generation_temperature', 'generation_top_p', 
@@ -124,8 +132,8 @@ class BotTemplateAdmin(admin.ModelAdmin):
     )
 
 class ChunkingSettingsAdmin(admin.ModelAdmin):
-    list_display = ('business', 'entity_type', 'chunk_size', 'chunk_overlap', 'updated_at')
-    list_filter = ('entity_type',)
+    list_display = ('business', 'entity_type', 'strategy', 'chunk_size', 'chunk_overlap', 'length_unit', 'updated_at')
+    list_filter = ('entity_type', 'strategy', 'length_unit')
     search_fields = ('business__name',)
     readonly_fields = ('created_at', 'updated_at')
     fieldsets = (
@@ -133,7 +141,7 @@ class ChunkingSettingsAdmin(admin.ModelAdmin):
             'fields': ('business', 'entity_type', 'is_active')
         }),
         ('Configuración de Chunking', {
-            'fields': ('chunk_size', 'chunk_overlap')
+            'fields': ('strategy', 'chunk_size', 'chunk_overlap', 'length_unit', 'tokenizer')
         }),
         ('Fechas', {
             'fields': ('created_at', 'updated_at'),
@@ -149,13 +157,13 @@ class DocumentAdmin(admin.ModelAdmin):
     list_display = ('name', 'business', 'type', 'created_at')
     list_filter = ('type', 'business', 'created_at')
     search_fields = ('name', 'business__name', 'file_hash')
-    readonly_fields = ('file_hash', 'created_at', 'updated_at', 'file_path')
+    readonly_fields = ('file_hash', 'extraction_key', 'created_at', 'updated_at', 'file_path')
     fieldsets = (
         (None, {
             'fields': ('business', 'name', 'type', 'is_active')
         }),
         ('Archivo', {
-            'fields': ('file_path', 'file_hash')
+            'fields': ('file_path', 'file_hash', 'extraction_key')
         }),
         ('Contenido', {
             'fields': ('content_text',),
@@ -302,7 +310,7 @@ class EmbeddingAdmin(admin.ModelAdmin):
             'fields': ('id', 'business', 'created_at', 'updated_at')
         }),
         ('Source Information', {
-            'fields': ('source_type', 'source_id', 'chunk_index')
+            'fields': ('source_type', 'source_id', 'chunk_index', 'model_name')
         }),
         ('Content', {
             'fields': ('content', 'vector', 'metadata'),
@@ -314,6 +322,20 @@ class EmbeddingAdmin(admin.ModelAdmin):
         # Los embeddings deberían crearse a través de la API, no manualmente
         return False
 
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        SearchResultCache.bump_corpus_version(obj.business_id)
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        SearchResultCache.bump_corpus_version(obj.business_id)
+
+    def delete_queryset(self, request, queryset):
+        business_ids = set(queryset.values_list('business_id', flat=True))
+        super().delete_queryset(request, queryset)
+        for business_id in business_ids:
+            SearchResultCache.bump_corpus_version(business_id)
+
     def get_queryset(self, request):
         qs = super().get_queryset(request)
         if request.user.is_superuser:
@@ -321,8 +343,39 @@ class EmbeddingAdmin(admin.ModelAdmin):
         return qs.filter(business=request.user.business)
 
 
+class EmbeddingSourceAdmin(admin.ModelAdmin):
+    list_display = ('source_type', 'source_id', 'business', 'status', 'generation', 'shadow_generation',
+                    'last_generation', 'updated_at')
+    list_filter = ('source_type', 'status', 'business')
+    search_fields = ('source_id', 'business__name')
+    readonly_fields = ('id', 'business', 'source_type', 'source_id', 'status', 'generation', 'shadow_generation',
+                       'last_generation', 'created_at', 'updated_at')
+
+    def has_add_permission(self, request):
+        return False  # Lo gestiona la ingesta (EmbeddingSourceService)
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+class ReindexJobAdmin(admin.ModelAdmin):
+    list_display = ('business', 'status', 'phase', 'embedding_model', 'shadow', 'documents_done', 'documents_total',
+                    'products_done', 'products_total', 'sources_failed', 'updated_at')
+    list_filter = ('status', 'phase', 'shadow', 'business')
+    search_fields = ('business__name', 'embedding_model')
+    readonly_fields = [field.name for field in ReindexJob._meta.fields]
+
+    def has_add_permission(self, request):
+        return False  # Se crean desde la API o con el comando reindex_business
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
 # Registrar el modelo
 admin.site.register(Embedding, EmbeddingAdmin)
+admin.site.register(EmbeddingSource, EmbeddingSourceAdmin)
+admin.site.register(ReindexJob, ReindexJobAdmin)
 
 # Registrar los modelos
 admin.site.register(ExternalAPIConfig, ExternalAPIConfigAdmin)
@@ -4,8 +4,13 @@ import logging
 logger = logging.getLogger(__name__)
 
 class BotSettingsService:
-    EMBEDDING_MODEL_NAME='BAAI/bge-small-en-v1.5'
-    EMBEDDING_DIM=1024
+    # Los defaults de los negocios sin BotSettings son los del modelo (una sola fuente)
+    EMBEDDING_MODEL_NAME=BotSettings._meta.get_field('embedding_model_name').default
+    EMBEDDING_DIM=BotSettings._meta.get_field('embedding_dim').default
+    SEARCH_VECTOR_PRECISION='full'
+    SEARCH_RERANK=True
+    SEARCH_RERANK_FACTOR=4
+    SEARCH_TRUNCATE_DIM=None
 
     @classmethod
     def get_bot_settings(cls,business_id):
@@ -16,7 +21,9 @@ class BotSettingsService:
             business_id (UUID): ID del negocio
             
         Returns:
-            dict: Configuración de chunking con 'embedding_model_name' y 'embedding_dim'
+            dict: Configuración con 'embedding_model_name', 'embedding_dim', el modelo
+            pendiente de una migración de modelo y la configuración de búsqueda
+            vectorial (precisión y re-ranking)
         """
         try:
             bot_settings = BotSettings.objects.get(
@@ -25,6 +32,13 @@ class BotSettingsService:
             return {
                 'embedding_model_name': bot_settings.embedding_model_name,
                 'embedding_dim': bot_settings.embedding_dim,
+                'search_vector_precision': bot_settings.search_vector_precision,
+                'search_rerank': bot_settings.search_rerank,
+                'search_rerank_factor': bot_settings.search_rerank_factor,
+                'search_truncate_dim': bot_settings.search_truncate_dim,
+                'pending_embedding_model_name': bot_settings.pending_embedding_model_name,
+                'pending_embedding_dim': bot_settings.pending_embedding_dim,
+                'legacy_embeddings_active': bot_settings.legacy_embeddings_active,
                 'is_default': False
             }
         except ObjectDoesNotExist:
@@ -32,7 +46,14 @@ class BotSettingsService:
                 f"No se encontró configuración para business_id={business_id}, "
             )
             return {
-                'chunk_size': cls.EMBEDDING_MODEL_NAME,
-                'chunk_overlap': cls.EMBEDDING_DIM,
+                'embedding_model_name': cls.EMBEDDING_MODEL_NAME,
+                'embedding_dim': cls.EMBEDDING_DIM,
+                'search_vector_precision': cls.SEARCH_VECTOR_PRECISION,
+                'search_rerank': cls.SEARCH_RERANK,
+                'search_rerank_factor': cls.SEARCH_RERANK_FACTOR,
+                'search_truncate_dim': cls.SEARCH_TRUNCATE_DIM,
+                'pending_embedding_model_name': None,
+                'pending_embedding_dim': None,
+                'legacy_embeddings_active': True,
                 'is_default': True
             }
\ No newline at end of file
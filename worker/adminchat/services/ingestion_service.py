@@ -0,0 +1,428 @@
+# adminchat/services/ingestion_service.py
+from celery.result import AsyncResult
+from django.db import connection, transaction
+from django.utils import timezone
+from ..models import Embedding, EmbeddingSource
+from .cache_service import SearchResultCache
+import logging
+
+logger = logging.getLogger(__name__)
+
+class StaleIngestionError(RuntimeError):
+    """Los embeddings que la ingesta pensaba reutilizar ya no existen (otra ingesta los publicó)"""
+
+class EmbeddingSourceService:
+    """
+    Ingesta idempotente por origen (business, source_type, source_id).
+
+    Cada ingesta obtiene una generación nueva, escribe sus filas inactivas (invisibles
+    para la búsqueda) y las publica en una transacción corta que bloquea el origen,
+    activa la generación y elimina las anteriores. Reintentos y peticiones repetidas
+    nunca dejan el origen duplicado ni a medio escribir.
+
+    Las ingestas grandes se reparten en shards que escriben la misma generación; cada
+    shard numera sus chunks a partir de shard * SHARD_STRIDE y merge_shards los
+    renumera antes de publicar.
+    """
+
+    SHARD_STRIDE = 1000000  # Máximo de chunks por shard
+
+    # Contadores de progreso que publican los shards (PROGRESS y resultado final)
+    SHARD_COUNTERS = ('pages_done', 'chunks_processed', 'embeddings_created', 'embeddings_copied')
+
+    @staticmethod
+    def source_embeddings(business_id, source_type, source_id):
+        return Embedding.objects.filter(
+            business_id=business_id, source_type=source_type, source_id=source_id
+        )
+
+    @classmethod
+    def allocate_generation(cls, business_id, source_type, source_id):
+        """
+        Reserva el número de generación de una nueva ingesta del origen.
+
+        Returns:
+            int: Generación asignada
+        """
+        with transaction.atomic():
+            source, _ = EmbeddingSource.objects.get_or_create(
+                business_id=business_id, source_type=source_type, source_id=source_id
+            )
+            source = EmbeddingSource.objects.select_for_update().get(pk=source.pk)
+            source.last_generation += 1
+            source.status = 'ingesting'
+            source.save(update_fields=['last_generation', 'status', 'updated_at'])
+            return source.last_generation
+
+    @classmethod
+    def allocate_generations(cls, business_id, source_type, source_ids):
+        """
+        Equivalente de allocate_generation para muchos orígenes pequeños (catálogo de
+        productos) con un número fijo de consultas.
+
+        Returns:
+            dict: {source_id (UUID): generación asignada}
+        """
+        table = EmbeddingSource._meta.db_table
+        with transaction.atomic():
+            EmbeddingSource.objects.bulk_create(
+                [
+                    EmbeddingSource(business_id=business_id, source_type=source_type, source_id=source_id)
+                    for source_id in source_ids
+                ],
+                ignore_conflicts=True
+            )
+            with connection.cursor() as cursor:
+                # Bloqueo en orden de id: dos lotes que comparten orígenes no se bloquean mutuamente
+                cursor.execute(
+                    f"""
+                    WITH locked AS (
+                        SELECT id FROM {table}
+                        WHERE business_id = %s AND source_type = %s AND source_id = ANY(%s::uuid[])
+                        ORDER BY id
+                        FOR UPDATE
+                    )
+                    UPDATE {table} s
+                    SET last_generation = s.last_generation + 1, status = 'ingesting', updated_at = now()
+                    FROM locked
+                    WHERE s.id = locked.id
+                    RETURNING s.source_id, s.last_generation
+                    """,
+                    [str(business_id), source_type, [str(source_id) for source_id in source_ids]]
+                )
+                return dict(cursor.fetchall())
+
+    @classmethod
+    def discard(cls, business_id, source_type, source_id, generation):
+        """
+        Elimina las filas ya escritas de una generación que no se va a publicar (p. ej.
+        una ingesta que falló a mitad). Si falla, dedupe_embeddings las limpia después.
+
+        Returns:
+            int: Filas eliminadas
+        """
+        try:
+            deleted, _ = cls.source_embeddings(business_id, source_type, source_id).filter(
+                generation=generation, is_active=False
+            ).delete()
+            return deleted
+        except Exception as e:
+            logger.warning(f"Could not discard generation {generation} of {source_type}:{source_id}: {str(e)}")
+            return 0
+
+    @classmethod
+    def fail(cls, business_id, source_type, source_id, generation):
+        """
+        Descarta una generación fallida y marca el origen como failed si no hay una
+        ingesta más reciente. La generación publicada sigue activa.
+        """
+        cls.discard(business_id, source_type, source_id, generation)
+        EmbeddingSource.objects.filter(
+            business_id=business_id, source_type=source_type, source_id=source_id,
+            last_generation=generation
+        ).update(status='failed')
+
+    @classmethod
+    def clear_shard(cls, business_id, source_type, source_id, generation, shard):
+        """Elimina las filas que escribió un intento anterior del shard (reintentos)"""
+        first = shard * cls.SHARD_STRIDE
+        deleted, _ = cls.source_embeddings(business_id, source_type, source_id).filter(
+            generation=generation, is_active=False,
+            chunk_index__gte=first, chunk_index__lt=first + cls.SHARD_STRIDE
+        ).delete()
+        return deleted
+
+    @classmethod
+    def merge_shards(cls, business_id, source_type, source_id, generation, shard_chars):
+        """
+        Renumera los chunks de una generación escrita por shards: chunk_index pasa a ser
+        la posición global y char_start/char_end se desplazan al texto completo.
+
+        Args:
+            shard_chars (dict): {shard: caracteres de su texto, incluido el salto final}
+        """
+        if not shard_chars:
+            return
+        bases, base = [], 0
+        for shard in sorted(shard_chars):
+            bases.extend([shard, base])
+            base += shard_chars[shard]
+
+        table = Embedding._meta.db_table
+        values = ", ".join(["(%s, %s)"] * len(shard_chars))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                WITH bases(shard, base) AS (VALUES {values}),
+                ordered AS (
+                    SELECT id, chunk_index / {cls.SHARD_STRIDE} AS shard,
+                           ROW_NUMBER() OVER (ORDER BY chunk_index) - 1 AS position
+                    FROM {table}
+                    WHERE business_id = %s AND source_type = %s AND source_id = %s
+                      AND generation = %s AND NOT is_active
+                )
+                UPDATE {table} e
+                SET chunk_index = o.position,
+                    metadata = e.metadata || jsonb_build_object(
+                        'chunk_index', o.position,
+                        'char_start', (e.metadata->>'char_start')::int + b.base,
+                        'char_end', (e.metadata->>'char_end')::int + b.base
+                    )
+                FROM ordered o JOIN bases b ON b.shard = o.shard
+                WHERE e.id = o.id
+                """,
+                bases + [str(business_id), source_type, str(source_id), generation]
+            )
+
+    @classmethod
+    def shard_progress(cls, payload):
+        """
+        Estado agregado de una ingesta por shards a partir del resultado del coordinador.
+
+        Args:
+            payload (dict): Resultado 'sharded' de create_embeddings_task
+
+        Returns:
+            dict: ready/successful/result/status de la tarea final y progreso sumado
+        """
+        finalize = AsyncResult(payload['finalize_task_id'])
+        progress = {'shards_total': len(payload['shard_task_ids']), 'shards_done': 0, 'shards_failed': 0}
+        progress.update({counter: 0 for counter in cls.SHARD_COUNTERS})
+
+        for task_id in payload['shard_task_ids']:
+            shard = AsyncResult(task_id)
+            if shard.state == 'SUCCESS':
+                progress['shards_done'] += 1
+            elif shard.state == 'FAILURE':
+                progress['shards_failed'] += 1
+            info = shard.info if isinstance(shard.info, dict) else {}
+            for counter in cls.SHARD_COUNTERS:
+                progress[counter] += info.get(counter, 0)
+
+        if finalize.ready():
+            status = finalize.status
+        else:
+            status = 'FAILURE' if progress['shards_failed'] else 'PROGRESS'
+        result = finalize.result if finalize.ready() else None
+        return {
+            'ready': finalize.ready(),
+            'successful': finalize.successful(),
+            'result': result if finalize.successful() or result is None else str(result),
+            'status': status,
+            'progress': progress,
+            'shards': payload
+        }
+
+    @classmethod
+    def publish(cls, business_id, source_type, source_id, generation, reused=(), repointed=(),
+                model_name=None, shadow=False):
+        """
+        Publica una generación: la activa y elimina las filas de generaciones anteriores.
+
+        Args:
+            business_id (UUID): ID del negocio
+            source_type (str): Tipo de origen
+            source_id (UUID): ID del origen
+            generation (int): Generación a publicar (sus filas nuevas ya están escritas, inactivas)
+            reused (iterable[Embedding]): Filas activas que pasan a la nueva generación
+            repointed (iterable[Embedding]): Subconjunto de reused con chunk_index/metadata modificados
+            model_name (str): Modelo de la generación. Solo se eliminan las generaciones
+                anteriores de ese modelo (y las filas sin modelo, si no es en sombra); sin
+                él se eliminan todas
+            shadow (bool): Generación del modelo pendiente de una migración de modelo: se
+                publica como shadow_generation y no cambia la generación activa
+
+        Returns:
+            dict: {'published': bool, 'deleted': int}. published es False si una
+            ingesta más reciente ya publicó; sus filas se descartan.
+
+        Raises:
+            StaleIngestionError: Si alguna fila reutilizada ya no está activa
+        """
+        rows = cls.source_embeddings(business_id, source_type, source_id)
+        reused_ids = [embedding.id for embedding in reused]
+
+        with transaction.atomic():
+            source = EmbeddingSource.objects.select_for_update().get(
+                business_id=business_id, source_type=source_type, source_id=source_id
+            )
+            published_generation = source.shadow_generation if shadow else source.generation
+            if published_generation > generation:
+                deleted, _ = rows.filter(generation=generation, is_active=False).delete()
+                logger.info(
+                    f"Generation {generation} of {source_type}:{source_id} superseded by {published_generation}"
+                )
+                return {'published': False, 'deleted': deleted}
+
+            if rows.filter(id__in=reused_ids, is_active=True).count() != len(reused_ids):
+                raise StaleIngestionError(
+                    f"Embeddings of {source_type}:{source_id} changed during ingestion"
+                )
+
+            if repointed:
+                Embedding.objects.bulk_update(repointed, ['chunk_index', 'metadata', 'updated_at'])
+            # Las filas reutilizadas sin modelo (por su huella, del mismo modelo) se etiquetan
+            rows.filter(id__in=reused_ids).update(
+                generation=generation, **({'model_name': model_name} if model_name else {})
+            )
+            rows.filter(generation=generation).update(is_active=True)
+            # Generaciones anteriores (incluidas filas huérfanas de ingestas fallidas); las
+            # posteriores pertenecen a ingestas en curso y se resuelven al publicarlas. Las
+            # de otro modelo (migración de modelo) las elimina ModelMigrationService
+            previous = rows.filter(generation__lt=generation)
+            if model_name:
+                previous = previous.filter(model_name__in=[model_name] if shadow else [model_name, ''])
+            deleted, _ = previous.delete()
+
+            if shadow:
+                source.shadow_generation = generation
+            else:
+                source.generation = generation
+            if source.last_generation == generation:  # si no, hay otra ingesta en curso
+                source.status = 'ready'
+            source.save(update_fields=['shadow_generation' if shadow else 'generation', 'status', 'updated_at'])
+
+            # Las filas en sombra no son visibles para la búsqueda hasta el cutover
+            if not shadow:
+                transaction.on_commit(lambda: SearchResultCache.bump_corpus_version(business_id))
+
+        return {'published': True, 'deleted': deleted}
+
+    @classmethod
+    def publish_batch(cls, business_id, source_type, plans, model_name=None, shadow=False):
+        """
+        Publica a la vez las generaciones de muchos orígenes pequeños (catálogo de
+        productos) en una transacción con un número fijo de consultas. Por origen equivale
+        a publish(); la caché de búsqueda se invalida una sola vez.
+
+        Args:
+            business_id (UUID): ID del negocio
+            source_type (str): Tipo de origen
+            plans (list[dict]): source_id, generation, reused y repointed de cada origen
+            model_name (str): Modelo de las generaciones (ver publish)
+            shadow (bool): Generaciones en sombra (ver publish)
+
+        Returns:
+            dict: published y superseded (listas de source_id), stale ({source_id: error},
+            orígenes cuyas filas reutilizadas ya no están activas; se descartan con fail())
+            y deleted
+        """
+        table = Embedding._meta.db_table
+        plans = {plan['source_id']: plan for plan in plans}
+        result = {'published': [], 'superseded': [], 'stale': {}, 'deleted': 0}
+        if not plans:
+            return result
+
+        def for_sources(source_ids):
+            return (
+                [str(source_id) for source_id in source_ids],
+                [plans[source_id]['generation'] for source_id in source_ids]
+            )
+
+        with transaction.atomic():
+            sources = {
+                source.source_id: source
+                for source in EmbeddingSource.objects.select_for_update().filter(
+                    business_id=business_id, source_type=source_type, source_id__in=list(plans)
+                ).order_by('id')
+            }
+            for source_id, plan in plans.items():
+                source = sources[source_id]
+                published_generation = source.shadow_generation if shadow else source.generation
+                if published_generation > plan['generation']:
+                    result['superseded'].append(source_id)
+
+            reused = {
+                embedding.id: source_id
+                for source_id, plan in plans.items() if source_id not in result['superseded']
+                for embedding in plan['reused']
+            }
+            active = set(
+                Embedding.objects.filter(id__in=list(reused), is_active=True).values_list('id', flat=True)
+            )
+            for embedding_id, source_id in reused.items():
+                if embedding_id not in active:
+                    result['stale'][source_id] = StaleIngestionError(
+                        f"Embeddings of {source_type}:{source_id} changed during ingestion"
+                    )
+            ready = [
+                source_id for source_id in plans
+                if source_id not in result['superseded'] and source_id not in result['stale']
+            ]
+
+            with connection.cursor() as cursor:
+                if result['superseded']:
+                    cursor.execute(
+                        f"""
+                        DELETE FROM {table} e
+                        USING unnest(%s::uuid[], %s::int[]) AS v(source_id, generation)
+                        WHERE e.business_id = %s AND e.source_type = %s AND e.source_id = v.source_id
+                          AND e.generation = v.generation AND NOT e.is_active
+                        """,
+                        [*for_sources(result['superseded']), str(business_id), source_type]
+                    )
+                    result['deleted'] += cursor.rowcount
+                    logger.info(f"{len(result['superseded'])} {source_type} generations superseded")
+
+                if ready:
+                    repointed = [embedding for source_id in ready for embedding in plans[source_id]['repointed']]
+                    if repointed:
+                        Embedding.objects.bulk_update(repointed, ['chunk_index', 'metadata', 'updated_at'])
+                    reused_ids = [
+                        (str(embedding.id), plans[source_id]['generation'])
+                        for source_id in ready for embedding in plans[source_id]['reused']
+                    ]
+                    if reused_ids:
+                        # Las filas reutilizadas sin modelo (por su huella, del mismo modelo) se etiquetan
+                        cursor.execute(
+                            f"""
+                            UPDATE {table} e
+                            SET generation = v.generation, model_name = COALESCE(%s::varchar, e.model_name)
+                            FROM unnest(%s::uuid[], %s::int[]) AS v(id, generation)
+                            WHERE e.id = v.id
+                            """,
+                            [model_name or None, [row[0] for row in reused_ids], [row[1] for row in reused_ids]]
+                        )
+                    source_ids, generations = for_sources(ready)
+                    cursor.execute(
+                        f"""
+                        UPDATE {table} e
+                        SET is_active = TRUE
+                        FROM unnest(%s::uuid[], %s::int[]) AS v(source_id, generation)
+                        WHERE e.business_id = %s AND e.source_type = %s AND e.source_id = v.source_id
+                          AND e.generation = v.generation AND NOT e.is_active
+                        """,
+                        [source_ids, generations, str(business_id), source_type]
+                    )
+                    # Generaciones anteriores del mismo modelo, como en publish()
+                    model_clause, model_params = '', []
+                    if model_name:
+                        model_clause = "AND e.model_name = ANY(%s)"
+                        model_params = [[model_name] if shadow else [model_name, '']]
+                    cursor.execute(
+                        f"""
+                        DELETE FROM {table} e
+                        USING unnest(%s::uuid[], %s::int[]) AS v(source_id, generation)
+                        WHERE e.business_id = %s AND e.source_type = %s AND e.source_id = v.source_id
+                          AND e.generation < v.generation {model_clause}
+                        """,
+                        [source_ids, generations, str(business_id), source_type, *model_params]
+                    )
+                    result['deleted'] += cursor.rowcount
+
+            field = 'shadow_generation' if shadow else 'generation'
+            now = timezone.now()
+            for source_id in ready:
+                source = sources[source_id]
+                setattr(source, field, plans[source_id]['generation'])
+                if source.last_generation == plans[source_id]['generation']:
+                    source.status = 'ready'
+                source.updated_at = now
+            EmbeddingSource.objects.bulk_update([sources[source_id] for source_id in ready],
+                                                [field, 'status', 'updated_at'])
+            result['published'] = ready
+
+            if ready and not shadow:
+                transaction.on_commit(lambda: SearchResultCache.bump_corpus_version(business_id))
+
+        return result
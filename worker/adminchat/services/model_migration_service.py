@@ -0,0 +1,238 @@
+# adminchat/services/model_migration_service.py
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from ..models import BotSettings, Document, Embedding, EmbeddingSource, ProductServiceItem, ReindexJob
+from .bot_setting_service import BotSettingsService
+from .cache_service import SearchResultCache
+from .reindex_service import ReindexService
+import logging
+
+logger = logging.getLogger(__name__)
+
+class ModelMigrationService:
+    """
+    Cambio del modelo de embeddings de un negocio sin que la búsqueda mezcle vectores de
+    dos modelos ni se quede vacía mientras se re-vectoriza.
+
+    start() guarda el modelo nuevo como pendiente (BotSettings.pending_embedding_model_name)
+    y crea un ReindexJob en sombra: sus filas llevan el model_name del modelo pendiente y se
+    publican como shadow_generation de cada origen, mientras la búsqueda sigue filtrando
+    por el modelo activo. Las ingestas normales que llegan durante la migración se repiten
+    en sombra (follow_up). Cuando todos los documentos y productos tienen generación en
+    sombra, cutover() cambia el modelo activo en una transacción corta y, pasado
+    EMBEDDING_MODEL_GC_DELAY (los procesos pueden tener BotSettings cacheados),
+    collect_garbage() elimina por lotes las filas del modelo anterior.
+    """
+
+    # Orígenes que re-vectoriza la migración (ReindexJob)
+    SOURCE_MODELS = (('document', Document), ('product', ProductServiceItem))
+
+    GC_BATCH_SIZE = settings.EMBEDDING_MODEL_GC_BATCH_SIZE
+
+    @staticmethod
+    def search_model_names(bot_settings):
+        """
+        Valores de Embedding.model_name visibles para la búsqueda del negocio.
+
+        Args:
+            bot_settings (dict): Resultado de BotSettingsService.get_bot_settings
+        """
+        model_names = [bot_settings['embedding_model_name']]
+        if bot_settings.get('legacy_embeddings_active', True):
+            model_names.append('')
+        return model_names
+
+    @staticmethod
+    def shares_dimension(bot_settings):
+        """Indica si hay una migración en curso cuyas filas comparten índice con las activas"""
+        return bot_settings.get('pending_embedding_dim') == bot_settings['embedding_dim']
+
+    @classmethod
+    def start(cls, business_id, embedding_model, embedding_dim):
+        """
+        Inicia la migración al modelo indicado.
+
+        Args:
+            business_id (UUID): ID del negocio
+            embedding_model (str): Modelo nuevo
+            embedding_dim (int): Dimensión de los vectores del modelo nuevo
+
+        Returns:
+            ReindexJob: Trabajo en sombra (pending) que hay que encolar
+
+        Raises:
+            ValueError: Sin BotSettings, con el mismo modelo, con otra migración o con
+                otro trabajo de re-indexación en curso
+        """
+        if embedding_dim not in dict(BotSettings.EMBEDDING_DIMENSIONS):
+            raise ValueError(f"Unsupported embedding_dim: {embedding_dim}")
+
+        with transaction.atomic():
+            bot_settings = BotSettings.objects.select_for_update().filter(business_id=business_id).first()
+            if bot_settings is None:
+                raise ValueError(f"Bot settings not found for business {business_id}")
+            if embedding_model == bot_settings.embedding_model_name:
+                raise ValueError(f"{embedding_model} is already the active embedding model")
+            if bot_settings.pending_embedding_model_name:
+                raise ValueError(
+                    f"A migration to {bot_settings.pending_embedding_model_name} is already in progress"
+                )
+
+            bot_settings.pending_embedding_model_name = embedding_model
+            bot_settings.pending_embedding_dim = embedding_dim
+            bot_settings.save(update_fields=['pending_embedding_model_name', 'pending_embedding_dim', 'updated_at'])
+            # Las generaciones en sombra de una migración anterior no valen para esta
+            EmbeddingSource.objects.filter(business_id=business_id).update(shadow_generation=0)
+            job = ReindexService.create(business_id, shadow=True)
+
+        logger.info(f"Embedding model migration of business {business_id} to {embedding_model} started")
+        return job
+
+    @classmethod
+    def coverage(cls, business_id):
+        """
+        Orígenes ya publicados con el modelo pendiente.
+
+        Returns:
+            dict: {source_type: {'total': int, 'ready': int}}
+        """
+        coverage = {}
+        for source_type, model in cls.SOURCE_MODELS:
+            ids = model.objects.filter(business_id=business_id).values('id')
+            coverage[source_type] = {
+                'total': ids.count(),
+                'ready': EmbeddingSource.objects.filter(
+                    business_id=business_id, source_type=source_type,
+                    source_id__in=ids, shadow_generation__gt=0
+                ).count()
+            }
+        return coverage
+
+    @classmethod
+    def status(cls, business_id):
+        """Modelo activo, migración pendiente, cobertura y último trabajo en sombra"""
+        bot_settings = BotSettingsService.get_bot_settings(str(business_id))
+        job = ReindexJob.objects.filter(business_id=business_id, shadow=True).first()
+        pending = bot_settings['pending_embedding_model_name']
+        return {
+            'business_id': str(business_id),
+            'embedding_model_name': bot_settings['embedding_model_name'],
+            'embedding_dim': bot_settings['embedding_dim'],
+            'pending_embedding_model_name': pending,
+            'pending_embedding_dim': bot_settings['pending_embedding_dim'],
+            'coverage': cls.coverage(business_id) if pending else None,
+            'job': ReindexService.summary(job) if job else None
+        }
+
+    @classmethod
+    def cutover(cls, business_id, embedding_model=None):
+        """
+        Activa el modelo pendiente: la búsqueda pasa a sus filas (generación en sombra)
+        en una sola transacción. Las del modelo anterior se eliminan después con
+        collect_garbage().
+
+        Args:
+            business_id (UUID): ID del negocio
+            embedding_model (str): Si se indica, el modelo pendiente debe ser este
+
+        Raises:
+            ValueError: Si no hay migración o algún documento o producto no tiene aún
+                generación en sombra
+        """
+        with transaction.atomic():
+            bot_settings = BotSettings.objects.select_for_update().filter(business_id=business_id).first()
+            pending = bot_settings.pending_embedding_model_name if bot_settings else None
+            if not pending or (embedding_model and pending != embedding_model):
+                raise ValueError(f"No embedding model migration to {embedding_model or 'any model'} in progress")
+
+            missing = sum(counts['total'] - counts['ready'] for counts in cls.coverage(business_id).values())
+            if missing:
+                raise ValueError(f"{missing} sources are not embedded with {pending} yet")
+
+            previous = bot_settings.embedding_model_name
+            bot_settings.embedding_model_name = pending
+            bot_settings.embedding_dim = bot_settings.pending_embedding_dim
+            bot_settings.pending_embedding_model_name = None
+            bot_settings.pending_embedding_dim = None
+            bot_settings.legacy_embeddings_active = False
+            bot_settings.save(update_fields=[
+                'embedding_model_name', 'embedding_dim', 'pending_embedding_model_name',
+                'pending_embedding_dim', 'legacy_embeddings_active', 'updated_at'
+            ])
+            EmbeddingSource.objects.filter(
+                business_id=business_id, source_type__in=[source_type for source_type, _ in cls.SOURCE_MODELS]
+            ).update(generation=F('shadow_generation'), shadow_generation=0)
+
+            transaction.on_commit(lambda: SearchResultCache.bump_corpus_version(business_id))
+
+        logger.info(f"Embedding model of business {business_id} switched from {previous} to {pending}")
+        return pending
+
+    @classmethod
+    def cancel(cls, business_id):
+        """
+        Abandona la migración en curso y cancela su trabajo en sombra. Sus filas se
+        eliminan con collect_garbage().
+
+        Raises:
+            ValueError: Si no hay migración en curso
+        """
+        with transaction.atomic():
+            bot_settings = BotSettings.objects.select_for_update().filter(business_id=business_id).first()
+            if not bot_settings or not bot_settings.pending_embedding_model_name:
+                raise ValueError(f"No embedding model migration in progress for business {business_id}")
+            bot_settings.pending_embedding_model_name = None
+            bot_settings.pending_embedding_dim = None
+            bot_settings.save(update_fields=['pending_embedding_model_name', 'pending_embedding_dim', 'updated_at'])
+            EmbeddingSource.objects.filter(business_id=business_id).update(shadow_generation=0)
+
+            job = ReindexService.active_job(business_id)
+            if job is not None and job.shadow:
+                ReindexService.cancel(job)
+
+    @staticmethod
+    def follow_up(business_id, embedding_model, shadow):
+        """
+        Decide si una ingesta terminada con embedding_model debe repetirse: en sombra si
+        hay una migración en curso, o con el modelo activo si el cutover ocurrió mientras
+        tanto.
+
+        Returns:
+            bool | None: shadow de la ingesta a encolar, o None si no hace falta
+        """
+        bot_settings = BotSettingsService.get_bot_settings(str(business_id))
+        if shadow:
+            return None
+        if bot_settings['embedding_model_name'] != embedding_model:
+            return False
+        if bot_settings['pending_embedding_model_name']:
+            return True
+        return None
+
+    @classmethod
+    def collect_garbage(cls, business_id, batch_size=None):
+        """
+        Elimina por lotes (transacciones cortas) las filas de modelos que no son el activo
+        ni el pendiente.
+
+        Returns:
+            int: Filas eliminadas
+        """
+        batch_size = batch_size or cls.GC_BATCH_SIZE
+        bot_settings = BotSettingsService.get_bot_settings(str(business_id))
+        keep = cls.search_model_names(bot_settings)
+        if bot_settings['pending_embedding_model_name']:
+            keep.append(bot_settings['pending_embedding_model_name'])
+
+        stale = Embedding.objects.filter(business_id=business_id).exclude(model_name__in=keep).order_by()
+        deleted = 0
+        while True:
+            ids = list(stale.values_list('id', flat=True)[:batch_size])
+            if not ids:
+                break
+            count, _ = Embedding.objects.filter(id__in=ids).delete()
+            deleted += count
+        if deleted:
+            logger.info(f"Deleted {deleted} embeddings of retired models of business {business_id}")
+        return deleted
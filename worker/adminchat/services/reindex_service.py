@@ -0,0 +1,267 @@
+# adminchat/services/reindex_service.py
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from ..models import Business, Document, ProductServiceItem, ReindexJob
+from .bot_setting_service import BotSettingsService
+import logging
+
+logger = logging.getLogger(__name__)
+
+class ReindexService:
+    """
+    Estado persistente de la re-indexación de un negocio (ReindexJob). reindex_business_task
+    recorre primero los documentos y después los productos, por keyset sobre el id, y
+    llama a checkpoint() tras cada lote: el cursor y los contadores guardados permiten
+    seguir el progreso y reanudar el trabajo si se interrumpe. Solo puede haber un
+    trabajo activo por negocio.
+    """
+
+    ACTIVE_STATUSES = ('pending', 'running', 'cancelling')
+    RESUMABLE_STATUSES = ('failed', 'cancelled')
+
+    # Fases en orden y modelo de los orígenes de cada una
+    PHASES = (('document', Document), ('product', ProductServiceItem))
+
+    # Campos que escribe checkpoint(); nunca el estado, que puede cambiar la API (cancel)
+    PROGRESS_FIELDS = (
+        'phase', 'cursor', 'documents_done', 'products_done', 'sources_failed',
+        'chunks_count', 'embeddings_created', 'embeddings_reused', 'failures'
+    )
+
+    MAX_RECORDED_FAILURES = 100
+    # Documentos fallidos seguidos a partir de los cuales se detiene el trabajo
+    MAX_CONSECUTIVE_FAILURES = 10
+
+    @classmethod
+    def create(cls, business_id, shadow=False):
+        """
+        Crea un trabajo de re-indexación con el modelo de embeddings actual del negocio.
+
+        Args:
+            business_id (UUID): ID del negocio
+            shadow (bool): Re-indexa con el modelo pendiente de una migración de modelo
+                (ModelMigrationService)
+
+        Returns:
+            ReindexJob: Trabajo en estado pending
+
+        Raises:
+            ValueError: Si el negocio no existe, ya tiene un trabajo activo o (shadow)
+                no tiene una migración de modelo en curso
+        """
+        if not Business.objects.filter(id=business_id).exists():
+            raise ValueError(f"Business not found: {business_id}")
+
+        bot_settings = BotSettingsService.get_bot_settings(str(business_id))
+        embedding_model, embedding_dim = bot_settings['embedding_model_name'], bot_settings['embedding_dim']
+        if shadow:
+            embedding_model = bot_settings['pending_embedding_model_name']
+            embedding_dim = bot_settings['pending_embedding_dim']
+            if not embedding_model:
+                raise ValueError(f"Business {business_id} has no embedding model migration in progress")
+        with transaction.atomic():
+            # Bloquea el negocio para que dos peticiones no creen dos trabajos activos
+            Business.objects.select_for_update().filter(id=business_id).first()
+            active = cls.active_job(business_id)
+            if active is not None:
+                raise ValueError(f"Business {business_id} already has an active reindex job: {active.id}")
+            return ReindexJob.objects.create(
+                business_id=business_id,
+                embedding_model=embedding_model,
+                embedding_dim=embedding_dim,
+                shadow=shadow,
+                documents_total=Document.objects.filter(business_id=business_id).count(),
+                products_total=ProductServiceItem.objects.filter(business_id=business_id).count()
+            )
+
+    @classmethod
+    def active_job(cls, business_id):
+        """Trabajo activo (no terminado ni abandonado) del negocio, o None"""
+        return next(
+            (job for job in ReindexJob.objects.filter(business_id=business_id, status__in=cls.ACTIVE_STATUSES)
+             if not cls.is_stale(job)),
+            None
+        )
+
+    @staticmethod
+    def is_stale(job):
+        """
+        Indica si un trabajo en curso o cancelándose lleva REINDEX_STALE_SECONDS sin
+        progreso (worker caído): no bloquea al negocio y se puede cancelar o reanudar.
+        """
+        return job.status in ('running', 'cancelling') and \
+            job.updated_at < timezone.now() - timedelta(seconds=settings.REINDEX_STALE_SECONDS)
+
+    @classmethod
+    def resume(cls, job):
+        """
+        Prepara un trabajo fallido, cancelado o abandonado para continuar desde su cursor.
+
+        Raises:
+            ValueError: Si el trabajo no se puede reanudar
+        """
+        if job.status not in cls.RESUMABLE_STATUSES and not cls.is_stale(job):
+            raise ValueError(f"Reindex job {job.id} is {job.status} and cannot be resumed")
+        active = cls.active_job(job.business_id)
+        if active is not None and active.pk != job.pk:
+            raise ValueError(f"Business {job.business_id} already has an active reindex job: {active.id}")
+        job.status = 'pending'
+        job.error = None
+        job.finished_at = None
+        job.save(update_fields=['status', 'error', 'finished_at', 'updated_at'])
+        return job
+
+    @classmethod
+    def cancel(cls, job):
+        """
+        Pide la cancelación de un trabajo. La tarea se detiene en el siguiente checkpoint;
+        un trabajo que no ha empezado o está abandonado se cancela directamente.
+
+        Raises:
+            ValueError: Si el trabajo ya terminó
+        """
+        if job.status not in cls.ACTIVE_STATUSES:
+            raise ValueError(f"Reindex job {job.id} is {job.status} and cannot be cancelled")
+        if job.status == 'pending' or cls.is_stale(job):
+            updated = ReindexJob.objects.filter(pk=job.pk, status=job.status).update(
+                status='cancelled', finished_at=timezone.now(), updated_at=timezone.now()
+            )
+        elif job.status == 'running':
+            updated = ReindexJob.objects.filter(pk=job.pk, status='running').update(
+                status='cancelling', updated_at=timezone.now()
+            )
+        else:
+            return job  # Ya se está cancelando
+        if not updated:
+            # La tarea lo tomó o terminó mientras tanto: se reintenta con el estado actual
+            job.refresh_from_db()
+            return cls.cancel(job)
+        job.refresh_from_db()
+        return job
+
+    @classmethod
+    def set_task(cls, job, task_id):
+        """Guarda el ID de la tarea de Celery que ejecuta el trabajo"""
+        job.task_id = str(task_id)
+        ReindexJob.objects.filter(pk=job.pk).update(task_id=job.task_id)
+
+    @classmethod
+    def claim(cls, job_id, task_id=None):
+        """
+        Marca un trabajo pendiente como en curso.
+
+        Returns:
+            ReindexJob | None: El trabajo, o None si ya no está pendiente (cancelado
+            o tomado por otra tarea)
+        """
+        with transaction.atomic():
+            job = ReindexJob.objects.select_for_update().filter(pk=job_id, status='pending').first()
+            if job is None:
+                return None
+            job.status = 'running'
+            job.started_at = job.started_at or timezone.now()
+            fields = ['status', 'started_at', 'updated_at']
+            if task_id:
+                job.task_id = str(task_id)
+                fields.append('task_id')
+            job.save(update_fields=fields)
+            return job
+
+    @classmethod
+    def iter_pages(cls, job, model, page_size):
+        """
+        Recorre los orígenes de la fase actual del trabajo por keyset (id > cursor), sin
+        OFFSET: el coste de cada página no crece con el avance.
+
+        Yields:
+            list: Página de como mucho page_size orígenes, en orden de id
+        """
+        cursor = job.cursor
+        while True:
+            queryset = model.objects.filter(business_id=job.business_id)
+            if cursor is not None:
+                queryset = queryset.filter(id__gt=cursor)
+            page = list(queryset.order_by('id')[:page_size])
+            if not page:
+                return
+            yield page
+            cursor = page[-1].id
+
+    @staticmethod
+    def heartbeat(job):
+        """Marca actividad del trabajo durante un origen largo (para is_stale)"""
+        ReindexJob.objects.filter(pk=job.pk).update(updated_at=timezone.now())
+
+    @staticmethod
+    def add_counts(job, result):
+        """Suma al trabajo los contadores de una ingesta (ingest_lines / ingest_products)"""
+        job.chunks_count += result['chunks']
+        job.embeddings_created += result['created']
+        job.embeddings_reused += result['reused']
+
+    @classmethod
+    def record_failure(cls, job, source_type, source_id, error):
+        """Cuenta un origen fallido y guarda el error (los primeros MAX_RECORDED_FAILURES)"""
+        job.sources_failed += 1
+        if len(job.failures) < cls.MAX_RECORDED_FAILURES:
+            job.failures.append({'source_type': source_type, 'source_id': str(source_id), 'error': str(error)})
+
+    @classmethod
+    def checkpoint(cls, job):
+        """
+        Guarda el cursor y los contadores del trabajo.
+
+        Returns:
+            bool: False si se pidió cancelar el trabajo (pasa a cancelled) y hay que parar
+        """
+        ReindexJob.objects.filter(pk=job.pk).update(
+            updated_at=timezone.now(),
+            **{field: getattr(job, field) for field in cls.PROGRESS_FIELDS}
+        )
+        if ReindexJob.objects.filter(pk=job.pk, status='cancelling').update(
+                status='cancelled', finished_at=timezone.now()):
+            logger.info(f"Reindex job {job.id} cancelled at {job.phase}:{job.cursor}")
+            job.status = 'cancelled'
+            return False
+        return True
+
+    @classmethod
+    def next_phase(cls, job):
+        """Pasa a la fase siguiente y reinicia el cursor"""
+        phases = [phase for phase, _ in cls.PHASES] + ['done']
+        job.phase = phases[phases.index(job.phase) + 1]
+        job.cursor = None
+        return cls.checkpoint(job)
+
+    @classmethod
+    def finish(cls, job, error=None):
+        """Marca el trabajo como completed, o failed con el error (reanudable)"""
+        job.status = 'failed' if error else 'completed'
+        job.error = str(error) if error else None
+        job.finished_at = timezone.now()
+        ReindexJob.objects.filter(pk=job.pk).update(
+            status=job.status, error=job.error, finished_at=job.finished_at, updated_at=timezone.now(),
+            **{field: getattr(job, field) for field in cls.PROGRESS_FIELDS}
+        )
+
+    @staticmethod
+    def summary(job):
+        """Resumen del trabajo para el resultado de la tarea y el comando"""
+        return {
+            'job_id': str(job.id),
+            'business_id': str(job.business_id),
+            'status': job.status,
+            'phase': job.phase,
+            'embedding_model': job.embedding_model,
+            'shadow': job.shadow,
+            'documents_done': job.documents_done,
+            'documents_total': job.documents_total,
+            'products_done': job.products_done,
+            'products_total': job.products_total,
+            'sources_failed': job.sources_failed,
+            'chunks_count': job.chunks_count,
+            'embeddings_created': job.embeddings_created,
+            'embeddings_reused': job.embeddings_reused
+        }
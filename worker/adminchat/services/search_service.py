@@ -0,0 +1,501 @@
+# adminchat/services/search_service.py
+from django.conf import settings
+from django.db import connection
+from django.db.models.functions import Cast
+from pgvector.django import CosineDistance, VectorField
+from ..models import Embedding
+import json
+import uuid
+import logging
+
+logger = logging.getLogger(__name__)
+
+class EmbeddingSearchService:
+    """Utilidades para la búsqueda semántica sobre chat_embedding"""
+
+    # ef_search configurado a nivel de sesión (settings.DATABASES OPTIONS)
+    DEFAULT_EF_SEARCH = settings.HNSW_EF_SEARCH
+    MAX_EF_SEARCH = 1000
+    MAX_PROBES = 32768
+
+    # Columnas devueltas por la búsqueda (nunca el vector)
+    RESULT_FIELDS = (
+        'id', 'content', 'metadata', 'source_type', 'source_id',
+        'chunk_index', 'business_id', 'created_at', 'updated_at'
+    )
+
+    # Máximo de vectores por llamada a search_batch
+    MAX_BATCH_QUERIES = 32
+
+    # Búsqueda híbrida: configuración de la columna content_tsv (migración 0003),
+    # constante k de Reciprocal Rank Fusion y candidatos por lista antes de fusionar
+    TEXT_SEARCH_CONFIG = 'simple'
+    RRF_K = 60
+    HYBRID_CANDIDATES_FACTOR = 4
+    MIN_HYBRID_CANDIDATES = 20
+
+    # Los vectores se guardan con la dimensión real del modelo (BotSettings.embedding_dim) y
+    # cada dimensión tiene sus índices parciales (WHERE dimensions = N). Las consultas deben
+    # filtrar por la dimensión y usar las mismas expresiones que los índices
+    # (Embedding.Meta.indexes, migración 0007, rebuild_vector_index) para que el planner los use.
+    # Solo se buscan filas activas: las de una ingesta en curso se publican al terminar.
+    DISTANCE = "e.vector::vector({dim}) <=> {query}::vector({dim})"
+
+    # Primera etapa de la búsqueda en dos etapas: cuantizada (BotSettings.search_vector_precision)
+    # o Matryoshka sobre los primeros N componentes (BotSettings.search_truncate_dim)
+    FIRST_STAGE_DISTANCES = {
+        'half': "e.vector::halfvec({dim}) <=> %(vector)s::halfvec({dim})",
+        'binary': "binary_quantize(e.vector)::bit({dim}) <~> binary_quantize(%(vector)s::vector)::bit({dim})",
+        'truncated': "subvector(e.vector, 1, {prefix})::vector({prefix}) <=> subvector(%(vector)s::vector, 1, {prefix})::vector({prefix})",
+    }
+
+    # Estrategia para búsquedas con filtros (source_type, source_ids, metadata):
+    # - prefilter: los índices B-tree/GIN seleccionan las filas y se ordena de forma exacta
+    # - iterative: HNSW con hnsw.iterative_scan (pgvector >= 0.8); sin él se amplía ef_search
+    # - auto: prefilter si el filtro deja como mucho PREFILTER_MAX_ROWS filas, iterative si no
+    FILTER_STRATEGY = settings.VECTOR_FILTER_STRATEGY
+    PREFILTER_MAX_ROWS = settings.VECTOR_PREFILTER_MAX_ROWS
+    ITERATIVE_SCAN = settings.PGVECTOR_ITERATIVE_SCAN
+    FILTERED_EF_FACTOR = 10
+
+    @classmethod
+    def parse_index_tuning(cls, data, top_k):
+        """
+        Valida los parámetros de ajuste de los índices ANN enviados en la petición.
+
+        Args:
+            data (dict): Cuerpo de la petición
+            top_k (int): Número de resultados solicitados
+
+        Returns:
+            dict: {'ef_search': int | None, 'probes': int | None}. None indica que
+            se mantiene el valor de la sesión y no hace falta un SET LOCAL.
+
+        Raises:
+            ValueError: Si algún parámetro no es un entero válido
+        """
+        ef_search = data.get('ef_search')
+        probes = data.get('probes')
+
+        if ef_search is not None:
+            ef_search = int(ef_search)
+            if not 1 <= ef_search <= cls.MAX_EF_SEARCH:
+                raise ValueError(f"ef_search must be between 1 and {cls.MAX_EF_SEARCH}")
+        else:
+            ef_search = cls.DEFAULT_EF_SEARCH
+
+        if probes is not None:
+            probes = int(probes)
+            if not 1 <= probes <= cls.MAX_PROBES:
+                raise ValueError(f"probes must be between 1 and {cls.MAX_PROBES}")
+
+        # HNSW nunca devuelve más de ef_search candidatos
+        ef_search = min(max(ef_search, top_k), cls.MAX_EF_SEARCH)
+        return {
+            'ef_search': None if ef_search == cls.DEFAULT_EF_SEARCH else ef_search,
+            'probes': probes
+        }
+
+    @staticmethod
+    def needs_tuning(tuning):
+        """Indica si hay que aplicar algún SET LOCAL antes de la consulta"""
+        return any(value for value in tuning.values())
+
+    @staticmethod
+    def apply_index_tuning(ef_search=None, probes=None, iterative_scan=None, exact=False):
+        """
+        Aplica hnsw.ef_search / ivfflat.probes con alcance de transacción
+        (equivalente a SET LOCAL). Debe llamarse dentro de transaction.atomic().
+
+        Args:
+            ef_search (int): Candidatos de HNSW
+            probes (int): Listas de IVFFlat
+            iterative_scan (str): Modo de hnsw/ivfflat.iterative_scan (pgvector >= 0.8)
+            exact (bool): Desactiva los index scans para que el top-k se calcule de forma
+                exacta sobre las filas que seleccionan los índices B-tree/GIN (bitmap scans).
+                HNSW e IVFFlat solo admiten index scans, así que quedan fuera del plan.
+        """
+        options = []
+        if ef_search is not None:
+            options.append(('hnsw.ef_search', str(ef_search)))
+        if probes is not None:
+            options.append(('ivfflat.probes', str(probes)))
+        if iterative_scan:
+            options.append(('hnsw.iterative_scan', iterative_scan))
+            options.append(('ivfflat.iterative_scan', iterative_scan))
+        if exact:
+            options.append(('enable_indexscan', 'off'))
+
+        with connection.cursor() as cursor:
+            for name, value in options:
+                cursor.execute("SELECT set_config(%s, %s, true)", [name, value])
+
+    @staticmethod
+    def parse_filters(data):
+        """
+        Valida los filtros opcionales de la búsqueda.
+
+        Args:
+            data (dict): Cuerpo de la petición con 'source_type', 'source_ids' y/o 'metadata'
+
+        Returns:
+            dict: Filtros normalizados (vacío si no hay ninguno)
+
+        Raises:
+            ValueError: Si algún filtro no es válido
+        """
+        filters = {}
+
+        source_type = data.get('source_type')
+        if source_type is not None:
+            valid_types = [choice[0] for choice in Embedding.SOURCE_TYPES]
+            if source_type not in valid_types:
+                raise ValueError(f"Invalid source_type. Valid types are: {', '.join(valid_types)}")
+            filters['source_type'] = source_type
+
+        source_ids = data.get('source_ids')
+        if source_ids is not None:
+            if not isinstance(source_ids, list) or not source_ids:
+                raise ValueError("source_ids must be a non-empty list of UUIDs")
+            filters['source_ids'] = sorted(str(uuid.UUID(str(source_id))) for source_id in source_ids)
+
+        metadata = data.get('metadata')
+        if metadata is not None:
+            if not isinstance(metadata, dict) or not metadata:
+                raise ValueError("metadata must be a non-empty JSON object")
+            filters['metadata'] = metadata
+
+        return filters
+
+    @staticmethod
+    def apply_filters(queryset, filters):
+        """Aplica los filtros a un queryset de Embedding"""
+        if 'source_type' in filters:
+            queryset = queryset.filter(source_type=filters['source_type'])
+        if 'source_ids' in filters:
+            queryset = queryset.filter(source_id__in=filters['source_ids'])
+        if 'metadata' in filters:
+            queryset = queryset.filter(metadata__contains=filters['metadata'])
+        if 'model_names' in filters:
+            queryset = queryset.filter(model_name__in=filters['model_names'])
+        return queryset
+
+    @staticmethod
+    def filter_sql(filters, alias='e'):
+        """
+        Equivalente SQL de apply_filters para las consultas en crudo.
+
+        Returns:
+            tuple: (fragmento ' AND ...', parámetros con nombre)
+        """
+        clauses = []
+        params = {}
+        if 'source_type' in filters:
+            clauses.append(f"{alias}.source_type = %(filter_source_type)s")
+            params['filter_source_type'] = filters['source_type']
+        if 'source_ids' in filters:
+            clauses.append(f"{alias}.source_id = ANY(%(filter_source_ids)s::uuid[])")
+            params['filter_source_ids'] = filters['source_ids']
+        if 'metadata' in filters:
+            clauses.append(f"{alias}.metadata @> %(filter_metadata)s::jsonb")
+            params['filter_metadata'] = json.dumps(filters['metadata'])
+        if 'model_names' in filters:
+            clauses.append(f"{alias}.model_name = ANY(%(filter_model_names)s)")
+            params['filter_model_names'] = list(filters['model_names'])
+        return ''.join(f' AND {clause}' for clause in clauses), params
+
+    @classmethod
+    def resolve_filter_strategy(cls, business_id, filters, top_k, tuning, mixed_models=False):
+        """
+        Elige cómo resolver una búsqueda filtrada para que no devuelva menos de
+        top_k resultados (post-filtro del ANN) ni recorra todo el negocio.
+
+        El filtro model_names solo cuenta si mixed_models: fuera de una migración de
+        modelo con la misma dimensión casi no descarta filas del índice.
+
+        Returns:
+            tuple: (estrategia, tuning ajustado)
+        """
+        if not any(key != 'model_names' or mixed_models for key in filters):
+            return 'ann', tuning
+
+        strategy = cls.FILTER_STRATEGY
+        if strategy == 'auto':
+            # Conteo acotado: como mucho PREFILTER_MAX_ROWS + 1 filas vía B-tree/GIN
+            matching = cls.apply_filters(
+                Embedding.objects.filter(business_id=business_id, is_active=True), filters
+            ).order_by().values('id')[:cls.PREFILTER_MAX_ROWS + 1]
+            strategy = 'prefilter' if matching.count() <= cls.PREFILTER_MAX_ROWS else 'iterative'
+
+        tuning = dict(tuning)
+        if strategy == 'prefilter':
+            tuning['exact'] = True
+        elif cls.ITERATIVE_SCAN:
+            tuning['iterative_scan'] = 'relaxed_order'
+        else:
+            # Sin iterative scan se amplía la lista de candidatos para compensar el post-filtro
+            ef_search = tuning.get('ef_search') or cls.DEFAULT_EF_SEARCH
+            tuning['ef_search'] = min(max(ef_search, top_k * cls.FILTERED_EF_FACTOR), cls.MAX_EF_SEARCH)
+            strategy = 'ann'
+        return strategy, tuning
+
+    @staticmethod
+    def format_result(row):
+        """Convierte una fila proyectada (dict) en el resultado serializable de la API"""
+        return {
+            'id': str(row['id']),
+            'content': row['content'],
+            'metadata': row['metadata'],
+            'source_type': row['source_type'],
+            'source_id': str(row['source_id']),
+            'chunk_index': row['chunk_index'],
+            'similarity': 1 - float(row['distance']),
+            'business_id': str(row['business_id']),
+            'created_at': row['created_at'],
+            'updated_at': row['updated_at'],
+            # Solo presentes en la búsqueda híbrida
+            **{
+                key: row[key] for key in ('score', 'vector_rank', 'lexical_rank')
+                if key in row
+            }
+        }
+
+    @classmethod
+    def distance_sql(cls, dim, query='%(vector)s'):
+        """Distancia coseno sobre la expresión del índice parcial de la dimensión"""
+        return cls.DISTANCE.format(dim=int(dim), query=query)
+
+    @staticmethod
+    def cosine_distance(vector, dim):
+        """Equivalente ORM de distance_sql (filtrar además por dimensions=dim)"""
+        return CosineDistance(Cast('vector', VectorField(dimensions=dim)), vector)
+
+    @staticmethod
+    def reranks(precision, truncate_dim, rerank):
+        """Indica si la primera etapa se re-rankea (y por tanto se sobremuestrea)"""
+        return bool(truncate_dim) or precision == 'binary' or (precision == 'half' and rerank)
+
+    @staticmethod
+    def to_vector_literal(vector):
+        """Representación textual de pgvector ('[1,2,3]') de una lista de números"""
+        return '[' + ','.join(str(float(x)) for x in vector) + ']'
+
+    @classmethod
+    def _row_to_dict(cls, columns, row):
+        data = dict(zip(columns, row))
+        # Django registra jsonb como texto en psycopg3; el ORM lo decodifica, aquí lo hacemos a mano
+        if isinstance(data.get('metadata'), str):
+            data['metadata'] = json.loads(data['metadata'])
+        return data
+
+    @classmethod
+    def batch_search(cls, business_id, dim, vectors, top_k, min_similarity, filters=None):
+        """
+        Ejecuta N búsquedas top-k en una sola sentencia SQL: los vectores se
+        desanidan con WITH ORDINALITY y cada uno resuelve su top-k en un
+        LATERAL, que puede usar el índice HNSW.
+
+        Args:
+            business_id (UUID): ID del negocio
+            dim (int): Dimensión de los embeddings del negocio (BotSettings.embedding_dim)
+            vectors (list[list[float]]): Vectores de consulta
+            top_k (int): Resultados por consulta
+            min_similarity (float): Umbral mínimo de similitud
+            filters (dict): Filtros de parse_filters
+
+        Returns:
+            list[list[dict]]: Resultados por consulta, en el orden de entrada
+        """
+        table = Embedding._meta.db_table
+        columns = ', '.join(f'e.{field}' for field in cls.RESULT_FIELDS)
+        result_columns = ', '.join(f'r.{field}' for field in cls.RESULT_FIELDS)
+        filter_clause, filter_params = cls.filter_sql(filters or {})
+        distance = cls.distance_sql(dim, query='q.vec')
+        sql = f"""
+            SELECT q.ord, {result_columns}, r.distance
+            FROM unnest(%(vectors)s::text[]::vector[]) WITH ORDINALITY AS q(vec, ord)
+            CROSS JOIN LATERAL (
+                SELECT {columns}, {distance} AS distance
+                FROM {table} e
+                WHERE e.business_id = %(business_id)s AND e.dimensions = {int(dim)} AND e.is_active{filter_clause}
+                ORDER BY {distance}
+                LIMIT %(top_k)s
+            ) r
+            WHERE r.distance <= %(max_distance)s
+            ORDER BY q.ord, r.distance
+        """
+        params = {
+            'vectors': [cls.to_vector_literal(vector) for vector in vectors],
+            'business_id': str(business_id),
+            'top_k': top_k,
+            'max_distance': 1 - min_similarity,
+            **filter_params
+        }
+
+        results = [[] for _ in vectors]
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            names = [col[0] for col in cursor.description]
+            for row in cursor.fetchall():
+                data = cls._row_to_dict(names, row)
+                results[data.pop('ord') - 1].append(cls.format_result(data))
+        return results
+
+    @classmethod
+    def hybrid_search(cls, business_id, dim, vector, query_text, top_k, min_similarity, rrf_k=None, filters=None):
+        """
+        Búsqueda híbrida en una sola consulta: top-N por similitud coseno y top-N
+        por ts_rank_cd sobre content_tsv, fusionados con Reciprocal Rank Fusion.
+        Cada lista de candidatos se limita antes de fusionar para que el coste
+        sea cercano al de la búsqueda vectorial.
+
+        Args:
+            business_id (UUID): ID del negocio
+            dim (int): Dimensión de los embeddings del negocio (BotSettings.embedding_dim)
+            vector (list[float]): Vector de consulta
+            query_text (str): Texto de consulta para la parte léxica
+            top_k (int): Número de resultados
+            min_similarity (float): Umbral mínimo de similitud de la lista vectorial
+            rrf_k (int): Constante k de RRF (default: RRF_K)
+            filters (dict): Filtros de parse_filters, aplicados a ambas listas
+
+        Returns:
+            list[dict]: Resultados ordenados por score RRF
+        """
+        table = Embedding._meta.db_table
+        columns = ', '.join(f'e.{field}' for field in cls.RESULT_FIELDS)
+        filter_clause, filter_params = cls.filter_sql(filters or {})
+        distance = cls.distance_sql(dim)
+        sql = f"""
+            WITH vector_hits AS (
+                SELECT v.id, ROW_NUMBER() OVER (ORDER BY v.distance) AS rank
+                FROM (
+                    SELECT e.id, {distance} AS distance
+                    FROM {table} e
+                    WHERE e.business_id = %(business_id)s AND e.dimensions = {int(dim)} AND e.is_active{filter_clause}
+                    ORDER BY {distance}
+                    LIMIT %(candidates)s
+                ) v
+                WHERE v.distance <= %(max_distance)s
+            ),
+            lexical_hits AS (
+                SELECT l.id, ROW_NUMBER() OVER (ORDER BY l.rank_score DESC) AS rank
+                FROM (
+                    SELECT e.id, ts_rank_cd(e.content_tsv, tsq, 1) AS rank_score
+                    FROM {table} e,
+                         websearch_to_tsquery(%(ts_config)s::regconfig, %(query_text)s) tsq
+                    WHERE e.business_id = %(business_id)s AND e.dimensions = {int(dim)} AND e.is_active{filter_clause}
+                      AND e.content_tsv @@ tsq
+                    ORDER BY rank_score DESC
+                    LIMIT %(candidates)s
+                ) l
+            ),
+            fused AS (
+                SELECT COALESCE(v.id, l.id) AS id,
+                       COALESCE(1.0 / (%(rrf_k)s + v.rank), 0)
+                         + COALESCE(1.0 / (%(rrf_k)s + l.rank), 0) AS score,
+                       v.rank AS vector_rank,
+                       l.rank AS lexical_rank
+                FROM vector_hits v
+                FULL OUTER JOIN lexical_hits l ON v.id = l.id
+            )
+            SELECT {columns}, {distance} AS distance,
+                   f.score, f.vector_rank, f.lexical_rank
+            FROM fused f
+            JOIN {table} e ON e.id = f.id
+            ORDER BY f.score DESC
+            LIMIT %(top_k)s
+        """
+        params = {
+            'vector': cls.to_vector_literal(vector),
+            'business_id': str(business_id),
+            'candidates': max(top_k * cls.HYBRID_CANDIDATES_FACTOR, cls.MIN_HYBRID_CANDIDATES),
+            'max_distance': 1 - min_similarity,
+            'ts_config': cls.TEXT_SEARCH_CONFIG,
+            'query_text': query_text,
+            'rrf_k': rrf_k or cls.RRF_K,
+            'top_k': top_k,
+            **filter_params
+        }
+
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            names = [col[0] for col in cursor.description]
+            rows = [cls._row_to_dict(names, row) for row in cursor.fetchall()]
+
+        for row in rows:
+            row['score'] = float(row['score'])
+        return [cls.format_result(row) for row in rows]
+
+    @classmethod
+    def two_stage_search(cls, business_id, dim, vector, top_k, min_similarity, precision='full',
+                         truncate_dim=None, rerank=True, rerank_factor=4, filters=None):
+        """
+        Búsqueda en dos etapas: ANN con sobremuestreo sobre un índice reducido
+        (halfvec, bit o prefijo truncado del vector) y re-ranking exacto con el
+        vector completo.
+
+        Args:
+            business_id (UUID): ID del negocio
+            dim (int): Dimensión de los embeddings del negocio (BotSettings.embedding_dim)
+            vector (list[float]): Vector de consulta
+            top_k (int): Número de resultados
+            min_similarity (float): Umbral mínimo de similitud (sobre el vector completo)
+            precision (str): 'full', 'half' o 'binary'
+            truncate_dim (int): Si se indica, la primera etapa usa los primeros
+                truncate_dim componentes (Matryoshka) y tiene prioridad sobre precision
+            rerank (bool): Re-rankear con el vector completo. Las distancias de Hamming
+                y las del prefijo truncado no son la coseno completa, así que 'binary'
+                y la truncada siempre re-rankean.
+            rerank_factor (int): Candidatos de la primera etapa por resultado
+            filters (dict): Filtros de parse_filters
+
+        Returns:
+            list[dict]: Resultados ordenados por similitud
+        """
+        table = Embedding._meta.db_table
+        columns = ', '.join(f'e.{field}' for field in cls.RESULT_FIELDS)
+        filter_clause, filter_params = cls.filter_sql(filters or {})
+        if truncate_dim:
+            first_stage = cls.FIRST_STAGE_DISTANCES['truncated'].format(prefix=int(truncate_dim))
+        else:
+            first_stage = cls.FIRST_STAGE_DISTANCES[precision].format(dim=int(dim))
+
+        if cls.reranks(precision, truncate_dim, rerank):
+            candidates = top_k * max(rerank_factor, 1)
+            distance = cls.distance_sql(dim)
+        else:
+            candidates = top_k
+            distance = first_stage
+
+        sql = f"""
+            WITH candidates AS (
+                SELECT e.id
+                FROM {table} e
+                WHERE e.business_id = %(business_id)s AND e.dimensions = {int(dim)} AND e.is_active{filter_clause}
+                ORDER BY {first_stage}
+                LIMIT %(candidates)s
+            )
+            SELECT * FROM (
+                SELECT {columns}, {distance} AS distance
+                FROM candidates c
+                JOIN {table} e ON e.id = c.id
+            ) r
+            WHERE r.distance <= %(max_distance)s
+            ORDER BY r.distance
+            LIMIT %(top_k)s
+        """
+        params = {
+            'vector': cls.to_vector_literal(vector),
+            'business_id': str(business_id),
+            'candidates': candidates,
+            'max_distance': 1 - min_similarity,
+            'top_k': top_k,
+            **filter_params
+        }
+
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            names = [col[0] for col in cursor.description]
+            rows = [cls._row_to_dict(names, row) for row in cursor.fetchall()]
+        return [cls.format_result(row) for row in rows]
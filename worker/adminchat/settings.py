@@ -147,6 +147,16 @@ WSGI_APPLICATION = "adminchat.wsgi.application"
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
 
+# Valor de sesión de hnsw.ef_search: con top_k <= este valor la búsqueda
+# semántica no necesita SET LOCAL y se resuelve en una sola consulta
+HNSW_EF_SEARCH = int(os.getenv('HNSW_EF_SEARCH', 100))
+
+# Búsquedas con filtros (source_type/source_ids/metadata): 'auto', 'prefilter' o 'iterative'.
+# hnsw.iterative_scan requiere pgvector >= 0.8; sin él 'iterative' amplía ef_search.
+VECTOR_FILTER_STRATEGY = os.getenv('VECTOR_FILTER_STRATEGY', 'auto')
+VECTOR_PREFILTER_MAX_ROWS = int(os.getenv('VECTOR_PREFILTER_MAX_ROWS', 20000))
+PGVECTOR_ITERATIVE_SCAN = config('PGVECTOR_ITERATIVE_SCAN', cast=bool, default=False)
+
 # Configuración de la base de datos
 DATABASES = {
     'default': {
@@ -158,6 +168,7 @@ DATABASES = {
         'PORT': '5432',
         'OPTIONS': {
             'client_encoding': 'UTF8',
+            'options': f'-c hnsw.ef_search={HNSW_EF_SEARCH}',
         },
     }
 }
@@ -276,5 +287,97 @@ AWS_DEFAULT_ACL = 'private'
 URL_EMBEDDING= os.getenv('URL_EMBEDDING', 'http://localhost')
 print(f'url embedding: {URL_EMBEDDING}')
 
+# Cliente del servicio de embeddings: textos por petición, peticiones en paralelo por
+# llamada, conexiones keep-alive del pool, timeout y reintentos por lote
+EMBEDDING_BATCH_SIZE = int(os.getenv('EMBEDDING_BATCH_SIZE', 64))
+EMBEDDING_MAX_CONCURRENCY = int(os.getenv('EMBEDDING_MAX_CONCURRENCY', 4))
+EMBEDDING_POOL_SIZE = int(os.getenv('EMBEDDING_POOL_SIZE', 10))
+EMBEDDING_TIMEOUT = float(os.getenv('EMBEDDING_TIMEOUT', 60))  # segundos
+EMBEDDING_MAX_RETRIES = int(os.getenv('EMBEDDING_MAX_RETRIES', 3))
+# Pide los vectores como float32 binario (Accept) en vez de listas JSON; el servicio
+# puede seguir respondiendo en JSON y el cliente acepta ambos formatos
+EMBEDDING_BINARY_TRANSPORT = config('EMBEDDING_BINARY_TRANSPORT', cast=bool, default=False)
+
+# Filas por sentencia COPY en la escritura masiva de embeddings (EmbeddingBulkLoader)
+EMBEDDING_COPY_BATCH_SIZE = int(os.getenv('EMBEDDING_COPY_BATCH_SIZE', 5000))
+# Chunks por lote de la ingesta en streaming (vectorización + COPY); acota la memoria
+INGESTION_BATCH_SIZE = int(os.getenv('INGESTION_BATCH_SIZE', EMBEDDING_BATCH_SIZE * EMBEDDING_MAX_CONCURRENCY))
+# Los PDF con al menos INGESTION_SHARD_MIN_PAGES páginas se ingieren en paralelo, un
+# shard (tarea de Celery) por cada INGESTION_SHARD_PAGES páginas
+INGESTION_SHARD_MIN_PAGES = int(os.getenv('INGESTION_SHARD_MIN_PAGES', 200))
+INGESTION_SHARD_PAGES = int(os.getenv('INGESTION_SHARD_PAGES', 50))
+# Re-indexación de un negocio completo (ReindexJob): documentos por página de la
+# iteración por keyset, productos por llamada compartida al servicio de embeddings y
+# peticiones en paralelo al servicio (menos que la ingesta normal para no saturarlo)
+REINDEX_PAGE_SIZE = int(os.getenv('REINDEX_PAGE_SIZE', 100))
+REINDEX_PRODUCT_BATCH_SIZE = int(os.getenv('REINDEX_PRODUCT_BATCH_SIZE', 200))
+REINDEX_MAX_CONCURRENCY = int(os.getenv('REINDEX_MAX_CONCURRENCY', 2))
+# Un trabajo en curso sin progreso durante este tiempo (worker caído) se puede reanudar
+REINDEX_STALE_SECONDS = int(os.getenv('REINDEX_STALE_SECONDS', 900))
+# Ingesta de catálogo (create_catalog_embeddings_task): productos por consulta, llamada
+# compartida al servicio de embeddings, COPY y publicación
+CATALOG_INGESTION_BATCH_SIZE = int(os.getenv('CATALOG_INGESTION_BATCH_SIZE', 1000))
+
+# Tokenizador local por defecto de los chunks medidos en tokens (TokenizerService):
+# regex, tiktoken:<encoding> o hf:<ruta a tokenizer.json>
+CHUNK_TOKENIZER = os.getenv('CHUNK_TOKENIZER', 'regex')
+
+# Textos extraídos de documentos: hasta este tamaño (caracteres) se guardan en
+# Document.content_text; por encima, comprimidos en content_text_compressed
+DOCUMENT_TEXT_INLINE_MAX_CHARS = int(os.getenv('DOCUMENT_TEXT_INLINE_MAX_CHARS', 200000))
+# Por encima de este tamaño el texto no se guarda (la ingesta en streaming no lo acumula)
+DOCUMENT_TEXT_STORE_MAX_CHARS = int(os.getenv('DOCUMENT_TEXT_STORE_MAX_CHARS', 50000000))
+# Tamaño máximo (caracteres) de una línea en la extracción en streaming y en el chunking
+# por palabras: las líneas más largas (p. ej. un TXT sin saltos) se procesan por trozos
+TEXT_LINE_MAX_CHARS = int(os.getenv('TEXT_LINE_MAX_CHARS', 100000))
+# Tamaño (MB) del texto sintético de la prueba de memoria de la ingesta (tests.py);
+# en CI se puede reducir
+INGESTION_MEMORY_TEST_MB = int(os.getenv('INGESTION_MEMORY_TEST_MB', 1024))
+
+# Extracción de PDF en paralelo por páginas (TextExtractor.iter_pdf_pages)
+PDF_EXTRACTION_WORKERS = int(os.getenv('PDF_EXTRACTION_WORKERS', os.cpu_count() or 1))
+PDF_PARALLEL_MIN_PAGES = int(os.getenv('PDF_PARALLEL_MIN_PAGES', 20))
+PDF_PAGE_TIMEOUT = float(os.getenv('PDF_PAGE_TIMEOUT', 30))  # segundos
+
+# Copias locales de los archivos descargados de S3 (LocalFileCache): los shards de un PDF
+# que se ingieren en el mismo worker leen sus páginas de una sola descarga
+SOURCE_FILE_CACHE_DIR = os.getenv('SOURCE_FILE_CACHE_DIR', '/tmp/adminchat-files')
+SOURCE_FILE_CACHE_TTL = int(os.getenv('SOURCE_FILE_CACHE_TTL', 3600))  # segundos sin uso
+
+# Caché compartida entre la API y el worker (el servicio redis de docker-compose, que
+# define CACHE_REDIS_URL para ambos). La usan la caché de resultados de búsqueda, su
+# versión de corpus por negocio y sus contadores. Con CACHE_REDIS_URL vacío (por defecto)
+# se usa una caché local de cada proceso y la caché de resultados se desactiva: otros
+# procesos no verían sus invalidaciones.
+CACHE_REDIS_URL = os.getenv('CACHE_REDIS_URL', '')
+if CACHE_REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Caché de resultados de búsqueda semántica (se invalida al cambiar el corpus del negocio)
+SEARCH_RESULT_CACHE_TTL = int(os.getenv('SEARCH_RESULT_CACHE_TTL', 300))  # segundos
+
+# Caché (por proceso) de BotSettings usados en la búsqueda (precisión, modelo...)
+TENANT_SETTINGS_CACHE_SIZE = int(os.getenv('TENANT_SETTINGS_CACHE_SIZE', 1024))
+TENANT_SETTINGS_CACHE_TTL = int(os.getenv('TENANT_SETTINGS_CACHE_TTL', 60))  # segundos
+# Migración de modelo de embeddings: las filas del modelo anterior se eliminan por lotes
+# pasado este tiempo desde el cutover (más que el TTL de los BotSettings cacheados)
+EMBEDDING_MODEL_GC_DELAY = int(os.getenv('EMBEDDING_MODEL_GC_DELAY', TENANT_SETTINGS_CACHE_TTL * 5))  # segundos
+EMBEDDING_MODEL_GC_BATCH_SIZE = int(os.getenv('EMBEDDING_MODEL_GC_BATCH_SIZE', 5000))
+
+# Caché (por proceso) de vectores de consulta para la búsqueda por texto
+QUERY_VECTOR_CACHE_SIZE = int(os.getenv('QUERY_VECTOR_CACHE_SIZE', 2048))
+QUERY_VECTOR_CACHE_TTL = int(os.getenv('QUERY_VECTOR_CACHE_TTL', 3600))  # segundos
+
 CELERY_RESULT_SERIALIZER = 'json'  # Asegura usar JSON
 CELERY_ACCEPT_CONTENT = ['json']
\ No newline at end of file
@@ -19,6 +19,7 @@ from adminchat.views import (
     ProductServiceItemViewSet,
     DocumentViewSet,
     EmbeddingViewSet,
+    ReindexJobViewSet,
     TaskStatusView
     
 )
@@ -56,6 +57,7 @@ router.register(r'api/api-routes', APIRouteViewSet, basename='api-routes')
 router.register(r'api/product-service-items', ProductServiceItemViewSet, basename='product-service-item')
 router.register(r'api/documents', DocumentViewSet, basename='document')
 router.register(r'api/embeddings', EmbeddingViewSet, basename='embedding')
+router.register(r'api/reindex-jobs', ReindexJobViewSet, basename='reindex-job')
 
 urlpatterns = [
     path("admin/", admin.site.urls),
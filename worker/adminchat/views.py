@@ -9,7 +9,7 @@ from rest_framework.exceptions import APIException
 from rest_framework_simplejwt.views import TokenObtainPairView
 from rest_framework.renderers import JSONRenderer
 from rest_framework.parsers import MultiPartParser, JSONParser
-from drf_yasg.utils import swagger_auto_schema  
+from drf_yasg.utils import swagger_auto_schema, no_body
 from drf_yasg import openapi  
 import logging
 import json
@@ -19,14 +19,20 @@ from django.db.models.functions import TruncMonth
 from django_filters.rest_framework import DjangoFilterBackend
 from django.shortcuts import get_object_or_404
 
-from .models import  Business, BusinessUser, Role, UserActivityLog, BotSettings, BotTemplate, ChunkingSettings, ExternalAPIConfig, APIRoute, Document, ProductServiceItem, Embedding
+from .models import  Business, BusinessUser, Role, UserActivityLog, BotSettings, BotTemplate, ChunkingSettings, ExternalAPIConfig, APIRoute, Document, ProductServiceItem, Embedding, ReindexJob
 from .pagination import StandardResultsSetPagination
 from .services.gateway_service import GatewayService
 from .services.storage_service import S3StorageService
+from .services.search_service import EmbeddingSearchService
+from .services.cache_service import QueryEmbeddingService, SearchResultCache, TenantSettingsCache
+from .services.ingestion_service import EmbeddingSourceService
+from .services.reindex_service import ReindexService
+from .services.model_migration_service import ModelMigrationService
+from .tasks import reindex_business_task, schedule_model_garbage_collection
 from celery.result import AsyncResult
 from django.db.models.functions import Cast
-from pgvector.django import CosineDistance
 from django.db.models import FloatField
+from django.db import transaction
 
 from .serializers import (
     BusinessSerializer,
@@ -42,7 +48,9 @@ from .serializers import (
     DocumentSerializer,
     ProductServiceItemSerializer,
     EmbeddingSerializer,
-    EmbeddingCreateSerializer
+    EmbeddingCreateSerializer,
+    CatalogEmbeddingSerializer,
+    ReindexJobSerializer
 )
 from .permissions import (
     IsAdminUser,
@@ -92,6 +100,28 @@ class BusinessViewSet(viewsets.ModelViewSet):
     def list(self, request, *args, **kwargs):
         return super().list(request, *args, **kwargs)
 
+    @swagger_auto_schema(
+        operation_description="Re-indexa todos los documentos y productos del negocio con su modelo de "
+                              "embeddings actual (BotSettings). Crea un trabajo persistente que se "
+                              "consulta y reanuda en /api/reindex-jobs/",
+        request_body=no_body,
+        responses={
+            202: ReindexJobSerializer,
+            409: "El negocio ya tiene un trabajo de re-indexación activo"
+        }
+    )
+    @action(detail=True, methods=['post'])
+    def reindex(self, request, pk=None):
+        business = self.get_object()
+        try:
+            job = ReindexService.create(business.id)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
+
+        task = reindex_business_task.delay(str(job.id))
+        ReindexService.set_task(job, task.id)
+        return Response(ReindexJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
 class RoleViewSet(viewsets.ModelViewSet):
     """
     list:
@@ -307,6 +337,91 @@ class BotSettingsViewSet(viewsets.ModelViewSet):
         except BotSettings.DoesNotExist:
             return Response({'error': 'Bot settings not found for this business'}, status=status.HTTP_404_NOT_FOUND)
 
+    @swagger_auto_schema(
+        method='get',
+        operation_description="Estado de la migración del modelo de embeddings: modelo activo, "
+                              "modelo pendiente, orígenes ya vectorizados con él y trabajo en sombra"
+    )
+    @swagger_auto_schema(
+        method='post',
+        operation_description="Inicia la migración a otro modelo de embeddings sin cortar la búsqueda: "
+                              "re-indexa en sombra con el modelo nuevo y hace el cutover al terminar",
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            required=['embedding_model_name', 'embedding_dim'],
+            properties={
+                'embedding_model_name': openapi.Schema(type=openapi.TYPE_STRING),
+                'embedding_dim': openapi.Schema(type=openapi.TYPE_INTEGER)
+            }
+        ),
+        responses={
+            202: ReindexJobSerializer,
+            400: "Parámetros inválidos",
+            409: "Migración o re-indexación ya en curso"
+        }
+    )
+    @swagger_auto_schema(
+        method='delete',
+        operation_description="Cancela la migración en curso; las filas del modelo pendiente se eliminan después",
+        responses={204: "Migración cancelada", 409: "No hay migración en curso"}
+    )
+    @action(detail=True, methods=['get', 'post', 'delete'], url_path='model-migration')
+    def model_migration(self, request, pk=None):
+        bot_settings = self.get_object()
+        business_id = bot_settings.business_id
+
+        if request.method == 'GET':
+            return Response(ModelMigrationService.status(business_id))
+
+        if request.method == 'DELETE':
+            try:
+                ModelMigrationService.cancel(business_id)
+            except ValueError as e:
+                return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
+            schedule_model_garbage_collection(business_id)
+            return Response(status=status.HTTP_204_NO_CONTENT)
+
+        embedding_model = request.data.get('embedding_model_name')
+        try:
+            embedding_dim = int(request.data.get('embedding_dim'))
+        except (TypeError, ValueError):
+            embedding_dim = None
+        if not embedding_model or not embedding_dim:
+            return Response(
+                {'error': 'embedding_model_name and embedding_dim are required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if embedding_dim not in dict(BotSettings.EMBEDDING_DIMENSIONS):
+            return Response(
+                {'error': f'Unsupported embedding_dim: {embedding_dim}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            job = ModelMigrationService.start(business_id, embedding_model, embedding_dim)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
+
+        task = reindex_business_task.delay(str(job.id))
+        ReindexService.set_task(job, task.id)
+        return Response(ReindexJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+    @swagger_auto_schema(
+        operation_description="Activa el modelo pendiente si todos los documentos y productos ya tienen "
+                              "embeddings con él (el trabajo en sombra lo hace al terminar)",
+        request_body=no_body,
+        responses={200: "Modelo activado", 409: "Sin migración o con orígenes pendientes"}
+    )
+    @action(detail=True, methods=['post'])
+    def cutover(self, request, pk=None):
+        bot_settings = self.get_object()
+        try:
+            embedding_model = ModelMigrationService.cutover(bot_settings.business_id)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
+        schedule_model_garbage_collection(bot_settings.business_id)
+        return Response({'embedding_model_name': embedding_model})
+
 class BotTemplateViewSet(viewsets.ModelViewSet):
     """
     list:
@@ -950,6 +1065,29 @@ class ProductServiceItemViewSet(viewsets.ModelViewSet):
         page = self.paginate_queryset(queryset)
         serializer = self.get_serializer(page, many=True)
         return self.get_paginated_response(serializer.data)
+
+    @swagger_auto_schema(
+        operation_description="Vectoriza muchos productos del negocio en una sola tarea (importación de "
+                              "catálogo): lotes con una consulta, una llamada al servicio de embeddings y "
+                              "una escritura cada uno. Sin product_ids, todo el catálogo",
+        request_body=CatalogEmbeddingSerializer,
+        responses={
+            202: "Tarea encolada (task_id y monitor_url)",
+            400: "Parámetros inválidos",
+            403: "El negocio no es el del usuario"
+        }
+    )
+    @action(detail=False, methods=['post'], url_path='embed-catalog')
+    def embed_catalog(self, request):
+        serializer = CatalogEmbeddingSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        if not request.user.is_superuser and \
+                serializer.validated_data['business_id'] != request.user.business_id:
+            return Response(
+                {'error': 'You can only embed the catalog of your own business'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        return Response(serializer.save(), status=status.HTTP_202_ACCEPTED)
     
 
 
@@ -975,7 +1113,7 @@ class EmbeddingViewSet(viewsets.ModelViewSet):
     destroy:
     Elimina un embedding.
     """
-    queryset = Embedding.objects.select_related('business')
+    queryset = Embedding.objects.filter(is_active=True).select_related('business')
 #    serializer_class = EmbeddingSerializer
     #permission_classes = [IsAuthenticated, IsAdminUser | IsBusinessAdmin]
     permission_classes = [AllowAny]  # Anula la configuración global
@@ -1000,6 +1138,15 @@ class EmbeddingViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(business=self.request.user.business)
         return queryset
 
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+        SearchResultCache.bump_corpus_version(serializer.instance.business_id)
+
+    def perform_destroy(self, instance):
+        business_id = instance.business_id
+        super().perform_destroy(instance)
+        SearchResultCache.bump_corpus_version(business_id)
+
     @swagger_auto_schema(
         manual_parameters=[
             openapi.Parameter(
@@ -1042,7 +1189,7 @@ class EmbeddingViewSet(viewsets.ModelViewSet):
                 'vector': openapi.Schema(
                     type=openapi.TYPE_ARRAY,
                     items=openapi.Schema(type=openapi.TYPE_NUMBER),
-                    description="Vector de consulta para búsqueda de similitud"
+                    description="Vector de consulta para búsqueda de similitud (opcional si se envía 'query')"
                 ),
                 'top_k': openapi.Schema(
                     type=openapi.TYPE_INTEGER,
@@ -1056,9 +1203,45 @@ class EmbeddingViewSet(viewsets.ModelViewSet):
                     type=openapi.TYPE_STRING,
                     format='uuid',
                     description="ID del negocio para filtrar los embeddings"
+                ),
+                'ef_search': openapi.Schema(
+                    type=openapi.TYPE_INTEGER,
+                    description="Tamaño de la lista de candidatos del índice HNSW (default: HNSW_EF_SEARCH, mínimo top_k)"
+                ),
+                'probes': openapi.Schema(
+                    type=openapi.TYPE_INTEGER,
+                    description="Número de listas a recorrer si existe un índice IVFFlat"
+                ),
+                'mode': openapi.Schema(
+                    type=openapi.TYPE_STRING,
+                    enum=['vector', 'hybrid'],
+                    description="'vector' (default) o 'hybrid': fusiona similitud coseno y full-text con RRF"
+                ),
+                'query': openapi.Schema(
+                    type=openapi.TYPE_STRING,
+                    description="Texto de la consulta. Si no se envía 'vector' se vectoriza en el servidor "
+                                "con el modelo del negocio (requerido en modo hybrid)"
+                ),
+                'rrf_k': openapi.Schema(
+                    type=openapi.TYPE_INTEGER,
+                    description="Constante k de Reciprocal Rank Fusion (default: 60)"
+                ),
+                'source_type': openapi.Schema(
+                    type=openapi.TYPE_STRING,
+                    enum=[choice[0] for choice in Embedding.SOURCE_TYPES],
+                    description="Filtra por tipo de fuente"
+                ),
+                'source_ids': openapi.Schema(
+                    type=openapi.TYPE_ARRAY,
+                    items=openapi.Schema(type=openapi.TYPE_STRING, format='uuid'),
+                    description="Filtra por IDs de fuente"
+                ),
+                'metadata': openapi.Schema(
+                    type=openapi.TYPE_OBJECT,
+                    description="Filtro de contención sobre metadata (metadata @> {...}), ej: {\"document_type\": \"pdf\"}"
                 )
             },
-            required=['vector', 'business_id']
+            required=['business_id']
         ),
         responses={
             200: openapi.Response(
@@ -1077,12 +1260,20 @@ class EmbeddingViewSet(viewsets.ModelViewSet):
                                     'source_type': openapi.Schema(type=openapi.TYPE_STRING),
                                     'source_id': openapi.Schema(type=openapi.TYPE_STRING, format='uuid'),
                                     'chunk_index': openapi.Schema(type=openapi.TYPE_INTEGER),
-                                    'similarity': openapi.Schema(type=openapi.TYPE_NUMBER, format='float')
+                                    'similarity': openapi.Schema(type=openapi.TYPE_NUMBER, format='float'),
+                                    'score': openapi.Schema(type=openapi.TYPE_NUMBER, format='float'),
+                                    'vector_rank': openapi.Schema(type=openapi.TYPE_INTEGER),
+                                    'lexical_rank': openapi.Schema(type=openapi.TYPE_INTEGER)
                                     # Agrega aquí otros campos del embedding que quieras incluir
                                 }
                             )
                         ),
-                        'count': openapi.Schema(type=openapi.TYPE_INTEGER)
+                        'count': openapi.Schema(type=openapi.TYPE_INTEGER),
+                        'cached': openapi.Schema(type=openapi.TYPE_BOOLEAN),
+                        'filter_strategy': openapi.Schema(
+                            type=openapi.TYPE_STRING,
+                            description="Estrategia de filtrado usada: ann, prefilter o iterative (ausente si viene de caché)"
+                        )
                     }
                 )
             ),
@@ -1099,61 +1290,333 @@ class EmbeddingViewSet(viewsets.ModelViewSet):
         top_k = int(request.data.get('top_k', 5))
         min_similarity = float(request.data.get('min_similarity', 0.7))
         business_id = request.data.get('business_id')
+        mode = request.data.get('mode', 'vector')
+        query_text = request.data.get('query')
         
         # Validaciones
+        if not business_id:
+            return Response(
+                {'error': 'business_id is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        if vector is None and isinstance(query_text, str) and query_text.strip():
+            # Vectorización en el servidor (con caché de consultas)
+            try:
+                vector = QueryEmbeddingService.get_query_vector(business_id, query_text)
+            except Exception as e:
+                logger.error(f"Error embedding search query: {str(e)}")
+                return Response(
+                    {'error': f'Could not embed query: {str(e)}'},
+                    status=status.HTTP_502_BAD_GATEWAY
+                )
+        
         if not vector or not isinstance(vector, list):
             return Response(
-                {'error': 'Vector must be a list of numbers'},
+                {'error': 'Vector must be a list of numbers (or send a query text)'},
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        if not business_id:
+        if mode not in ('vector', 'hybrid'):
             return Response(
-                {'error': 'business_id is required'},
+                {'error': "mode must be 'vector' or 'hybrid'"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        if mode == 'hybrid' and (not query_text or not isinstance(query_text, str)):
+            return Response(
+                {'error': 'query is required for hybrid search'},
                 status=status.HTTP_400_BAD_REQUEST
             )
         
+        # Dimensión de los embeddings del negocio: selecciona los índices parciales a usar
+        bot_settings = TenantSettingsCache.get_bot_settings(business_id)
+        dim = bot_settings['embedding_dim']
+        if len(vector) != dim:
+            return Response(
+                {'error': f'Vector must have {dim} dimensions (embedding_dim of the business)'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        # Precisión de la primera etapa del ANN configurada para el negocio
+        precision = bot_settings['search_vector_precision'] if mode == 'vector' else 'full'
+        rerank = bot_settings['search_rerank']
+        rerank_factor = bot_settings['search_rerank_factor']
+        # Búsqueda Matryoshka: la primera etapa sobre el prefijo truncado tiene prioridad
+        truncate_dim = bot_settings.get('search_truncate_dim') if mode == 'vector' else None
+        two_stage = precision != 'full' or bool(truncate_dim)
+        # La primera etapa reducida necesita ef_search >= candidatos a re-rankear
+        ann_k = (
+            top_k * max(rerank_factor, 1)
+            if EmbeddingSearchService.reranks(precision, truncate_dim, rerank)
+            else top_k
+        )
+        
         try:
-
-            # Filtrar y calcular similitud
-            queryset = Embedding.objects.filter(business_id=business_id).annotate(
-                similarity=1 - Cast(CosineDistance('vector', vector), output_field=FloatField())
-            ).filter(
-                similarity__gte=min_similarity
-            ).order_by(
-                '-similarity'
-            )[:top_k]
+            tuning = EmbeddingSearchService.parse_index_tuning(request.data, ann_k)
+            filters = EmbeddingSearchService.parse_filters(request.data)
+            rrf_k = int(request.data['rrf_k']) if request.data.get('rrf_k') is not None else None
+        except (TypeError, ValueError) as e:
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        # Solo filas del modelo activo (durante una migración conviven las del pendiente)
+        filters['model_names'] = ModelMigrationService.search_model_names(bot_settings)
+        
+        # Caché de resultados versionada por corpus del negocio
+        cache_key = SearchResultCache.make_key(business_id, vector, {
+            'mode': mode,
+            'precision': precision,
+            'truncate_dim': truncate_dim,
+            'rerank': rerank,
+            'rerank_factor': rerank_factor,
+            'query': query_text if mode == 'hybrid' else None,
+            'top_k': top_k,
+            'min_similarity': min_similarity,
+            'rrf_k': rrf_k,
+            'filters': filters,
+            **tuning
+        })
+        results = SearchResultCache.get(cache_key)
+        if results is not None:
+            return Response({
+                'results': results,
+                'count': len(results),
+                'cached': True
+            })
+        
+        try:
+            # Con filtros: prefiltrado exacto o ANN iterativo según la selectividad
+            strategy, tuning = EmbeddingSearchService.resolve_filter_strategy(
+                business_id, filters, top_k, tuning,
+                mixed_models=ModelMigrationService.shares_dimension(bot_settings)
+            )
             
-            # Preparar resultados sin el campo vector
-            results = []
-            for embedding in queryset:
-                result = {
-                    'id': str(embedding.id),
-                    'content': embedding.content,
-                    'metadata': embedding.metadata,
-                    'source_type': embedding.source_type,
-                    'source_id': str(embedding.source_id),
-                    'chunk_index': embedding.chunk_index,
-                    'similarity': float(embedding.similarity),
-                   # 'business': {  # Diccionario con los campos relevantes
-                   #     'id': str(embedding.business.id),
-                   #     'name': embedding.business.name
-                        # Agrega otros campos que necesites
-                   # },
-                    'business_id': str(embedding.business.id),
-                    'created_at': embedding.created_at,
-                    'updated_at': embedding.updated_at
-                    # Agrega aquí otros campos que necesites
-                }
-                results.append(result)
+            if mode == 'hybrid':
+                with transaction.atomic():
+                    EmbeddingSearchService.apply_index_tuning(**tuning)
+                    results = EmbeddingSearchService.hybrid_search(
+                        business_id, dim, vector, query_text, top_k, min_similarity,
+                        rrf_k=rrf_k, filters=filters
+                    )
+            elif two_stage:
+                with transaction.atomic():
+                    EmbeddingSearchService.apply_index_tuning(**tuning)
+                    results = EmbeddingSearchService.two_stage_search(
+                        business_id, dim, vector, top_k, min_similarity, precision,
+                        truncate_dim=truncate_dim, rerank=rerank,
+                        rerank_factor=rerank_factor, filters=filters
+                    )
+            else:
+                # Filtrar y calcular similitud. Se ordena por la distancia (ASC) para que
+                # Postgres pueda resolver el top-k con el índice HNSW/IVFFlat.
+                # Proyección ligera: nunca se lee el vector y business_id sale de la FK.
+                queryset = EmbeddingSearchService.apply_filters(
+                    Embedding.objects.filter(business_id=business_id, dimensions=dim, is_active=True), filters
+                ).annotate(
+                    distance=Cast(EmbeddingSearchService.cosine_distance(vector, dim), output_field=FloatField())
+                ).filter(
+                    distance__lte=1 - min_similarity
+                ).order_by(
+                    'distance'
+                ).values(
+                    *EmbeddingSearchService.RESULT_FIELDS, 'distance'
+                )[:top_k]
+                
+                if not EmbeddingSearchService.needs_tuning(tuning):
+                    rows = list(queryset)
+                else:
+                    # SET LOCAL de los parámetros del índice dentro de la transacción de la consulta
+                    with transaction.atomic():
+                        EmbeddingSearchService.apply_index_tuning(**tuning)
+                        rows = list(queryset)
+                
+                # iterative_scan en modo relaxed_order puede devolver el top-k ligeramente desordenado
+                rows.sort(key=lambda row: row['distance'])
+                results = [EmbeddingSearchService.format_result(row) for row in rows]
+            
+            SearchResultCache.set(cache_key, results)
             
             return Response({
                 'results': results,
-                'count': len(results)
+                'count': len(results),
+                'cached': False,
+                'filter_strategy': strategy
             })
             
         except Exception as e:
-            logger.error(f"Error in semantic search: {str(e)}")
+            logger.error(f"Error in semantic search ({mode}): {str(e)}")
+            return Response(
+                {'error': 'Internal server error'},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+    @swagger_auto_schema(
+        method='get',
+        operation_description="Estadísticas de las cachés de búsqueda: vectores de consulta de este "
+                              "proceso y resultados de todos los procesos (caché compartida)",
+        responses={200: openapi.Schema(type=openapi.TYPE_OBJECT)}
+    )
+    @action(detail=False, methods=['get'], url_path='cache-stats')
+    def cache_stats(self, request):
+        """
+        Devuelve tamaño, aciertos, fallos y expulsiones de las cachés de búsqueda.
+        """
+        return Response({
+            'query_vectors': QueryEmbeddingService.cache.stats(),
+            'search_results': SearchResultCache.stats()
+        })
+
+    @swagger_auto_schema(
+        operation_description="""
+        Ejecuta varias búsquedas de similitud en una sola llamada y una sola consulta SQL.
+        Todas las consultas comparten business_id, top_k y min_similarity.
+        """,
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                'vectors': openapi.Schema(
+                    type=openapi.TYPE_ARRAY,
+                    items=openapi.Schema(
+                        type=openapi.TYPE_ARRAY,
+                        items=openapi.Schema(type=openapi.TYPE_NUMBER)
+                    ),
+                    description=f"Vectores de consulta (máximo {EmbeddingSearchService.MAX_BATCH_QUERIES})"
+                ),
+                'top_k': openapi.Schema(
+                    type=openapi.TYPE_INTEGER,
+                    description="Número de resultados por consulta (default: 5)"
+                ),
+                'min_similarity': openapi.Schema(
+                    type=openapi.TYPE_NUMBER,
+                    description="Umbral mínimo de similitud (default: 0.7)"
+                ),
+                'business_id': openapi.Schema(
+                    type=openapi.TYPE_STRING,
+                    format='uuid',
+                    description="ID del negocio para filtrar los embeddings"
+                ),
+                'ef_search': openapi.Schema(type=openapi.TYPE_INTEGER),
+                'probes': openapi.Schema(type=openapi.TYPE_INTEGER),
+                'source_type': openapi.Schema(type=openapi.TYPE_STRING),
+                'source_ids': openapi.Schema(
+                    type=openapi.TYPE_ARRAY,
+                    items=openapi.Schema(type=openapi.TYPE_STRING, format='uuid')
+                ),
+                'metadata': openapi.Schema(type=openapi.TYPE_OBJECT)
+            },
+            required=['vectors', 'business_id']
+        ),
+        responses={
+            200: openapi.Response(
+                description="Resultados por consulta, en el mismo orden que 'vectors'",
+                schema=openapi.Schema(
+                    type=openapi.TYPE_OBJECT,
+                    properties={
+                        'queries': openapi.Schema(
+                            type=openapi.TYPE_ARRAY,
+                            items=openapi.Schema(
+                                type=openapi.TYPE_OBJECT,
+                                properties={
+                                    'index': openapi.Schema(type=openapi.TYPE_INTEGER),
+                                    'results': openapi.Schema(
+                                        type=openapi.TYPE_ARRAY,
+                                        items=openapi.Schema(type=openapi.TYPE_OBJECT)
+                                    ),
+                                    'count': openapi.Schema(type=openapi.TYPE_INTEGER)
+                                }
+                            )
+                        ),
+                        'count': openapi.Schema(type=openapi.TYPE_INTEGER),
+                        'filter_strategy': openapi.Schema(
+                            type=openapi.TYPE_STRING,
+                            description="Estrategia de filtrado usada: ann, prefilter o iterative"
+                        )
+                    }
+                )
+            ),
+            400: "Vectores inválidos o parámetros incorrectos"
+        }
+    )
+    @action(detail=False, methods=['post'])
+    def search_batch(self, request):
+        """
+        Busca embeddings similares para varios vectores de consulta a la vez.
+        """
+        vectors = request.data.get('vectors')
+        top_k = int(request.data.get('top_k', 5))
+        min_similarity = float(request.data.get('min_similarity', 0.7))
+        business_id = request.data.get('business_id')
+        
+        # Validaciones
+        if (
+            not vectors or not isinstance(vectors, list)
+            or not all(isinstance(vector, list) and vector for vector in vectors)
+        ):
+            return Response(
+                {'error': 'vectors must be a non-empty list of number lists'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        if len(vectors) > EmbeddingSearchService.MAX_BATCH_QUERIES:
+            return Response(
+                {'error': f'A maximum of {EmbeddingSearchService.MAX_BATCH_QUERIES} vectors is allowed per batch'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        if len({len(vector) for vector in vectors}) != 1:
+            return Response(
+                {'error': 'All vectors must have the same dimension'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        if not business_id:
+            return Response(
+                {'error': 'business_id is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        bot_settings = TenantSettingsCache.get_bot_settings(business_id)
+        dim = bot_settings['embedding_dim']
+        if len(vectors[0]) != dim:
+            return Response(
+                {'error': f'Vectors must have {dim} dimensions (embedding_dim of the business)'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            tuning = EmbeddingSearchService.parse_index_tuning(request.data, top_k)
+            filters = EmbeddingSearchService.parse_filters(request.data)
+        except (TypeError, ValueError) as e:
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        filters['model_names'] = ModelMigrationService.search_model_names(bot_settings)
+        
+        try:
+            strategy, tuning = EmbeddingSearchService.resolve_filter_strategy(
+                business_id, filters, top_k, tuning,
+                mixed_models=ModelMigrationService.shares_dimension(bot_settings)
+            )
+            with transaction.atomic():
+                EmbeddingSearchService.apply_index_tuning(**tuning)
+                batch_results = EmbeddingSearchService.batch_search(
+                    business_id, dim, vectors, top_k, min_similarity, filters=filters
+                )
+            
+            return Response({
+                'queries': [
+                    {'index': i, 'results': results, 'count': len(results)}
+                    for i, results in enumerate(batch_results)
+                ],
+                'count': len(batch_results),
+                'filter_strategy': strategy
+            })
+            
+        except Exception as e:
+            logger.error(f"Error in batch semantic search: {str(e)}")
             return Response(
                 {'error': 'Internal server error'},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -1291,6 +1754,68 @@ def by_business(self, request, business_id=None):
     return Response(serializer.data)
 
 
+class ReindexJobViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    list:
+    Retorna los trabajos de re-indexación (más recientes primero).
+
+    retrieve:
+    Obtiene el estado y el progreso de un trabajo de re-indexación.
+    """
+    queryset = ReindexJob.objects.select_related('business')
+    serializer_class = ReindexJobSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = StandardResultsSetPagination
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = ['business', 'status']
+
+    def get_queryset(self):
+        if getattr(self, 'swagger_fake_view', False):
+            return ReindexJob.objects.none()
+
+        queryset = super().get_queryset()
+        if not self.request.user.is_superuser:
+            queryset = queryset.filter(business=self.request.user.business)
+        return queryset
+
+    @swagger_auto_schema(
+        operation_description="Reanuda un trabajo fallido, cancelado o abandonado desde su cursor",
+        request_body=no_body,
+        responses={
+            202: ReindexJobSerializer,
+            409: "El trabajo no se puede reanudar"
+        }
+    )
+    @action(detail=True, methods=['post'])
+    def resume(self, request, pk=None):
+        job = self.get_object()
+        try:
+            ReindexService.resume(job)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
+
+        task = reindex_business_task.delay(str(job.id))
+        ReindexService.set_task(job, task.id)
+        return Response(self.get_serializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+    @swagger_auto_schema(
+        operation_description="Cancela un trabajo; uno en curso se detiene tras el documento o lote actual",
+        request_body=no_body,
+        responses={
+            200: ReindexJobSerializer,
+            409: "El trabajo ya terminó"
+        }
+    )
+    @action(detail=True, methods=['post'])
+    def cancel(self, request, pk=None):
+        job = self.get_object()
+        try:
+            ReindexService.cancel(job)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
+        return Response(self.get_serializer(job).data)
+
+
 class TaskStatusView(APIView):
     permission_classes = [AllowAny]  # Anula la configuración global
     authentication_classes = []  # Esto desactiva JWT para esta vista
@@ -1298,6 +1823,13 @@ class TaskStatusView(APIView):
         # Convierte task_id a string (si es UUID u otro tipo)
         task_id_str = str(task_id)
         task_result = AsyncResult(task_id_str)
+
+        # Ingesta por shards: el coordinador termina enseguida; el estado es el de la
+        # tarea final del chord, con el progreso sumado de los shards
+        if task_result.successful() and isinstance(task_result.result, dict) \
+                and task_result.result.get('status') == 'sharded':
+            return Response(EmbeddingSourceService.shard_progress(task_result.result))
+
         return Response({
             'ready': task_result.ready(),
             'successful': task_result.successful(),